@@ -1,10 +1,26 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
+import functools
 import io
 import os
+import json
+import hashlib
+import uuid
 import matplotlib.pyplot as plt
 import matplotlib.font_manager as fm
 
+from ev_model import (
+    KWH_SCALE_KEY, INTEGER_KEYS, SENSITIVITY_LABELS, PORTFOLIO_PARALLEL_MIN_SITES,
+    build_ops_table,
+    run_monte_carlo, sensitivity_keys, run_tornado, run_sweep, sweep_cache_stats, evaluate_portfolio, portfolio_template,
+    npv, irr, solve_break_even_price, solve_required_kwh_scale, solve_max_pile_price, RerunTracer,
+    DEFAULT_TOU_TARIFF, generate_profile, load_profile, simulate_hourly, exceedance_hours,
+    OPS_COLUMNS, DEFAULT_FLEET, simulate_sessions, arrivals_from_kwh, scenario_key, ScenarioStore,
+    cached_capex_details, cached_financial_model, result_cache_stats, ResultCache, optimize_sizing,
+    read_session_log, calibrate_ops_table, log_profile, JobManager,
+)
+
 # ==========================================
 # 1. 配置与常量层
 # ==========================================
@@ -17,12 +33,29 @@ PAGE_CONFIG = {
 ADMIN_PASSWORD = "DbeVc"
 FONT_FILENAME = 'NotoSansSC-Regular.ttf'
 
-# 默认年度推演参数
-DEFAULT_PARAMS = {
-    "daily_kwh": [50, 100, 150, 200, 250, 300, 350, 400, 450, 500],
-    "staff": [2] * 10,
-    "salary": [75000] * 10
+# 蒙特卡洛风险模式：可抽样参数与分布 (界面标签)
+MC_PARAMS = {
+    "price_sale": "销售电价",
+    "price_cost": "进货电价",
+    "inflation_rate": "通胀率",
+    "power_efficiency": "电能效率",
+    "daily_kwh": "单枪日均充电量 (逐年)",
 }
+MC_DISTRIBUTIONS = {"固定": None, "正态": "normal", "均匀": "uniform", "三角": "triangular"}
+
+# 报告导出：跨会话共享缓存的容量上限，预览与下载分辨率
+EXPORT_CACHE_MAX_BYTES = 64 * 1024 * 1024
+EXPORT_PREVIEW_DPI = 80
+EXPORT_FULL_DPI = 300
+
+# 性能监控：重跑追踪日志 (滚动 JSONL)，EV_PERF_TRACE=1 时默认开启
+PERF_LOG_PATH = os.environ.get("EV_PERF_LOG", os.path.join(os.path.dirname(os.path.abspath(__file__)), "logs", "rerun_trace.jsonl"))
+PERF_TRACE_DEFAULT = os.environ.get("EV_PERF_TRACE") == "1"
+SCENARIO_STORE_PATH = os.environ.get("EV_SCENARIO_STORE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "scenarios"))
+# 实测充电记录导入：服务器端日志目录 (EV_INGEST_DIR)，界面只能选择其中的文件；未配置时仅支持上传与命令行
+INGEST_DIR = os.environ.get("EV_INGEST_DIR")
+# 后台任务：进度面板轮询间隔 (秒)
+JOB_POLL_SECONDS = 1.0
 
 # 自定义 CSS
 CSS_STYLES = """
@@ -67,7 +100,40 @@ def load_custom_font():
     current_dir = os.path.dirname(os.path.abspath(__file__))
     font_path = os.path.join(current_dir, FONT_FILENAME)
     if os.path.exists(font_path): return fm.FontProperties(fname=font_path)
-    else: return fm.FontProperties(family='sans-serif')
+    else: return fm.FontProperties(family=['sans-serif'])
+
+@st.cache_resource
+def get_export_cache():
+    return ResultCache(EXPORT_CACHE_MAX_BYTES)
+
+@st.cache_resource
+def get_tracer():
+    return RerunTracer(PERF_LOG_PATH, enabled=PERF_TRACE_DEFAULT)
+
+@st.cache_resource
+def get_scenario_store():
+    return ScenarioStore(SCENARIO_STORE_PATH)
+
+@st.cache_resource
+def get_job_manager():
+    return JobManager()
+
+def _restored(name, default):
+    """从情景库载入的参数优先作为控件默认值 (按默认值类型转换，避免 int/float 混用)"""
+    value = st.session_state.get('restored_inputs', {}).get(name, default)
+    return type(default)(value)
+
+def _ikey(name, key=None):
+    """控件 key：每次载入情景后换代，使控件以载入的参数重新初始化；未载入时保持原有 key"""
+    gen = st.session_state.get('restore_gen', 0)
+    return key if not gen else f"{key or name}@{gen}"
+
+def traced_fragment(func):
+    """以 st.fragment 包装渲染函数：控件变化只重跑该函数；整页运行时计为同名阶段，单独重跑时自成一条追踪记录"""
+    @functools.wraps(func)
+    def run(*args, **kwargs):
+        with get_tracer().scope(st.session_state.get('session_id'), func.__name__): return func(*args, **kwargs)
+    return st.fragment(run)
 
 def check_password():
     if "authenticated" not in st.session_state: st.session_state["authenticated"] = False
@@ -86,7 +152,7 @@ def check_password():
 # ==========================================
 # 3. 工具函数层
 # ==========================================
-def dataframe_to_png(df, font_prop):
+def dataframe_to_png(df, font_prop, dpi=EXPORT_FULL_DPI):
     df_display = df.copy()
     for col in df_display.columns:
         if pd.api.types.is_numeric_dtype(df_display[col]) and col != "年份":
@@ -102,102 +168,17 @@ def dataframe_to_png(df, font_prop):
             cell.set_height(0.06)
             if key[0] % 2 == 0: cell.set_facecolor('#f8f9fa')
     table.auto_set_font_size(False); table.set_fontsize(11); table.scale(1.1, 1.1)
-    buf = io.BytesIO(); plt.savefig(buf, format='png', bbox_inches='tight', dpi=300, transparent=True); buf.seek(0); plt.close(fig)
+    buf = io.BytesIO(); plt.savefig(buf, format='png', bbox_inches='tight', dpi=dpi, transparent=True); buf.seek(0); plt.close(fig)
     return buf
 
-# ==========================================
-# 4. 核心逻辑层 (计算)
-# ==========================================
-def calculate_capex_details(inputs):
-    """将 CAPEX 按照折旧类别进行分组计算"""
-    # 1. 充电设备类
-    capex_charger = (inputs['price_pile_unit'] * inputs['qty_piles'])
-    # 2. 变压器及接入类
-    capex_trans_group = (inputs['price_trans_unit'] * inputs['qty_trans']) + inputs['cost_dewa_conn']
-    # 3. 线缆类
-    capex_cable_group = inputs['cost_hv_cable'] + inputs['cost_lv_cable']
-    # 4. 土建及其他类
-    capex_civil_other = inputs['cost_civil_work'] + inputs['cost_canopy'] + inputs['cost_design'] + \
-                        inputs['cost_weak_current_total'] + inputs['other_cost_1'] + inputs['other_cost_2']
-    
-    total_capex = capex_charger + capex_trans_group + capex_cable_group + capex_civil_other
-    
-    return {
-        "total_capex": total_capex,
-        "capex_charger": capex_charger,
-        "capex_trans_group": capex_trans_group,
-        "capex_cable_group": capex_cable_group,
-        "capex_civil_other": capex_civil_other
-    }
-
-def calculate_financial_model(edited_df, capex_data, inputs):
-    results = []
-    total_capex = capex_data["total_capex"]
-    results.append({"年份": "Y0", "营收": 0, "成本(OPEX)": 0, "折旧(抵税)": 0, "息税前利(EBIT)": 0, "税金": 0, "净利润": 0, "自由现金流(FCF)": -total_capex, "累计现金流": -total_capex})
-    cumulative_cash = -total_capex
-    payback_year = None
-    total_guns = inputs['qty_piles'] * inputs['guns_per_pile']
-
-    # --- V10.7 核心升级：计算分类年折旧额 (加入是否启用判断) ---
-    # 如果未启用折旧，或年限设置不合理，则该项年折旧额为 0
-    dep_charger_annual = 0
-    if inputs.get('enable_dep_charger', True) and inputs['dep_years_charger'] > 0:
-        dep_charger_annual = capex_data["capex_charger"] / inputs['dep_years_charger']
-
-    dep_trans_annual = 0
-    if inputs.get('enable_dep_trans', True) and inputs['dep_years_trans'] > 0:
-        dep_trans_annual = capex_data["capex_trans_group"] / inputs['dep_years_trans']
-
-    dep_cable_annual = 0
-    if inputs.get('enable_dep_cable', True) and inputs['dep_years_cable'] > 0:
-        dep_cable_annual = capex_data["capex_cable_group"] / inputs['dep_years_cable']
-
-    dep_civil_annual = 0
-    if inputs.get('enable_dep_civil', True) and inputs['dep_years_civil'] > 0:
-        dep_civil_annual = capex_data["capex_civil_other"] / inputs['dep_years_civil']
-    # ------------------------------------------------------
-
-    for index, row in edited_df.iterrows():
-        year_idx = index; year_num = year_idx + 1
-        daily_kwh = row["单枪日均充电量 (kWh)"]; staff_count = row["运营人数 (人)"]; salary_avg = row["人均年薪 (AED)"]
-        
-        current_price_sale = inputs['price_sale'] * ((1 + inputs['price_sale_growth']) ** year_idx)
-        current_price_cost = inputs['price_cost'] * ((1 + inputs['price_cost_growth']) ** year_idx)
-        annual_sales_kwh = daily_kwh * total_guns * 365
-        revenue = annual_sales_kwh * current_price_sale
-        
-        annual_buy_kwh = annual_sales_kwh / inputs['power_efficiency']
-        cost_power = annual_buy_kwh * current_price_cost
-        inflation_factor = (1 + inputs['inflation_rate']) ** year_idx
-        current_labor = (staff_count * salary_avg) * inflation_factor
-        fixed_opex_base = inputs['base_rent'] + inputs['base_it_saas'] + inputs['base_marketing'] + inputs['base_maintenance']
-        current_fixed = fixed_opex_base * inflation_factor
-        total_opex = cost_power + current_labor + current_fixed
-        
-        ebitda = revenue - total_opex
-        
-        # 计算当年总折旧额（判断各项是否在折旧期内，且已启用）
-        current_dep_charger = dep_charger_annual if (inputs.get('enable_dep_charger', True) and year_num <= inputs['dep_years_charger']) else 0
-        current_dep_trans = dep_trans_annual if (inputs.get('enable_dep_trans', True) and year_num <= inputs['dep_years_trans']) else 0
-        current_dep_cable = dep_cable_annual if (inputs.get('enable_dep_cable', True) and year_num <= inputs['dep_years_cable']) else 0
-        current_dep_civil = dep_civil_annual if (inputs.get('enable_dep_civil', True) and year_num <= inputs['dep_years_civil']) else 0
-        current_total_depreciation = current_dep_charger + current_dep_trans + current_dep_cable + current_dep_civil
-
-        ebit = ebitda - current_total_depreciation
-        cost_finance = total_capex * inputs['interest_rate']
-        ebt = ebit - cost_finance
-        tax_amount = (ebt - inputs['tax_threshold']) * inputs['tax_rate'] if ebt > inputs['tax_threshold'] else 0
-        net_profit = ebt - tax_amount
-        free_cash_flow = net_profit + current_total_depreciation
-        cumulative_cash += free_cash_flow
-        
-        if payback_year is None and cumulative_cash >= 0:
-            prev_cash = results[-1]["累计现金流"]
-            payback_year = (year_idx) + (abs(prev_cash) / free_cash_flow) if free_cash_flow > 0 else year_idx + 1
-
-        results.append({"年份": f"Y{year_num}", "营收": revenue, "成本(OPEX)": total_opex, "折旧(抵税)": current_total_depreciation, "息税前利(EBIT)": ebit, "税金": tax_amount, "净利润": net_profit, "自由现金流(FCF)": free_cash_flow, "累计现金流": cumulative_cash})
-    
-    return pd.DataFrame(results), payback_year
+def artifact_key(kind, df, font_prop=None, **options):
+    """导出文件的内容指纹：结果表 + 字体 + 渲染选项"""
+    h = hashlib.sha1(kind.encode())
+    h.update(json.dumps([str(c) for c in df.columns]).encode())
+    h.update(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes())
+    if font_prop is not None: h.update(f"{font_prop.get_file()}|{font_prop.get_family()}".encode())
+    h.update(json.dumps(options, sort_keys=True).encode())
+    return h.hexdigest()
 
 # ==========================================
 # 5. 界面渲染层 (UI Rendering)
@@ -224,6 +205,58 @@ def render_config_import():
                 else: st.error("CSV格式错误，缺少必要列。")
             except Exception as e: st.error(f"读取失败：{e}")
 
+def render_scenario_library(store):
+    with st.expander("📚 **情景库 (Scenario Library)**", expanded=False):
+        f1, f2, f3 = st.columns(3)
+        search = f1.text_input("名称 / 情景键", key="lib_search")
+        tags = f2.multiselect("标签 (全部命中)", store.tag_names(), key="lib_tags")
+        site = f3.selectbox("站点", ["全部"] + store.site_names(), key="lib_site")
+        m1, m2, m3 = st.columns(3)
+        max_payback = m1.number_input("回本期 ≤ (年，0 为不限)", value=0.0, min_value=0.0, step=0.5, key="lib_payback")
+        min_npv = m2.number_input("NPV ≥ (留空为不限)", value=None, step=100000.0, key="lib_npv")
+        order_by = m3.selectbox("排序", ["created", "payback", "npv", "irr", "final_cash", "capex"], format_func=lambda c: {
+            "created": "保存时间", "payback": "回本期", "npv": "NPV", "irr": "IRR", "final_cash": "期末累计现金流", "capex": "初始投资"}[c], key="lib_order")
+        ranges = {"payback": (None, max_payback or None), "npv": (min_npv, None)}
+        filters = dict(tags=tags, site=None if site == "全部" else site, search=search or None, ranges=ranges)
+        found = store.query(**filters, order_by=order_by, descending=order_by not in ("payback", "capex"))
+        total = store.count(**filters)
+        st.caption(f"库中共 {len(store):,} 个情景，命中 {total:,} 个{'，显示前 ' + str(len(found)) + ' 个' if total > len(found) else ''}。")
+        if found.empty: return
+        df_view = found.assign(created=pd.to_datetime(found["created"], unit="s").dt.strftime("%Y-%m-%d %H:%M"), key=found["key"].str[:10])
+        st.dataframe(df_view.rename(columns={"key": "情景键", "name": "名称", "site": "站点", "created": "保存时间", "capex": "初始投资", "payback": "回本期",
+                                             "final_cash": "期末累计现金流", "npv": "NPV", "irr": "IRR", "years": "年限"})
+                     .style.format({"初始投资": "{:,.0f}", "期末累计现金流": "{:,.0f}", "NPV": "{:,.0f}", "IRR": "{:.1%}", "回本期": "{:.1f}"}, na_rep="—"),
+                     use_container_width=True, hide_index=True, height=240)
+        labels = dict(zip(found["key"], found["name"].where(found["name"] != "", found["key"].str[:10])))
+        selected = st.multiselect("选择情景 (对比 / 载入 / 删除)", list(labels), format_func=lambda k: f"{labels[k]} · {k[:8]}", key="lib_selected")
+        if not selected: return
+        b1, b2 = st.columns(2)
+        if b1.button("📂 载入第一个所选情景 (参数 + 年度表)", key="lib_load", use_container_width=True):
+            scenario = store.load(selected[0])
+            if scenario is None: st.error("结果文件缺失，无法载入。"); return
+            st.session_state['restored_inputs'] = scenario['inputs']
+            st.session_state['restore_gen'] = st.session_state.get('restore_gen', 0) + 1
+            st.session_state['df_config_cache'] = scenario['ops'][OPS_COLUMNS]
+            st.rerun()
+        if b2.button("🗑️ 删除所选情景", key="lib_delete", use_container_width=True):
+            store.delete(selected); st.session_state.pop('lib_selected', None); st.rerun()
+        curves = {labels[k]: arrays["cumulative_cash"] for k in selected[:10] if (arrays := store.load_arrays(k)) is not None}
+        if curves:
+            st.markdown("###### 累计现金流对比")
+            st.line_chart(pd.DataFrame({name: pd.Series(c, index=[f"Y{i}" for i in range(len(c))]) for name, c in curves.items()}), use_container_width=True)
+
+@traced_fragment
+def render_scenario_save(store, key, edited_df, inputs, df_res, payback_year):
+    with st.expander("💾 **保存到情景库 (Save Scenario)**", expanded=False):
+        if key in store: st.caption(f"当前情景已在库中 (情景键 {key[:10]})，再次保存只更新名称/站点/标签。")
+        s1, s2, s3 = st.columns(3)
+        name = s1.text_input("情景名称", key="save_name")
+        site = s2.text_input("站点", key="save_site")
+        tags = s3.text_input("标签 (逗号分隔)", key="save_tags")
+        if st.button("💾 保存情景", key="save_scenario"):
+            store.put(edited_df, inputs, df_res, payback_year, name.strip(), site.strip(), [t.strip() for t in tags.replace("，", ",").split(",")])
+            st.toast("情景已保存到情景库。", icon="✅")
+
 def render_base_params_section():
     st.header("1. 基础参数设置 (Base Parameters)")
     with st.expander("⚙️ **点击展开/收起基准配置 (Advanced Config)**", expanded=False):
@@ -232,34 +265,34 @@ def render_base_params_section():
         t1, t2, t3 = st.tabs(["🏗️ CAPEX基建", "🛠️ OPEX运营", "📉 财务假设"])
         with t1:
             c1, c2 = st.columns(2)
-            inputs['pile_power_kw'] = c1.number_input("主机功率(kW)", value=480, step=20)
-            inputs['guns_per_pile'] = c2.number_input("单机枪数(把)", value=6, step=1)
-            inputs['price_pile_unit'] = st.number_input("主机单价(AED)", value=200000, step=5000)
+            inputs['pile_power_kw'] = c1.number_input("主机功率(kW)", value=_restored('pile_power_kw', 480), step=20, key=_ikey('pile_power_kw'))
+            inputs['guns_per_pile'] = c2.number_input("单机枪数(把)", value=_restored('guns_per_pile', 6), step=1, key=_ikey('guns_per_pile'))
+            inputs['price_pile_unit'] = st.number_input("主机单价(AED)", value=_restored('price_pile_unit', 200000), step=5000, key=_ikey('price_pile_unit'))
             tt1, tt2 = st.columns(2)
-            trans_type = tt1.selectbox("变电站规格", ["1000 kVA", "1500 kVA"])
+            trans_type = tt1.selectbox("变电站规格", ["1000 kVA", "1500 kVA"], index=int(_restored('trans_val', 1000) == 1500), key=_ikey('trans_val'))
             inputs['trans_val'] = 1000 if "1000" in trans_type else 1500
-            inputs['price_trans_unit'] = tt2.number_input("变电站单价", value=(200000 if inputs['trans_val']==1000 else 250000), step=5000)
+            inputs['price_trans_unit'] = tt2.number_input("变电站单价", value=_restored('price_trans_unit', 200000 if inputs['trans_val']==1000 else 250000), step=5000, key=_ikey('price_trans_unit'))
             st.markdown("---")
-            inputs['cost_dewa_conn'] = st.number_input("DEWA接入费", value=200000, step=10000)
-            inputs['cost_civil_work'] = st.number_input("土建施工费", value=150000, step=10000)
-            inputs['cost_weak_current_total'] = st.number_input("弱电/杂项/开办费总计", value=120000, step=10000)
+            inputs['cost_dewa_conn'] = st.number_input("DEWA接入费", value=_restored('cost_dewa_conn', 200000), step=10000, key=_ikey('cost_dewa_conn'))
+            inputs['cost_civil_work'] = st.number_input("土建施工费", value=_restored('cost_civil_work', 150000), step=10000, key=_ikey('cost_civil_work'))
+            inputs['cost_weak_current_total'] = st.number_input("弱电/杂项/开办费总计", value=_restored('cost_weak_current_total', 120000), step=10000, key=_ikey('cost_weak_current_total'))
             inputs['cost_hv_cable'] = 20000; inputs['cost_lv_cable'] = 80000; inputs['cost_canopy'] = 80000; inputs['cost_design'] = 40000; inputs['other_cost_1'] = 0; inputs['other_cost_2'] = 0
 
         with t2:
-            inputs['base_rent'] = st.number_input("车位租金(AED/年)", value=96000, step=5000)
-            inputs['base_it_saas'] = st.number_input("IT/SaaS/营销/维保总计(AED/年)", value=130000, step=5000)
+            inputs['base_rent'] = st.number_input("车位租金(AED/年)", value=_restored('base_rent', 96000), step=5000, key=_ikey('base_rent'))
+            inputs['base_it_saas'] = st.number_input("IT/SaaS/营销/维保总计(AED/年)", value=_restored('base_it_saas', 130000), step=5000, key=_ikey('base_it_saas'))
             inputs['base_marketing'] = 0; inputs['base_maintenance'] = 0
 
         with t3:
             f1, f2 = st.columns(2)
-            inputs['power_efficiency'] = f1.number_input("⚡ 电能效率(%)", value=95.0, step=0.5) / 100
-            inputs['inflation_rate'] = f2.number_input("📈 通胀率(%)", value=3.0, step=0.5) / 100
+            inputs['power_efficiency'] = f1.number_input("⚡ 电能效率(%)", value=_restored('power_efficiency', 0.95) * 100, step=0.5, key=_ikey('power_efficiency')) / 100
+            inputs['inflation_rate'] = f2.number_input("📈 通胀率(%)", value=_restored('inflation_rate', 0.03) * 100, step=0.5, key=_ikey('inflation_rate')) / 100
             p1, p2 = st.columns(2)
-            inputs['price_sale_growth'] = p1.number_input("💹 销售涨幅(%)", value=0.0, step=0.5) / 100
-            inputs['price_cost_growth'] = p2.number_input("💹 成本涨幅(%)", value=0.0, step=0.5) / 100
+            inputs['price_sale_growth'] = p1.number_input("💹 销售涨幅(%)", value=_restored('price_sale_growth', 0.0) * 100, step=0.5, key=_ikey('price_sale_growth')) / 100
+            inputs['price_cost_growth'] = p2.number_input("💹 成本涨幅(%)", value=_restored('price_cost_growth', 0.0) * 100, step=0.5, key=_ikey('price_cost_growth')) / 100
             tx1, tx2 = st.columns(2)
-            inputs['tax_rate'] = tx1.number_input("🏛️ 税率(%)", value=9.0, step=1.0) / 100
-            inputs['tax_threshold'] = tx2.number_input("免税额度", value=375000, step=10000)
+            inputs['tax_rate'] = tx1.number_input("🏛️ 税率(%)", value=_restored('tax_rate', 0.09) * 100, step=1.0, key=_ikey('tax_rate')) / 100
+            inputs['tax_threshold'] = tx2.number_input("免税额度", value=_restored('tax_threshold', 375000), step=10000, key=_ikey('tax_threshold'))
             
             st.markdown("---")
             st.markdown("##### 折旧策略设定 (Depreciation Strategy)")
@@ -269,30 +302,30 @@ def render_base_params_section():
             dp1, dp2, dp3, dp4 = st.columns(4)
             with dp1:
                 st.markdown("**🔋 充电设备**")
-                inputs['enable_dep_charger'] = st.checkbox("启用折旧", value=True, key="cb_c")
+                inputs['enable_dep_charger'] = st.checkbox("启用折旧", value=_restored('enable_dep_charger', True), key=_ikey('enable_dep_charger', "cb_c"))
                 if inputs['enable_dep_charger']:
-                     inputs['dep_years_charger'] = st.number_input("年限(年)", value=5, min_value=1, step=1, key="ni_c")
+                     inputs['dep_years_charger'] = st.number_input("年限(年)", value=_restored('dep_years_charger', 5), min_value=1, step=1, key=_ikey('dep_years_charger', "ni_c"))
                 else: inputs['dep_years_charger'] = 1 # Dummy value
             
             with dp2:
                 st.markdown("**🏗️ 变压器及接入**")
-                inputs['enable_dep_trans'] = st.checkbox("启用折旧", value=True, key="cb_t")
+                inputs['enable_dep_trans'] = st.checkbox("启用折旧", value=_restored('enable_dep_trans', True), key=_ikey('enable_dep_trans', "cb_t"))
                 if inputs['enable_dep_trans']:
-                    inputs['dep_years_trans'] = st.number_input("年限(年)", value=15, min_value=1, step=1, key="ni_t")
+                    inputs['dep_years_trans'] = st.number_input("年限(年)", value=_restored('dep_years_trans', 15), min_value=1, step=1, key=_ikey('dep_years_trans', "ni_t"))
                 else: inputs['dep_years_trans'] = 1
 
             with dp3:
                 st.markdown("**➰ 线缆工程**")
-                inputs['enable_dep_cable'] = st.checkbox("启用折旧", value=True, key="cb_ca")
+                inputs['enable_dep_cable'] = st.checkbox("启用折旧", value=_restored('enable_dep_cable', True), key=_ikey('enable_dep_cable', "cb_ca"))
                 if inputs['enable_dep_cable']:
-                    inputs['dep_years_cable'] = st.number_input("年限(年)", value=20, min_value=1, step=1, key="ni_ca")
+                    inputs['dep_years_cable'] = st.number_input("年限(年)", value=_restored('dep_years_cable', 20), min_value=1, step=1, key=_ikey('dep_years_cable', "ni_ca"))
                 else: inputs['dep_years_cable'] = 1
             
             with dp4:
                 st.markdown("**🧱 土建及其他**")
-                inputs['enable_dep_civil'] = st.checkbox("启用折旧", value=True, key="cb_ci")
+                inputs['enable_dep_civil'] = st.checkbox("启用折旧", value=_restored('enable_dep_civil', True), key=_ikey('enable_dep_civil', "cb_ci"))
                 if inputs['enable_dep_civil']:
-                    inputs['dep_years_civil'] = st.number_input("年限(年)", value=20, min_value=1, step=1, key="ni_ci")
+                    inputs['dep_years_civil'] = st.number_input("年限(年)", value=_restored('dep_years_civil', 20), min_value=1, step=1, key=_ikey('dep_years_civil', "ni_ci"))
                 else: inputs['dep_years_civil'] = 1
             # ---------------------------------------
 
@@ -304,16 +337,16 @@ def render_project_scale_section(inputs):
         c1, c2, c3 = st.columns(3)
         with c1:
             st.markdown("##### A. 设备数量")
-            inputs['qty_piles'] = st.number_input("拟投超充主机 (台)", value=2, min_value=1, step=1)
-            inputs['qty_trans'] = st.number_input("拟投变压器 (台)", value=1, min_value=1, step=1)
+            inputs['qty_piles'] = st.number_input("拟投超充主机 (台)", value=_restored('qty_piles', 2), min_value=1, step=1, key=_ikey('qty_piles'))
+            inputs['qty_trans'] = st.number_input("拟投变压器 (台)", value=_restored('qty_trans', 1), min_value=1, step=1, key=_ikey('qty_trans'))
         with c2:
             st.markdown("##### B. 资金与电价 (Y1基准)")
-            inputs['interest_rate'] = st.number_input("资金成本费率 (%)", value=5.0, step=0.5) / 100
-            inputs['price_sale'] = st.number_input("销售电价 (AED/kWh)", value=1.20, step=0.05)
-            inputs['price_cost'] = st.number_input("进货电价 (AED/kWh)", value=0.44, step=0.05)
+            inputs['interest_rate'] = st.number_input("资金成本费率 (%)", value=_restored('interest_rate', 0.05) * 100, step=0.5, key=_ikey('interest_rate')) / 100
+            inputs['price_sale'] = st.number_input("销售电价 (AED/kWh)", value=_restored('price_sale', 1.20), step=0.05, key=_ikey('price_sale'))
+            inputs['price_cost'] = st.number_input("进货电价 (AED/kWh)", value=_restored('price_cost', 0.44), step=0.05, key=_ikey('price_cost'))
         with c3:
             st.markdown("##### C. 周期设定")
-            inputs['years_duration'] = st.number_input("运营测算年限 (年)", value=10, min_value=3, max_value=20, step=1)
+            inputs['years_duration'] = st.number_input("运营测算年限 (年)", value=_restored('years_duration', 10), min_value=3, max_value=20, step=1, key=_ikey('years_duration'))
 
     total_power = inputs['qty_piles'] * inputs['pile_power_kw']
     total_trans = inputs['qty_trans'] * inputs['trans_val']
@@ -322,7 +355,7 @@ def render_project_scale_section(inputs):
     return inputs
 
 def render_capex_preview(inputs):
-    capex_data = calculate_capex_details(inputs)
+    capex_data = cached_capex_details(inputs)
     with st.container(border=True):
         st.markdown(f"**💰 Year 0 初始投资预览：{capex_data['total_capex']:,.0f} AED**")
         c1, c2, c3, c4 = st.columns(4)
@@ -335,22 +368,7 @@ def render_capex_preview(inputs):
 def render_dynamic_table_section(years_duration):
     st.header("3. 年度运营推演 (Annual Operations)")
     st.caption("请在下方表格中直接修改每年的关键运营假设。")
-    df_input = None
-    if st.session_state.get('df_config_cache') is not None:
-        df_uploaded = st.session_state['df_config_cache']
-        if len(df_uploaded) < years_duration:
-            last_row = df_uploaded.iloc[-1]
-            df_extra = pd.DataFrame([last_row] * (years_duration - len(df_uploaded)))
-            df_input = pd.concat([df_uploaded, df_extra], ignore_index=True)
-        else: df_input = df_uploaded.head(years_duration)
-    else:
-        long_daily_kwh = DEFAULT_PARAMS['daily_kwh'] + [DEFAULT_PARAMS['daily_kwh'][-1]] * years_duration
-        long_staff = DEFAULT_PARAMS['staff'] + [DEFAULT_PARAMS['staff'][-1]] * years_duration
-        long_salary = DEFAULT_PARAMS['salary'] + [DEFAULT_PARAMS['salary'][-1]] * years_duration
-        df_input = pd.DataFrame({"单枪日均充电量 (kWh)": long_daily_kwh[:years_duration],"运营人数 (人)": long_staff[:years_duration],"人均年薪 (AED)": long_salary[:years_duration]})
-    
-    df_input["年份"] = [f"Y{i+1}" for i in range(years_duration)]
-    df_input = df_input[["年份", "单枪日均充电量 (kWh)", "运营人数 (人)", "人均年薪 (AED)"]]
+    df_input = build_ops_table(years_duration, st.session_state.get('df_config_cache'))
 
     edited_df = st.data_editor(
         df_input,
@@ -364,12 +382,436 @@ def render_dynamic_table_section(years_duration):
     )
     return edited_df
 
+@traced_fragment
+def render_session_log_section(edited_df, inputs):
+    with st.expander("📈 **实测充电记录导入：按实际会话日志校准年度表**", expanded=False):
+        st.caption("分块流式读取充电桩导出的会话记录 (开始/结束时间、桩/枪号、kWh)，按年/月/时段汇总单枪日均充电量；"
+                   "完整运营年采用实测值，其余年份按拟合的爬坡曲线外推。超大文件请放入服务器日志目录 (EV_INGEST_DIR)，或使用 python -m ev_model.ingest。")
+        l1, l2 = st.columns([2, 1])
+        uploaded = l1.file_uploader("上传会话日志 (CSV，可为 .gz)", type=["csv", "gz"], key="log_upload")
+        path = None
+        if INGEST_DIR and os.path.isdir(INGEST_DIR):
+            files = sorted(f for f in os.listdir(INGEST_DIR) if f.endswith((".csv", ".gz")) and os.path.isfile(os.path.join(INGEST_DIR, f)))
+            name = l1.selectbox("或服务器日志目录中的文件", files, index=None, placeholder="选择文件", key="log_server_file")
+            if name is not None: path = os.path.join(INGEST_DIR, name)
+        date_format = l2.text_input("时间格式 (留空自动识别)", placeholder="%Y-%m-%d %H:%M:%S", key="log_date_format")
+        if st.button("📥 读取会话日志", key="log_read", disabled=uploaded is None and path is None):
+            status = st.empty()
+            try: st.session_state['session_log'] = read_session_log(uploaded if uploaded is not None else path, date_format=date_format or None,
+                                                                     on_chunk=lambda rows: status.caption(f"已读取 {rows:,} 行..."))
+            except Exception as e: st.error(f"读取失败：{e}"); return
+            status.empty()
+        log = st.session_state.get('session_log')
+        if log is None: return
+
+        max_kwh = inputs['pile_power_kw'] / max(inputs['guns_per_pile'], 1) * 24
+        n_guns = l2.number_input("枪数 (默认按日志桩号/枪号计数)", value=log.default_guns(), min_value=1, step=1, key="log_guns")
+        df_ops, info = calibrate_ops_table(log, edited_df, n_guns, ceiling=max_kwh)
+        c1, c2, c3, c4 = st.columns(4)
+        c1.metric("📄 有效会话", f"{log.rows - log.skipped:,}", f"跳过 {log.skipped:,} 行", delta_color="off")
+        c2.metric("📅 覆盖天数", f"{log.n_days:,}", f"{info['actual_years']} 个完整运营年", delta_color="off")
+        c3.metric("📈 爬坡平台值", f"{info['K']:,.0f} kWh", f"时间常数 {info['tau']:,.0f} 天", delta_color="off")
+        c4.metric("🔌 最近一月单枪日均", f"{log.monthly(n_guns)['单枪日均 (kWh)'].iloc[-1]:,.0f} kWh")
+        tab_ops, tab_month, tab_hour = st.tabs(["年度表预览", "月度汇总", "时段分布"])
+        with tab_ops:
+            df_view = pd.DataFrame({"年份": edited_df["年份"].to_numpy(), "当前表内 (kWh)": edited_df["单枪日均充电量 (kWh)"].to_numpy(),
+                                    "校准后 (kWh)": df_ops["单枪日均充电量 (kWh)"].to_numpy(),
+                                    "来源": ["实测" if i < info['actual_years'] else "爬坡外推" for i in range(len(df_ops))]})
+            st.dataframe(df_view, use_container_width=True, hide_index=True)
+        with tab_month:
+            st.dataframe(log.monthly(n_guns).style.format({"充电量 (kWh)": "{:,.0f}", "会话数": "{:,}", "单枪日均 (kWh)": "{:,.1f}"}), use_container_width=True, hide_index=True, height=300)
+        with tab_hour:
+            st.bar_chart(log.hour_of_day(n_guns).set_index("时段")["单枪平均功率 (kW)"], use_container_width=True)
+        b1, b2 = st.columns(2)
+        if b1.button("📥 写入年度运营表", key="log_apply"):
+            st.session_state['df_config_cache'] = df_ops
+            st.rerun()
+        if b2.button("⏱️ 用作小时级仿真负荷曲线", key="log_use_profile"):
+            st.session_state['log_profile'] = log_profile(log)
+            st.toast("已保存实测负荷曲线，小时级仿真未上传曲线时将优先使用。", icon="✅")
+
+@st.cache_data(max_entries=8, show_spinner=False)
+def cached_sessions(inputs, daily_arrivals, fleet, seed):
+    return simulate_sessions(inputs, daily_arrivals, fleet, seed=seed)
+
+@traced_fragment
+def render_session_simulator(edited_df, inputs):
+    with st.expander("🚗 **充电会话仿真：由到站车流推算实际日均充电量**", expanded=False):
+        st.caption("按随机到站、电池 SOC、车辆充电曲线及桩/枪拓扑 (同桩多枪共享主机功率、变压器容量上限) 逐分钟仿真全年会话，"
+                   "得到实际可实现的单枪日均充电量、排队等待与流失车次，可一键写入上方年度表。")
+        total_guns = inputs['qty_piles'] * inputs['guns_per_pile']
+        c1, c2, c3 = st.columns(3)
+        mode = c1.radio("到站车流", ["按年度表需求反推", "首年到站量 + 年增长"], key="sim_mode")
+        if mode == "首年到站量 + 年增长":
+            first = c1.number_input("首年全站日均到站 (辆)", value=30.0, min_value=0.0, step=5.0, key="sim_first")
+            growth = c1.number_input("到站量年增长率", value=0.15, step=0.01, format="%.2f", key="sim_growth")
+            daily_arrivals = first * (1 + growth) ** np.arange(len(edited_df))
+        max_wait = c2.number_input("最长排队容忍 (分钟)", value=DEFAULT_FLEET["max_wait_min"], min_value=0.0, step=5.0, key="sim_wait")
+        soc_target = c2.slider("离站目标 SOC", 0.5, 1.0, DEFAULT_FLEET["soc_target"], 0.05, key="sim_target")
+        soc_arrival = c3.slider("到站 SOC 区间", 0.0, 0.9, DEFAULT_FLEET["soc_arrival"], 0.05, key="sim_soc")
+        battery = c3.slider("电池容量区间 (kWh)", 20.0, 150.0, DEFAULT_FLEET["battery_kwh"], 5.0, key="sim_battery")
+        fleet = dict(DEFAULT_FLEET, max_wait_min=max_wait, soc_target=soc_target, soc_arrival=soc_arrival, battery_kwh=battery)
+        if mode == "按年度表需求反推": daily_arrivals = arrivals_from_kwh(edited_df["单枪日均充电量 (kWh)"].to_numpy(dtype=float), total_guns, fleet)
+        if soc_arrival[1] >= soc_target: st.info("到站 SOC 区间跨过目标 SOC：已达目标的车辆视为到站即服务、不充电，反推到站量时已计入。")
+
+        if st.button("▶️ 运行会话仿真", key="sim_run"):
+            with st.spinner(f"正在仿真 {len(edited_df)} 年 × 365 天的充电会话..."):
+                st.session_state['session_sim'] = cached_sessions(inputs, tuple(np.round(daily_arrivals, 4)), fleet, 0)
+        sim = st.session_state.get('session_sim')
+        if sim is None or len(sim["daily_kwh"]) != len(edited_df): return
+        df_sim = pd.DataFrame({
+            "年份": edited_df["年份"], "日均到站 (辆)": sim["arrivals"] / 365, "表内单枪日均 (kWh)": edited_df["单枪日均充电量 (kWh)"].to_numpy(),
+            "仿真单枪日均 (kWh)": sim["daily_kwh_per_gun"], "枪利用率": sim["utilization"], "平均等待 (分钟)": sim["mean_wait_min"],
+            "P95 等待 (分钟)": sim["p95_wait_min"], "流失车次 (年)": sim["turned_away"], "流失率": sim["turn_away_rate"],
+        })
+        st.dataframe(df_sim.style.format({"日均到站 (辆)": "{:,.1f}", "表内单枪日均 (kWh)": "{:,.0f}", "仿真单枪日均 (kWh)": "{:,.0f}", "枪利用率": "{:.1%}",
+                                          "平均等待 (分钟)": "{:.1f}", "P95 等待 (分钟)": "{:.1f}", "流失车次 (年)": "{:,.0f}", "流失率": "{:.1%}"}),
+                     use_container_width=True, hide_index=True)
+        if st.button("📥 将仿真结果写入年度运营表", key="sim_apply"):
+            df_new = edited_df[OPS_COLUMNS].copy()
+            df_new["单枪日均充电量 (kWh)"] = np.round(sim["daily_kwh_per_gun"]).astype(int)
+            st.session_state['df_config_cache'] = df_new
+            st.rerun()
+
+@traced_fragment
+def render_sizing_section(edited_df, inputs):
+    with st.expander("🧮 **最优配置搜索 (主机 / 枪数 / 变压器)**", expanded=False):
+        st.caption("以当前年度表 × 当前总枪数作为站点需求，在主机数、单机枪数、主机功率、变压器数量与规格的组合中搜索最优方案；"
+                   "峰时超出设备或变压器能力的需求按日内负荷形状削减，主机总功率不得超过变压器容量。")
+        c1, c2, c3 = st.columns(3)
+        objective = c1.radio("优化目标", ["npv", "payback"], format_func=lambda o: {"npv": "NPV 最大", "payback": "回本期最短"}[o], key="size_objective")
+        discount_rate = c1.number_input("折现率 (%)", value=8.0, step=0.5, key="size_discount") / 100
+        budget = c1.number_input("CAPEX 预算上限 (0 为不限)", value=0.0, min_value=0.0, step=100000.0, key="size_budget")
+        pile_range = c2.slider("主机数范围 (台)", 1, 100, (1, 20), key="size_piles")
+        trans_range = c2.slider("变压器数范围 (台)", 1, 20, (1, 4), key="size_trans")
+        guns_options = c2.multiselect("可选单机枪数", [1, 2, 3, 4, 6, 8], default=[1, 2, 4, 6], key="size_guns")
+        price_1000 = c3.number_input("1000 kVA 单价", value=float(inputs['price_trans_unit'] if inputs['trans_val'] == 1000 else 200000), step=5000.0, key="size_price_1000")
+        price_1500 = c3.number_input("1500 kVA 单价", value=float(inputs['price_trans_unit'] if inputs['trans_val'] == 1500 else 250000), step=5000.0, key="size_price_1500")
+        oversubscription = c3.number_input("容量超配系数 (主机总功率 / kVA 上限)", value=1.0, min_value=0.5, step=0.05, key="size_oversub")
+        df_piles = st.data_editor(pd.DataFrame({"主机功率 (kW)": [float(inputs['pile_power_kw'])], "主机单价 (AED)": [float(inputs['price_pile_unit'])]}),
+                                  num_rows="dynamic", hide_index=True, key="size_pile_options")
+        pile_options = {float(r["主机功率 (kW)"]): float(r["主机单价 (AED)"]) for _, r in df_piles.dropna().iterrows() if r["主机功率 (kW)"] > 0}
+        if not guns_options or not pile_options: st.warning("请至少选择一种单机枪数与主机功率。"); return
+
+        if st.button("🔍 搜索最优配置", key="size_run"):
+            st.session_state['sizing_result'] = optimize_sizing(
+                edited_df, inputs, objective, budget or None, pile_range, trans_range, {1000: price_1000, 1500: price_1500},
+                sorted(guns_options), pile_options, discount_rate, oversubscription)
+        result = st.session_state.get('sizing_result')
+        if result is None: return
+        stats = result["stats"]
+        st.caption(f"候选 {stats['candidates']:,} 个，满足容量/预算约束 {stats['feasible']:,} 个，经上界剪枝后精确测算 {stats['evaluated']:,} 个。")
+        if result["shortlist"].empty: st.warning("没有满足约束的配置，请放宽预算或搜索范围。"); return
+        st.dataframe(result["shortlist"].style.format({"主机功率 (kW)": "{:,.0f}", "初始投资": "{:,.0f}", "NPV": "{:,.0f}", "IRR": "{:.1%}",
+                                                        "回本期": "{:.1f}", "期末累计现金流": "{:,.0f}", "需求满足率": "{:.1%}"}, na_rep="—"),
+                     use_container_width=True, hide_index=True)
+        rank = st.selectbox("选择方案", result["shortlist"]["排名"], key="size_pick")
+        if st.button("📥 采用该方案 (更新规模参数与年度表单枪日均充电量)", key="size_apply"):
+            st.session_state['restored_inputs'] = {**inputs, **result["designs"][rank - 1]}
+            st.session_state['restore_gen'] = st.session_state.get('restore_gen', 0) + 1
+            df_new = edited_df[OPS_COLUMNS].copy()
+            df_new["单枪日均充电量 (kWh)"] = np.round(result["daily_kwh_per_gun"][rank - 1]).astype(int)
+            st.session_state['df_config_cache'] = df_new
+            st.session_state.pop('sizing_result', None)
+            st.rerun()
+
+def render_monte_carlo_config():
+    with st.expander("🎲 **风险模拟模式 (Monte Carlo, Optional)**", expanded=False):
+        enabled = st.checkbox("启用蒙特卡洛风险模拟", value=False, key="mc_enabled")
+        st.caption("各参数按所选分布围绕当前基准值抽样，幅度为相对基准值的比例 (正态为标准差，均匀/三角为半宽)。")
+        m1, m2 = st.columns(2)
+        n_draws = m1.number_input("模拟次数", value=200000, min_value=1000, max_value=2000000, step=10000, key="mc_draws")
+        seed = m2.number_input("随机种子", value=42, min_value=0, step=1, key="mc_seed")
+        dist_spec = {}
+        for key, label in MC_PARAMS.items():
+            d1, d2 = st.columns(2)
+            dist_name = d1.selectbox(label, list(MC_DISTRIBUTIONS), index=1, key=f"mc_dist_{key}")
+            spread = d2.number_input("幅度(%)", value=10.0, min_value=0.0, max_value=100.0, step=1.0, key=f"mc_spread_{key}") / 100
+            dist_spec[key] = (MC_DISTRIBUTIONS[dist_name], spread)
+    if not enabled: return None
+    return {"dist_spec": dist_spec, "n_draws": int(n_draws), "seed": int(seed)}
+
+def _content_key(*parts):
+    return hashlib.sha1(json.dumps(parts, default=str, sort_keys=True).encode()).hexdigest()
+
+def _submit_job(slot, key, name, func, *args, **kwargs):
+    job_id = get_job_manager().submit(st.session_state.get('session_id'), name, func, *args, key=key, **kwargs)
+    st.query_params[f"job_{slot}"] = job_id
+    return get_job_manager().get(job_id)
+
+def _attach_job(slot, key, name, func, *args, **kwargs):
+    """按地址栏中的任务 ID 重新关联 (页面刷新后仍可找回)；输入变化时放弃旧任务 (没有其他会话关联时才取消)，
+    优先复用任意会话中相同输入的排队/运行/已完成任务，否则提交新任务"""
+    manager, sid = get_job_manager(), st.session_state.get('session_id')
+    job = manager.get(st.query_params.get(f"job_{slot}"))
+    if job is not None and job.key == key: return manager.attach(job.id, sid) or job
+    if job is not None: manager.release(job.id, sid)
+    job = next((j for j in manager.jobs() if j.key == key and j.status in ("queued", "running", "done")), None)
+    if job is None: return _submit_job(slot, key, name, func, *args, **kwargs)
+    st.query_params[f"job_{slot}"] = job.id
+    return manager.attach(job.id, sid) or job
+
+@st.fragment(run_every=JOB_POLL_SECONDS)
+def render_job_progress(job_id, render_partial=None):
+    """任务进度面板：定时只重跑本片段；任务结束后整页重跑以渲染最终结果"""
+    manager = get_job_manager()
+    job = manager.get(job_id)
+    if job is None or job.done: st.rerun()
+    sid = st.session_state.get('session_id')
+    manager.attach(job.id, sid)   # 每次轮询续期本会话的关联记录
+    p1, p2 = st.columns([5, 1])
+    text = "排队中，等待空闲线程..." if job.status == "queued" else f"{job.message or '运行中...'} · 已用时 {job.elapsed:.0f}s"
+    p1.progress(min(job.progress, 1.0), text=f"⏳ {job.name}：{text}")
+    # 仅当本会话是唯一关联者时可取消，不影响共用该任务的其他会话
+    if manager.watchers(job.id) == {sid} and p2.button("⏹️ 取消", key=f"job_cancel_{job.id}", use_container_width=True):
+        manager.cancel(job.id)
+    if render_partial is not None and job.partial is not None: render_partial(job.partial)
+
+def run_as_job(slot, key, name, func, *args, render_partial=None, **kwargs):
+    """在后台线程池中运行耗时分析：已完成时返回结果，否则显示进度 / 取消 / 重新运行并返回 None"""
+    job = _attach_job(slot, key, name, func, *args, **kwargs)
+    if job.status == "done": return job.result
+    if job.status in ("cancelled", "failed"):
+        reason = "已取消" if job.status == "cancelled" else f"运行失败：{job.error.splitlines()[0]}"
+        r1, r2 = st.columns([5, 1])
+        r1.warning(f"{job.name}：{reason}")
+        if r2.button("🔁 重新运行", key=f"job_rerun_{slot}", use_container_width=True):
+            _submit_job(slot, key, name, func, *args, **kwargs); st.rerun()
+        return None
+    render_job_progress(job.id, render_partial)
+    return None
+
+def render_mc_partial(partial):
+    p = partial['payback']
+    st.caption(f"中间结果 ({partial['n_draws']:,} 次)：回本概率 {partial['prob_payback']:.1%} · 回本期 P10 {_fmt_payback(p['P10'])} / "
+               f"P50 {_fmt_payback(p['P50'])} / P90 {_fmt_payback(p['P90'])}")
+
+def render_fan_chart(df_fan, font_prop):
+    fig, ax = plt.subplots(figsize=(12, 4.5))
+    x = np.arange(len(df_fan))
+    ax.fill_between(x, df_fan["P5"], df_fan["P95"], color="#1a2a6c", alpha=0.12, label="P5–P95")
+    ax.fill_between(x, df_fan["P10"], df_fan["P90"], color="#1a2a6c", alpha=0.2, label="P10–P90")
+    ax.fill_between(x, df_fan["P25"], df_fan["P75"], color="#1a2a6c", alpha=0.3, label="P25–P75")
+    ax.plot(x, df_fan["P50"], color="#b21f1f", linewidth=2, label="P50")
+    ax.axhline(0, color="#999", linewidth=0.8, linestyle="--")
+    ax.set_xticks(x); ax.set_xticklabels(df_fan.index)
+    ax.yaxis.set_major_formatter(plt.FuncFormatter(lambda v, _: f"{v:,.0f}"))
+    ax.set_title("累计现金流分位数扇形图", fontproperties=font_prop); ax.legend(loc="upper left"); ax.grid(alpha=0.2)
+    st.pyplot(fig, use_container_width=True); plt.close(fig)
+
+def _fmt_payback(value):
+    return f"{value:.1f} 年" if np.isfinite(value) else "未回本"
+
+def _sweep_axis(col, key, inputs, axis):
+    base = 1.0 if key == KWH_SCALE_KEY else float(inputs[key])
+    lo = col.number_input(f"{axis} 最小值", value=base * 0.5, key=f"sw_{axis}_lo_{key}", format="%.4g")
+    hi = col.number_input(f"{axis} 最大值", value=base * 1.5 if base else 1.0, key=f"sw_{axis}_hi_{key}", format="%.4g")
+    steps = col.slider(f"{axis} 网格数", min_value=5, max_value=200, value=50, key=f"sw_{axis}_n_{key}")
+    if key in INTEGER_KEYS: return np.unique(np.round(np.linspace(max(lo, 1), max(hi, 1), steps)))
+    return np.round(np.linspace(lo, hi, steps), 6)
+
+def render_heatmap(grid, xs, ys, x_label, y_label, title, cmap, font_prop):
+    fig, ax = plt.subplots(figsize=(6.5, 5))
+    cm = plt.get_cmap(cmap).copy(); cm.set_bad("#d0d0d0")
+    im = ax.imshow(np.ma.masked_invalid(grid), origin="lower", aspect="auto", cmap=cm,
+                   extent=[xs[0], xs[-1], ys[0], ys[-1]] if len(xs) > 1 and len(ys) > 1 else None)
+    fig.colorbar(im, ax=ax).ax.yaxis.set_major_formatter(plt.FuncFormatter(lambda v, _: f"{v:,.1f}" if abs(v) < 100 else f"{v:,.0f}"))
+    ax.set_xlabel(x_label, fontproperties=font_prop); ax.set_ylabel(y_label, fontproperties=font_prop); ax.set_title(title, fontproperties=font_prop)
+    st.pyplot(fig, use_container_width=True); plt.close(fig)
+
+@traced_fragment
+def render_sensitivity_section(edited_df, inputs, base_cash, font_prop):
+    st.divider()
+    st.header("🌪️ 敏感性分析 (Sensitivity)")
+    if not st.checkbox("启用敏感性分析 (龙卷风图 / 参数扫描)", value=False, key="sens_enabled"): return
+    keys = sensitivity_keys(inputs)
+    label = lambda k: SENSITIVITY_LABELS.get(k, k)
+    tab_tornado, tab_sweep = st.tabs(["🌪️ 龙卷风图", "🔥 二维参数扫描"])
+    with tab_tornado:
+        delta = st.number_input("扰动幅度 ±Δ (%)", value=10.0, min_value=1.0, max_value=90.0, step=1.0, key="sens_delta") / 100
+        df_t = run_tornado(edited_df, inputs, delta, keys)
+        df_top = df_t[df_t["波动"] > 0].head(15).iloc[::-1]
+        fig, ax = plt.subplots(figsize=(10, 0.45 * len(df_top) + 1.5))
+        y = np.arange(len(df_top))
+        ax.barh(y, df_top["期末累计(低)"] - base_cash, left=base_cash, color="#b21f1f", alpha=0.8, label="-Δ")
+        ax.barh(y, df_top["期末累计(高)"] - base_cash, left=base_cash, color="#1a2a6c", alpha=0.8, label="+Δ")
+        ax.axvline(base_cash, color="#333", linewidth=1)
+        ax.set_yticks(y); ax.set_yticklabels(df_top["参数"], fontproperties=font_prop)
+        ax.xaxis.set_major_formatter(plt.FuncFormatter(lambda v, _: f"{v:,.0f}"))
+        ax.set_title("期末累计现金流敏感性 (龙卷风图)", fontproperties=font_prop); ax.legend(loc="lower right"); ax.grid(axis="x", alpha=0.2)
+        st.pyplot(fig, use_container_width=True); plt.close(fig)
+        st.dataframe(df_t.drop(columns="key").style.format({"低值": "{:,.4g}", "高值": "{:,.4g}", "期末累计(低)": "{:,.0f}", "期末累计(高)": "{:,.0f}", "回本期(低)": "{:.1f}", "回本期(高)": "{:.1f}", "波动": "{:,.0f}"}, na_rep="未回本"), use_container_width=True, hide_index=True)
+    with tab_sweep:
+        s1, s2 = st.columns(2)
+        x_key = s1.selectbox("X 轴参数", keys, index=keys.index("price_sale"), format_func=label, key="sw_x")
+        y_key = s2.selectbox("Y 轴参数", keys, index=keys.index(KWH_SCALE_KEY), format_func=label, key="sw_y")
+        xs = _sweep_axis(s1, x_key, inputs, "X"); ys = _sweep_axis(s2, y_key, inputs, "Y")
+        sweep = run_sweep(edited_df, inputs, x_key, xs, y_key, ys)
+        st.caption(f"网格 {len(ys)} × {len(xs)}，本次新计算 {sweep['computed']:,} 个情景 (其余来自缓存)。")
+        h1, h2 = st.columns(2)
+        with h1: render_heatmap(sweep["payback"], xs, ys, label(x_key), label(y_key), "动态回本期 (年，灰色=未回本)", "RdYlGn_r", font_prop)
+        with h2: render_heatmap(sweep["final_cash"], xs, ys, label(x_key), label(y_key), "期末累计现金流 (AED)", "RdYlGn", font_prop)
+
+@traced_fragment
+def render_portfolio_section(inputs, edited_df):
+    st.divider()
+    st.header("🗺️ 多站点组合 (Portfolio)")
+    if not st.checkbox("启用多站点组合评估", value=False, key="pf_enabled"): return
+    st.caption("每行一个站点：列名与参数键一致的列 (如 qty_piles、price_sale、cost_civil_work) 覆盖基准配置，Y1..Yn 为逐年单枪日均充电量，开业年份为相对首站的错峰年数。未填写的参数沿用上方设置。")
+    template = portfolio_template(inputs, edited_df)
+    u1, u2 = st.columns([3, 1])
+    uploaded = u1.file_uploader("上传站点表 (.csv)", type=["csv"], key="pf_upload")
+    u2.download_button("📄 下载站点表模板", template.to_csv(index=False).encode('utf-8-sig'), 'portfolio_sites_template.csv', 'text/csv', use_container_width=True)
+    if uploaded is not None:
+        try: sites_df = pd.read_csv(uploaded)
+        except Exception as e: st.error(f"读取失败：{e}"); return
+        st.caption(f"已载入 {len(sites_df):,} 个站点。")
+    else: sites_df = st.data_editor(template, num_rows="dynamic", hide_index=True, use_container_width=True, key="pf_editor")
+    if sites_df.empty: st.info("站点表为空。"); return
+
+    workers = (os.cpu_count() or 1) if len(sites_df) >= PORTFOLIO_PARALLEL_MIN_SITES else 1
+    key = _content_key("portfolio", pd.util.hash_pandas_object(sites_df, index=False).to_numpy().tobytes().hex(), scenario_key(edited_df, inputs))
+    pf = run_as_job("pf", key, f"{len(sites_df):,} 个站点组合评估", evaluate_portfolio, sites_df.copy(), inputs, edited_df.copy(), workers=workers)
+    if pf is None: return
+    c1, c2, c3, c4 = st.columns(4)
+    c1.metric("🏢 站点数", f"{len(sites_df):,}")
+    c2.metric("💰 组合总投资", f"{pf['total_capex']:,.0f}")
+    c3.metric("🏦 资金峰值需求", f"{pf['peak_funding']:,.0f}")
+    c4.metric("⏱️ 组合回本期", f"{pf['payback']:.1f} 年" if np.isfinite(pf['payback']) else "未回本")
+    tab_chart, tab_sites = st.tabs(["📈 组合现金流", "📄 站点明细"])
+    with tab_chart:
+        df_annual = pf["annual"].set_index("期间")
+        st.bar_chart(df_annual["组合FCF"], color="#1a2a6c", use_container_width=True)
+        st.line_chart(df_annual["组合累计现金流"], color="#b21f1f", use_container_width=True)
+        st.dataframe(pf["annual"].style.format("{:,.0f}", subset=["新增投资", "组合FCF", "组合累计现金流"]), use_container_width=True, hide_index=True)
+    with tab_sites:
+        df_sites = pf["sites"].sort_values("回本期", na_position="last")
+        st.dataframe(df_sites.head(5000).style.format({"初始投资": "{:,.0f}", "回本期": "{:.1f}", "回本时点": "{:.1f}", "期末累计现金流": "{:,.0f}"}, na_rep="未回本"), use_container_width=True, hide_index=True)
+        st.download_button("📥 下载站点明细 (.csv)", df_sites.to_csv(index=False).encode('utf-8-sig'), 'portfolio_sites_result.csv', 'text/csv')
+
+@traced_fragment
+def render_goal_seek_section(edited_df, inputs, df_res):
+    st.divider()
+    st.header("🎯 目标求解 (Goal Seek)")
+    g1, g2, g3 = st.columns(3)
+    discount_rate = g1.number_input("折现率 (%)", value=8.0, step=0.5, key="gs_discount") / 100
+    target_payback = g2.number_input("目标回本期 (年)", value=5.0, min_value=0.5, max_value=float(len(edited_df)), step=0.5, key="gs_payback")
+    hurdle_irr = g3.number_input("门槛 IRR (%)", value=12.0, step=0.5, key="gs_hurdle") / 100
+    fcf = df_res["自由现金流(FCF)"].to_numpy(dtype=float)
+    project_irr = irr(fcf)[0]
+    break_even = solve_break_even_price(edited_df, inputs)[0]
+    kwh_scale = solve_required_kwh_scale(edited_df, inputs, target_payback)[0]
+    max_pile = solve_max_pile_price(edited_df, inputs, hurdle_irr)[0]
+    avg_kwh = edited_df["单枪日均充电量 (kWh)"].mean()
+    c1, c2, c3, c4, c5 = st.columns(5)
+    c1.metric("💵 NPV", f"{npv(fcf, discount_rate)[0]:,.0f}")
+    c2.metric("📈 IRR", f"{project_irr:.1%}" if np.isfinite(project_irr) else "无解")
+    c3.metric("⚖️ 盈亏平衡电价", f"{break_even:.3f}" if np.isfinite(break_even) else "无解", f"当前 {inputs['price_sale']:.2f}", delta_color="off")
+    c4.metric(f"🔌 {target_payback:g} 年回本所需充电量", f"{kwh_scale * avg_kwh:,.0f} kWh" if np.isfinite(kwh_scale) else "无解",
+              f"当前表格 × {kwh_scale:.2f}" if np.isfinite(kwh_scale) else None, delta_color="off")
+    c5.metric("🏷️ 满足门槛的最高主机单价", f"{max_pile:,.0f}" if np.isfinite(max_pile) else "无解", f"当前 {inputs['price_pile_unit']:,.0f}", delta_color="off")
+    st.caption("盈亏平衡电价：运营期末累计现金流为 0；所需充电量为年度表日均值按同一倍数整体缩放后的平均值。")
+
+def _set_tracing(tracer):
+    tracer.enabled = st.session_state["perf_enabled"]
+
+def render_perf_panel(tracer):
+    with st.sidebar.expander("🛠️ 性能监控 (Admin)", expanded=False):
+        # 开关状态属于进程级 tracer：每次重跑以共享值刷新控件，只有本会话实际切换时才改写共享值
+        st.session_state["perf_enabled"] = tracer.enabled
+        st.toggle("记录重跑耗时 (全局)", key="perf_enabled", on_change=_set_tracing, args=(tracer,))
+        st.caption(f"日志：{tracer.log_path}")
+        stats = tracer.stage_stats()
+        if stats: st.dataframe(pd.DataFrame(stats).style.format({"p50 (ms)": "{:,.1f}", "p95 (ms)": "{:,.1f}", "平均内存变化 (MB)": "{:+.2f}"}), hide_index=True, use_container_width=True)
+        else: st.caption("暂无记录。")
+        exports, sweep, results = get_export_cache().stats(), sweep_cache_stats(), result_cache_stats()
+        hit_rate = lambda h, m: f"{h / (h + m):.0%} ({h}/{h + m})" if h + m else "—"
+        st.markdown(f"**缓存命中率**  \n图片导出：{hit_rate(exports['hits'], exports['misses'])} · {exports['bytes'] / 2 ** 20:.1f} MB  \n"
+                    f"参数扫描：{hit_rate(sweep['hits'], sweep['misses'])} · {sweep['entries']} 条带  \n"
+                    f"测算结果 (跨会话)：{hit_rate(results['hits'], results['misses'])} · {results['entries']} 条 · {results['bytes'] / 2 ** 20:.1f} MB")
+        jobs = get_job_manager().stats()
+        st.markdown(f"**后台任务** (线程 {jobs['workers']} · 每会话 {jobs['per_owner']})  \n运行 {jobs.get('running', 0)} · 排队 {jobs.get('queued', 0)} · "
+                    f"完成 {jobs.get('done', 0)} · 取消 {jobs.get('cancelled', 0)} · 失败 {jobs.get('failed', 0)}")
+
+def render_tou_tariff(inputs):
+    t1, t2, t3, t4 = st.columns(4)
+    peak_start, peak_end = t1.slider("峰时时段 (时)", 0, 24, (DEFAULT_TOU_TARIFF["peak_hours"][0], DEFAULT_TOU_TARIFF["peak_hours"][-1] + 1), key="tou_hours")
+    peak_months = t2.multiselect("峰时生效月份", list(range(1, 13)), default=DEFAULT_TOU_TARIFF["peak_months"], key="tou_months")
+    demand_charge = t3.number_input("需量电费 (AED/kW·月)", value=float(DEFAULT_TOU_TARIFF["demand_charge"]), step=5.0, key="tou_demand")
+    power_factor = t4.number_input("功率因数", value=DEFAULT_TOU_TARIFF["power_factor"], min_value=0.5, max_value=1.0, step=0.01, key="tou_pf")
+    p1, p2, p3, p4 = st.columns(4)
+    return {
+        "peak_hours": list(range(peak_start, peak_end)), "peak_months": peak_months,
+        "sale_peak": p1.number_input("峰时销售电价", value=DEFAULT_TOU_TARIFF["sale_peak"], step=0.05, key="tou_sale_peak"),
+        "sale_offpeak": p2.number_input("谷时销售电价", value=float(inputs['price_sale']), step=0.05, key="tou_sale_off"),
+        "cost_peak": p3.number_input("峰时进货电价", value=DEFAULT_TOU_TARIFF["cost_peak"], step=0.01, key="tou_cost_peak"),
+        "cost_offpeak": p4.number_input("谷时进货电价", value=float(inputs['price_cost']), step=0.01, key="tou_cost_off"),
+        "demand_charge": demand_charge, "power_factor": power_factor,
+    }
+
+@traced_fragment
+def render_hourly_section(edited_df, inputs):
+    st.divider()
+    st.header("⏱️ 小时级负荷仿真 (8760h · 分时电价)")
+    if not st.checkbox("启用小时级仿真与容量校核", value=False, key="hourly_enabled"): return
+    st.caption("按年度表的日均充电量得到年售电量，再按 8760 小时负荷曲线分配到每小时，计算分时电价营收/电费、需量电费及超出变压器容量的小时数。")
+    h1, h2 = st.columns([2, 1])
+    uploaded = h1.file_uploader("上传逐时负荷曲线 (CSV：8760 行，每列一年；或 .npy)", type=["csv", "npy"], key="hourly_upload")
+    weekend_factor = h2.number_input("周末负荷系数", value=1.1, min_value=0.0, step=0.05, key="hourly_weekend")
+    summer_factor = h2.number_input("夏季(6–9月)负荷系数", value=0.9, min_value=0.0, step=0.05, key="hourly_summer")
+    tariff = render_tou_tariff(inputs)
+    if uploaded is not None:
+        try: profile = load_profile(uploaded)
+        except Exception as e: st.error(f"读取失败：{e}"); return
+        if profile.ndim > 2: st.error(f"负荷曲线须为 (8760,) 或 (年数, 8760)，实际为 {profile.shape}"); return
+    elif st.session_state.get('log_profile') is not None and h1.checkbox("使用实测充电记录的负荷曲线", value=True, key="hourly_use_log"):
+        profile = st.session_state['log_profile']
+    else: profile = generate_profile(monthly_factors=[summer_factor if m in (6, 7, 8, 9) else 1.0 for m in range(1, 13)], weekend_factor=weekend_factor)
+
+    total_guns = inputs['qty_piles'] * inputs['guns_per_pile']
+    annual_kwh = edited_df["单枪日均充电量 (kWh)"].to_numpy(dtype=float)[None, :] * total_guns * 365
+    capacity = inputs['qty_trans'] * inputs['trans_val']
+    res = simulate_hourly(profile, annual_kwh, capacity, tariff, inputs['power_efficiency'], inputs['price_sale_growth'], inputs['price_cost_growth'])
+    flat_revenue = annual_kwh[0] * inputs['price_sale'] * (1 + inputs['price_sale_growth']) ** np.arange(annual_kwh.shape[1])
+    df_h = pd.DataFrame({"年份": edited_df["年份"], "年售电量 (kWh)": annual_kwh[0], "分时营收": res["revenue"][0], "其中峰时营收": res["peak_revenue"][0],
+                         "平价营收": flat_revenue, "购电电费": res["energy_cost"][0], "需量电费": res["demand_charge"][0], "电费合计": res["energy_bill"][0],
+                         "峰值负荷 (kW)": res["peak_kw"][0], "超容小时": res["exceed_hours"][0], "超容电量 (kWh)": res["unserved_kwh"][0]})
+    c1, c2, c3, c4 = st.columns(4)
+    c1.metric("💹 分时营收合计", f"{df_h['分时营收'].sum():,.0f}", f"{df_h['分时营收'].sum() - flat_revenue.sum():+,.0f} vs 平价", delta_color="normal")
+    c2.metric("⚡ 电费合计", f"{df_h['电费合计'].sum():,.0f}")
+    c3.metric("🌞 峰时营收占比", f"{df_h['其中峰时营收'].sum() / max(df_h['分时营收'].sum(), 1):.1%}")
+    c4.metric("🚨 超容小时 (全周期)", f"{int(df_h['超容小时'].sum()):,}", f"容量 {capacity * tariff['power_factor']:,.0f} kW", delta_color="off")
+    st.dataframe(df_h.style.format({c: "{:,.0f}" for c in df_h.columns if c != "年份"}), use_container_width=True, hide_index=True)
+
+    year = st.select_slider("查看年份负荷曲线", options=list(edited_df["年份"]), value=edited_df["年份"].iloc[-1], key="hourly_year")
+    y = list(edited_df["年份"]).index(year)
+    shape = np.asarray(profile if profile.ndim == 1 else profile[min(y, len(profile) - 1)], dtype=float)
+    load = shape * annual_kwh[0, y] / inputs['power_efficiency']
+    hours = exceedance_hours(shape, annual_kwh[0, y], capacity, tariff, inputs['power_efficiency'])
+    st.line_chart(pd.DataFrame({"电网侧负荷 (kW)": load, "变压器容量 (kW)": capacity * tariff['power_factor']}), color=["#1a2a6c", "#b21f1f"], use_container_width=True)
+    if len(hours): st.warning(f"⚠️ {year} 共 {len(hours)} 小时超出变压器容量，首个超容时段：第 {hours[0] // 24 + 1} 天 {hours[0] % 24}:00。")
+
 def render_run_button():
     st.divider()
     run_pressed = st.button("🚀 开始测算 (Run Analysis)", type="primary", use_container_width=True)
     return run_pressed
 
-def render_results_section(df_res, total_capex, payback_year, edited_df, font_prop):
+@traced_fragment
+def render_png_export(df_res, font_prop):
+    """表格图片按需生成：点击后渲染低分辨率预览，高清图仅在点击下载时渲染；二者均进入共享缓存"""
+    cache = get_export_cache()
+    preview_key = artifact_key("png", df_res, font_prop, dpi=EXPORT_PREVIEW_DPI)
+    full_key = artifact_key("png", df_res, font_prop, dpi=EXPORT_FULL_DPI)
+    if st.session_state.get('png_export_key') != full_key:
+        if not st.button("🖼️ 生成表格图片 (.png)", use_container_width=True): return
+        st.session_state['png_export_key'] = full_key
+    with get_tracer().stage("dataframe_to_png"):
+        preview = cache.get_or_compute(preview_key, lambda: dataframe_to_png(df_res, font_prop, EXPORT_PREVIEW_DPI).getvalue())
+    st.image(preview, use_container_width=True)
+    st.download_button("🖼️ 下载高清表格图片 (.png)", lambda: cache.get_or_compute(full_key, lambda: dataframe_to_png(df_res, font_prop, EXPORT_FULL_DPI).getvalue()),
+                       'financial_report_v10.7.png', 'image/png', use_container_width=True)
+
+def render_results_section(df_res, total_capex, payback_year, edited_df, font_prop, mc_result=None):
     st.divider()
     st.header("📊 测算结果报告 (Results Report)")
     total_net_profit = df_res["净利润"].sum()
@@ -381,8 +823,16 @@ def render_results_section(df_res, total_capex, payback_year, edited_df, font_pr
     if payback_year and payback_year <= len(df_res) + 1: c4.metric("⏱️ 动态回本期", f"{payback_year:.1f} 年", delta="已回本", delta_color="normal")
     else: c4.metric("⏱️ 动态回本期", "未回本", delta="周期外", delta_color="inverse")
 
+    if mc_result is not None:
+        st.markdown(f"##### 🎲 风险模拟 ({mc_result['n_draws']:,} 次) · 回本概率 {mc_result['prob_payback']:.1%}")
+        r1, r2, r3 = st.columns(3)
+        for col, p in zip((r1, r2, r3), ("P10", "P50", "P90")):
+            col.metric(f"⏱️ 回本期 {p}", _fmt_payback(mc_result['payback'][p]), f"期末累计 {mc_result['final_cash'][p]:,.0f}", delta_color="off")
+
     tab_chart, tab_table = st.tabs(["📈 现金流曲线", "📄 详细报表"])
-    with tab_chart: st.area_chart(df_res.set_index("年份")["累计现金流"], color="#1a2a6c", use_container_width=True)
+    with tab_chart:
+        if mc_result is not None: render_fan_chart(mc_result['cumulative_cash'], font_prop)
+        else: st.area_chart(df_res.set_index("年份")["累计现金流"], color="#1a2a6c", use_container_width=True)
     with tab_table:
         cols_to_show = ["营收", "成本(OPEX)", "折旧(抵税)", "息税前利(EBIT)", "税金", "净利润", "自由现金流(FCF)", "累计现金流"]
         st.dataframe(df_res.style.format("{:,.0f}", subset=cols_to_show), use_container_width=True)
@@ -393,8 +843,7 @@ def render_results_section(df_res, total_capex, payback_year, edited_df, font_pr
         with c1:
             csv_report = df_res.to_csv(index=False).encode('utf-8-sig')
             st.download_button("📄 下载财务报告 (.csv)", csv_report, 'financial_report_v10.7.csv', 'text/csv', use_container_width=True)
-            png_buffer = dataframe_to_png(df_res, font_prop)
-            st.download_button("🖼️ 下载表格图片 (.png)", png_buffer, 'financial_report_v10.7.png', 'image/png', use_container_width=True)
+            render_png_export(df_res, font_prop)
         with c2:
             csv_config = edited_df[["单枪日均充电量 (kWh)", "运营人数 (人)", "人均年薪 (AED)"]].to_csv(index=False).encode('utf-8-sig')
             st.download_button("💾 保存当前配置 (.csv)", csv_config, 'operation_config_v10.7.csv', 'text/csv', use_container_width=True)
@@ -402,24 +851,69 @@ def render_results_section(df_res, total_capex, payback_year, edited_df, font_pr
 # ==========================================
 # 6. 主控制流
 # ==========================================
+def _init_session_id():
+    """会话标识 (任务提交者 / 关联者身份) 只保存在服务端会话中，不写入可分享的地址栏；
+    地址栏中的 job_* 仅用于重新关联任务。刷新后的页面在旧页面的关联记录过期后即可取消该任务"""
+    if 'session_id' not in st.session_state: st.session_state['session_id'] = uuid.uuid4().hex[:12]
+    if "sid" in st.query_params: del st.query_params["sid"]   # 旧版本写入的会话标识
+
 def main():
     st.set_page_config(**PAGE_CONFIG)
-    zh_font = load_custom_font()
+    tracer = get_tracer()
+    _init_session_id()
+    tracer.begin(st.session_state['session_id'])
+    try: _run_page(tracer)
+    finally: tracer.end(run_analysis=st.session_state.get('run_analysis', False))
+
+def _run_page(tracer):
+    with tracer.stage("load_custom_font"): zh_font = load_custom_font()
     check_password()
-    render_header()
-    render_config_import()
-    inputs = render_base_params_section()
-    inputs = render_project_scale_section(inputs)
-    capex_data = render_capex_preview(inputs)
-    edited_df = render_dynamic_table_section(inputs['years_duration'])
+    render_perf_panel(tracer)
+    with tracer.stage("render_header"): render_header(); render_config_import()
+    store = get_scenario_store()
+    with tracer.stage("render_scenario_library"): render_scenario_library(store)
+    render_inputs_fragment(store, zh_font)
+
+@traced_fragment
+def render_inputs_fragment(store, zh_font):
+    """参数片段：基础参数/规模变化只重跑本片段 (CAPEX 预览及下游模型)，不重绘页头与情景库"""
+    tracer = get_tracer()
+    with tracer.stage("render_base_params_section"): inputs = render_base_params_section()
+    with tracer.stage("render_project_scale_section"): inputs = render_project_scale_section(inputs)
+    with tracer.stage("render_capex_preview"): capex_data = render_capex_preview(inputs)
+    render_model_fragment(inputs, capex_data, store, zh_font)
+
+@traced_fragment
+def render_model_fragment(inputs, capex_data, store, zh_font):
+    """模型片段：年度表/风险设置变化只重算财务模型并重绘结果；各分析模块为嵌套片段，其控件只重跑自身"""
+    tracer = get_tracer()
+    with tracer.stage("render_dynamic_table_section"): edited_df = render_dynamic_table_section(inputs['years_duration'])
+    render_session_log_section(edited_df, inputs)
+    render_session_simulator(edited_df, inputs)
+    render_sizing_section(edited_df, inputs)
+    mc_config = render_monte_carlo_config()
     
     if 'run_analysis' not in st.session_state: st.session_state['run_analysis'] = False
     if render_run_button(): st.session_state['run_analysis'] = True
 
     if st.session_state['run_analysis']:
-        with st.spinner("正在进行复杂财务测算..."):
-            df_res, payback_year = calculate_financial_model(edited_df, capex_data, inputs)
-        render_results_section(df_res, capex_data['total_capex'], payback_year, edited_df, zh_font)
+        key = scenario_key(edited_df, inputs)
+        with st.spinner("正在进行复杂财务测算..."), tracer.stage("calculate_financial_model"):
+            stored = store.load(key)
+            if stored is not None: df_res, payback_year = stored['results'], stored['payback']
+            else: df_res, payback_year = cached_financial_model(edited_df, capex_data, inputs)
+        mc_result = None
+        if mc_config is not None:
+            with tracer.stage("run_monte_carlo"):
+                mc_key = _content_key("monte_carlo", key, mc_config)
+                mc_result = run_as_job("mc", mc_key, f"蒙特卡洛风险模拟 ({mc_config['n_draws']:,} 次)", run_monte_carlo, edited_df.copy(), inputs,
+                                       mc_config['dist_spec'], mc_config['n_draws'], mc_config['seed'], render_partial=render_mc_partial)
+        with tracer.stage("render_results_section"): render_results_section(df_res, capex_data['total_capex'], payback_year, edited_df, zh_font, mc_result)
+        render_scenario_save(store, key, edited_df, inputs, df_res, payback_year)
+        render_goal_seek_section(edited_df, inputs, df_res)
+        render_hourly_section(edited_df, inputs)
+        render_sensitivity_section(edited_df, inputs, df_res["累计现金流"].iloc[-1], zh_font)
+        render_portfolio_section(inputs, edited_df)
     else:
         st.info("👉 请按照顺序设置参数，最后点击上方按钮开始测算。")
 
@@ -0,0 +1,241 @@
+"""多会话并发压测：启动 (或连接) 本地 Streamlit 服务，模拟 N 个已登录用户并发执行“修改参数 → 测算 → 改表 → 下载”
+
+客户端直接使用 Streamlit 的 WebSocket 协议 (与浏览器前端相同的 BackMsg / ForwardMsg)：按标签定位控件，
+把控件所在片段 ID 随重跑请求发送，因此片段局部重跑与真实浏览器一致；下载按钮通过 HTTP 拉取媒体文件。
+
+    python benchmarks/load_test.py -n 10                       # 启动临时服务，10 个并发会话
+    python benchmarks/load_test.py -n 20 --iterations 5 --output load.json
+    python benchmarks/load_test.py --url http://localhost:8501 -n 5   # 压测已运行的服务 (不统计服务端内存)
+
+输出每个会话各步骤的延迟、各步骤 p50/p95、服务端常驻内存基线/峰值及每会话平均增量。
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from urllib.request import urlopen
+
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+from websockets.asyncio.client import connect
+
+ROOT = Path(__file__).resolve().parent.parent
+DEFAULT_PASSWORD = "DbeVc"
+STEP_TIMEOUT = 120
+_DONE = {ForwardMsg.FINISHED_SUCCESSFULLY, ForwardMsg.FINISHED_WITH_COMPILE_ERROR, ForwardMsg.FINISHED_FRAGMENT_RUN_SUCCESSFULLY}
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0)); return s.getsockname()[1]
+
+def _rss_mb(pid):
+    with open(f"/proc/{pid}/statm") as f: return int(f.read().split()[1]) * _PAGE_SIZE / 2 ** 20
+
+def start_server(port, store_dir):
+    """以无界面模式启动 app.py，等待健康检查通过"""
+    env = dict(os.environ, EV_SCENARIO_STORE=store_dir)
+    proc = subprocess.Popen([sys.executable, "-m", "streamlit", "run", str(ROOT / "app.py"), "--server.headless", "true",
+                             "--server.port", str(port), "--browser.gatherUsageStats", "false"],
+                            cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        if proc.poll() is not None: raise RuntimeError(f"服务启动失败：{proc.stderr.read().decode(errors='replace')[-2000:]}")
+        try:
+            with urlopen(f"http://127.0.0.1:{port}/_stcore/health", timeout=1) as r:
+                if r.status == 200: return proc
+        except OSError: time.sleep(0.2)
+    proc.kill(); raise RuntimeError("服务启动超时")
+
+
+class Session:
+    """一个浏览器会话：维护控件状态，按标签查找控件并以其片段 ID 触发重跑"""
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip("/")
+        self.widgets = {}
+        self.states = {}
+        self.conn = None
+
+    async def connect(self):
+        ws_url = self.base_url.replace("http", "ws", 1) + "/_stcore/stream"
+        self.conn = await connect(ws_url, origin=self.base_url, subprotocols=["streamlit"], max_size=None)
+        return await self.rerun()
+
+    async def close(self):
+        if self.conn is not None: await self.conn.close()
+
+    def _record(self, msg):
+        if msg.WhichOneof("type") != "delta" or msg.delta.WhichOneof("type") != "new_element": return
+        element = msg.delta.new_element
+        kind = element.WhichOneof("type")
+        proto = getattr(element, kind)
+        widget_id = getattr(proto, "id", "")
+        if not widget_id: return
+        # 可编辑表格没有标签，以控件 key (ID 末段，无 key 时为 None) 区分
+        label = getattr(proto, "label", "") or (f"data_editor:{widget_id.rsplit('-', 1)[-1]}" if kind == "dataframe" and proto.editing_mode else kind)
+        self.widgets[(kind, label)] = (widget_id, msg.delta.fragment_id, proto)
+
+    def find(self, kind, label):
+        """按控件类型 + 标签前缀查找 (id, 片段 ID, proto)"""
+        for (k, text), value in self.widgets.items():
+            if k == kind and text.startswith(label): return value
+        raise KeyError(f"未找到控件 {kind}:{label}")
+
+    async def rerun(self, fragment_id="", triggers=()):
+        """发送一次重跑请求 (携带全部已设置的控件状态 + 本次触发的按钮)，等待脚本结束；返回耗时 (秒)"""
+        msg = BackMsg()
+        client = msg.rerun_script
+        client.fragment_id = fragment_id
+        for widget_id, (field, value) in self.states.items():
+            state = client.widget_states.widgets.add(); state.id = widget_id; setattr(state, field, value)
+        for widget_id in triggers:
+            state = client.widget_states.widgets.add(); state.id = widget_id; state.trigger_value = True
+        started = time.perf_counter()
+        await self.conn.send(msg.SerializeToString())
+        while True:
+            raw = await asyncio.wait_for(self.conn.recv(), STEP_TIMEOUT)
+            fwd = ForwardMsg(); fwd.ParseFromString(raw)
+            kind = fwd.WhichOneof("type")
+            if kind == "delta":
+                if fwd.delta.new_element.WhichOneof("type") == "exception": raise RuntimeError(fwd.delta.new_element.exception.message)
+                self._record(fwd)
+            elif kind == "script_finished" and fwd.script_finished in _DONE:
+                if fwd.script_finished == ForwardMsg.FINISHED_WITH_COMPILE_ERROR: raise RuntimeError("脚本编译错误")
+                return time.perf_counter() - started
+
+    async def set_value(self, kind, label, field, value):
+        widget_id, fragment_id, _ = self.find(kind, label)
+        self.states[widget_id] = (field, value)
+        return await self.rerun(fragment_id)
+
+    async def click(self, label, extra_states=()):
+        widget_id, fragment_id, _ = self.find("button", label)
+        for kind, text, field, value in extra_states:
+            self.states[self.find(kind, text)[0]] = (field, value)
+        return await self.rerun(fragment_id, triggers=[widget_id])
+
+    async def download(self, label):
+        """按下载按钮的媒体 URL 拉取文件，返回 (耗时, 字节数)"""
+        _, _, proto = self.find("download_button", label)
+        started = time.perf_counter()
+        body = await asyncio.to_thread(lambda: urlopen(self.base_url + proto.url, timeout=STEP_TIMEOUT).read())
+        return time.perf_counter() - started, len(body)
+
+
+async def run_session(index, base_url, password, iterations, think_time, results):
+    """登录 → [改电价 → 测算 → 改年度表某一行 → 下载报告] × iterations，记录每步延迟"""
+    rng = random.Random(index)
+    timings = {}
+    record = lambda step, seconds: timings.setdefault(step, []).append(seconds)
+    session = Session(base_url)
+    try:
+        record("connect", await session.connect())
+        record("login", await session.click("验证登录", [("text_input", "请输入授权密码", "string_value", password)]))
+        for _ in range(iterations):
+            await asyncio.sleep(rng.uniform(0, think_time))
+            record("edit_param", await session.set_value("number_input", "销售电价", "double_value", round(rng.uniform(0.9, 1.6), 2)))
+            record("run", await session.click("🚀 开始测算"))
+            await asyncio.sleep(rng.uniform(0, think_time))
+            edit = {"edited_rows": {str(rng.randrange(5)): {"单枪日均充电量 (kWh)": rng.randrange(50, 600)}}, "added_rows": [], "deleted_rows": []}
+            record("edit_table", await session.set_value("dataframe", "data_editor:None", "string_value", json.dumps(edit)))
+            seconds, _ = await session.download("📄 下载财务报告")
+            record("download", seconds)
+        results[index] = {"ok": True, "timings": timings}
+    except Exception as e:
+        results[index] = {"ok": False, "error": f"{type(e).__name__}: {e}", "timings": timings}
+    finally: await session.close()
+
+
+async def sample_memory(pid, stop, samples):
+    while not stop.is_set():
+        samples.append(_rss_mb(pid))
+        await asyncio.sleep(0.05)
+
+def _percentiles(values):
+    values = sorted(values)
+    if not values: return {}
+    pick = lambda q: values[min(len(values) - 1, int(round(q * (len(values) - 1))))]
+    return {"n": len(values), "p50_ms": pick(0.5) * 1e3, "p95_ms": pick(0.95) * 1e3, "max_ms": values[-1] * 1e3}
+
+async def load_test(base_url, n_sessions, iterations, think_time, password, server_pid=None, ramp=0.0):
+    memory, stop = [], asyncio.Event()
+    sampler = asyncio.create_task(sample_memory(server_pid, stop, memory)) if server_pid else None
+    baseline = _rss_mb(server_pid) if server_pid else None
+    results = [None] * n_sessions
+    started = time.perf_counter()
+    tasks = []
+    for i in range(n_sessions):
+        tasks.append(asyncio.create_task(run_session(i, base_url, password, iterations, think_time, results)))
+        if ramp: await asyncio.sleep(ramp)
+    await asyncio.gather(*tasks)
+    wall = time.perf_counter() - started
+    settled = _rss_mb(server_pid) if server_pid else None
+    if sampler: stop.set(); await sampler
+
+    steps = {}
+    for r in results:
+        for step, values in r["timings"].items(): steps.setdefault(step, []).extend(values)
+    report = {
+        "sessions": n_sessions, "iterations": iterations, "wall_s": wall,
+        "failed": [{"session": i, "error": r["error"]} for i, r in enumerate(results) if not r["ok"]],
+        "steps": {step: _percentiles(values) for step, values in steps.items()},
+        "per_session": [{"session": i, "ok": r["ok"], "total_s": sum(sum(v) for v in r["timings"].values()),
+                         **{f"{step}_mean_ms": statistics.fmean(v) * 1e3 for step, v in r["timings"].items()}} for i, r in enumerate(results)],
+    }
+    if server_pid:
+        peak = max(memory + [settled])
+        report["memory_mb"] = {"baseline": baseline, "peak": peak, "after": settled,
+                               "per_session_peak": (peak - baseline) / n_sessions, "per_session_retained": (settled - baseline) / n_sessions}
+    return report
+
+def print_report(report):
+    print(f"\n{report['sessions']} 个并发会话 × {report['iterations']} 轮 | 总耗时 {report['wall_s']:.1f}s | 失败 {len(report['failed'])}")
+    print(f"{'步骤':<12}{'次数':>6}{'p50 (ms)':>12}{'p95 (ms)':>12}{'max (ms)':>12}")
+    for step, s in report["steps"].items():
+        print(f"{step:<12}{s['n']:>6}{s['p50_ms']:>12.0f}{s['p95_ms']:>12.0f}{s['max_ms']:>12.0f}")
+    if "memory_mb" in report:
+        m = report["memory_mb"]
+        print(f"服务端 RSS：基线 {m['baseline']:.0f} MB | 峰值 {m['peak']:.0f} MB | 结束 {m['after']:.0f} MB | "
+              f"每会话 峰值增量 {m['per_session_peak']:.1f} MB / 常驻增量 {m['per_session_retained']:.1f} MB")
+    for f in report["failed"]: print(f"会话 {f['session']} 失败：{f['error']}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Streamlit 多会话并发压测")
+    parser.add_argument("-n", "--sessions", type=int, default=5, help="并发会话数 (默认 5)")
+    parser.add_argument("--iterations", type=int, default=3, help="每个会话重复“改参→测算→改表→下载”的轮数")
+    parser.add_argument("--think-time", type=float, default=0.5, help="步骤间随机停顿上限 (秒)")
+    parser.add_argument("--ramp", type=float, default=0.1, help="会话依次启动的间隔 (秒)")
+    parser.add_argument("--url", help="压测已运行的服务 (缺省时在空闲端口启动临时服务)")
+    parser.add_argument("--password", default=os.environ.get("EV_ADMIN_PASSWORD", DEFAULT_PASSWORD))
+    parser.add_argument("--output", help="将完整报告写入 JSON 文件")
+    args = parser.parse_args(argv)
+
+    server = None
+    with tempfile.TemporaryDirectory() as store_dir:
+        if args.url: base_url, pid = args.url, None
+        else:
+            port = _free_port()
+            server = start_server(port, store_dir)
+            base_url, pid = f"http://127.0.0.1:{port}", server.pid
+        try:
+            asyncio.run(load_test(base_url, 1, 1, 0, args.password))   # 预热：首个会话承担模块导入与字体加载
+            report = asyncio.run(load_test(base_url, args.sessions, args.iterations, args.think_time, args.password, pid, args.ramp))
+        finally:
+            if server is not None: server.terminate(); server.wait(timeout=10)
+    print_report(report)
+    if args.output: Path(args.output).write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+    return 1 if report["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,182 @@
+"""性能基准与回归检测
+
+覆盖 CAPEX 计算、单情景/批量财务引擎 (3–20 年)、一年会话仿真、核心冷启动导入、300 dpi 表格图片导出，
+以及通过 Streamlit 无界面 AppTest 驱动的完整 main() 重跑。
+
+    python benchmarks/run_benchmarks.py                       # 运行并与 baseline.json 比较
+    python benchmarks/run_benchmarks.py --save-baseline       # 以本次结果覆盖基线
+    python benchmarks/run_benchmarks.py -k batch --threshold 0.5 --output bench.json
+
+结果以 JSON 输出；任一已记录基线的用例最短耗时 (受系统噪声影响最小) 超过 基线 × (1 + threshold) 时返回非零退出码。
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import numpy as np  # noqa: E402
+
+from ev_model import (DEFAULT_INPUTS, build_ops_table, calculate_capex_details,  # noqa: E402
+                      calculate_financial_batch, calculate_financial_model)
+
+BASELINE_PATH = Path(__file__).resolve().parent / "baseline.json"
+DEFAULT_THRESHOLD = 0.25
+MIN_REPEAT_SECONDS = 0.05
+
+BENCHMARKS = {}
+
+
+def benchmark(name, repeat=7):
+    """注册基准用例：被装饰函数负责准备数据并返回待计时的无参可调用对象"""
+    def register(setup):
+        BENCHMARKS[name] = (setup, repeat)
+        return setup
+    return register
+
+
+def _inputs(years):
+    return dict(DEFAULT_INPUTS, years_duration=years)
+
+
+def _batch_arrays(n_scenarios, years):
+    rng = np.random.default_rng(0)
+    inputs = _inputs(years)
+    inputs['price_sale'] = rng.uniform(0.8, 1.6, n_scenarios)
+    kwh = rng.uniform(50, 500, (n_scenarios, years))
+    staff = np.full((1, years), 2.0); salary = np.full((1, years), 75000.0)
+    return kwh, staff, salary, calculate_capex_details(inputs), inputs
+
+
+@benchmark("capex_details")
+def bench_capex_details():
+    inputs = _inputs(10)
+    return lambda: calculate_capex_details(inputs)
+
+
+for _years in (3, 10, 20):
+    @benchmark(f"financial_model_{_years}y")
+    def bench_financial_model(years=_years):
+        inputs = _inputs(years); ops = build_ops_table(years); capex = calculate_capex_details(inputs)
+        return lambda: calculate_financial_model(ops, capex, inputs)
+
+    for _n in (1000, 100000):
+        @benchmark(f"financial_batch_{_n}x{_years}y", repeat=5)
+        def bench_financial_batch(n=_n, years=_years):
+            args = _batch_arrays(n, years)
+            return lambda: calculate_financial_batch(*args)
+
+
+@benchmark("session_sim_1y", repeat=3)
+def bench_session_sim():
+    """一年 365 天的会话仿真"""
+    from ev_model import simulate_sessions
+    inputs = _inputs(1)
+    return lambda: simulate_sessions(inputs, [60.0])
+
+
+@benchmark("core_cold_import", repeat=5)
+def bench_core_cold_import():
+    cmd = [sys.executable, "-c", "import ev_model.finance"]
+    return lambda: subprocess.run(cmd, cwd=ROOT, check=True)
+
+
+@benchmark("dataframe_to_png_300dpi", repeat=3)
+def bench_dataframe_to_png():
+    import app
+    inputs = _inputs(10)
+    df_res, _ = calculate_financial_model(build_ops_table(10), calculate_capex_details(inputs), inputs)
+    font = app.load_custom_font()
+    return lambda: app.dataframe_to_png(df_res, font, 300)
+
+
+@benchmark("app_main_rerun", repeat=3)
+def bench_app_main_rerun():
+    """完整脚本重跑：登录后首次渲染 + 点击“开始测算”"""
+    from streamlit.testing.v1 import AppTest
+
+    def rerun():
+        at = AppTest.from_file(str(ROOT / "app.py"), default_timeout=120)
+        at.session_state["authenticated"] = True
+        at.run(); next(b for b in at.button if "开始测算" in b.label).click().run()
+        if at.exception: raise RuntimeError(at.exception[0].message)
+    return rerun
+
+
+def time_case(func, repeat):
+    """自动确定每轮调用次数 (单轮不少于 MIN_REPEAT_SECONDS)，返回每次调用耗时的统计"""
+    func()
+    number, elapsed = 1, 0.0
+    while True:
+        start = time.perf_counter()
+        for _ in range(number): func()
+        elapsed = time.perf_counter() - start
+        if elapsed >= MIN_REPEAT_SECONDS or number >= 1_000_000: break
+        number *= 10
+    samples = [elapsed / number]
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(number): func()
+        samples.append((time.perf_counter() - start) / number)
+    return {"median": statistics.median(samples), "min": min(samples), "repeat": repeat, "number": number}
+
+
+def compare(results, baseline, threshold):
+    regressions = []
+    for name, res in results.items():
+        base = baseline.get("results", {}).get(name)
+        if base is None: continue
+        ratio = res["min"] / base["min"]
+        res["baseline_min"] = base["min"]; res["ratio"] = ratio
+        if ratio > 1 + threshold: regressions.append((name, ratio))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-k", "--filter", default="", help="只运行名称包含该子串的用例")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH, help="基线文件 (默认 benchmarks/baseline.json)")
+    parser.add_argument("--threshold", type=float, default=float(os.environ.get("BENCH_THRESHOLD", DEFAULT_THRESHOLD)),
+                        help="允许的相对变慢幅度 (默认 0.25，亦可用 BENCH_THRESHOLD 环境变量设置)")
+    parser.add_argument("--output", type=Path, help="将结果 JSON 写入该文件 (默认输出到 stdout)")
+    parser.add_argument("--save-baseline", action="store_true", help="以本次结果覆盖基线文件")
+    args = parser.parse_args(argv)
+
+    results = {}
+    for name, (setup, repeat) in BENCHMARKS.items():
+        if args.filter not in name: continue
+        results[name] = time_case(setup(), repeat)
+        print(f"{name:<32} min {results[name]['min'] * 1e3:10.3f} ms | median {results[name]['median'] * 1e3:10.3f} ms", file=sys.stderr)
+
+    report = {
+        "meta": {"python": platform.python_version(), "numpy": np.__version__, "platform": platform.platform(),
+                 "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S")},
+        "results": results,
+    }
+    if args.save_baseline:
+        baseline = json.loads(args.baseline.read_text()) if args.baseline.exists() else {"results": {}}
+        baseline = {"meta": report["meta"], "results": {**baseline["results"], **results}}
+        args.baseline.write_text(json.dumps(baseline, indent=2, ensure_ascii=False) + "\n")
+        regressions = []
+    else:
+        baseline = json.loads(args.baseline.read_text()) if args.baseline.exists() else {}
+        regressions = compare(results, baseline, args.threshold)
+    report["regressions"] = [{"name": n, "ratio": r} for n, r in regressions]
+
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output: args.output.write_text(text + "\n")
+    else: print(text)
+    for name, ratio in regressions:
+        print(f"REGRESSION {name}: {ratio:.2f}x baseline (threshold {1 + args.threshold:.2f}x)", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
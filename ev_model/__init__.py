@@ -0,0 +1,40 @@
+"""迪拜超充站投资模型的无界面核心 (不依赖 streamlit / matplotlib)
+
+子模块在首次访问对应名称时才导入，``import ev_model`` 本身几乎没有开销。
+"""
+import importlib
+
+_EXPORTS = {
+    "constants": ["DEFAULT_INPUTS", "DEFAULT_PARAMS", "OPS_COLUMNS", "RESULT_COLUMNS", "MC_PERCENTILES",
+                  "INTEGER_KEYS", "KWH_SCALE_KEY", "SENSITIVITY_LABELS", "PORTFOLIO_PARALLEL_MIN_SITES",
+                  "DEFAULT_DAILY_SHAPE", "DEFAULT_TOU_TARIFF", "HOURS_PER_YEAR", "DEFAULT_FLEET", "MODEL_VERSION"],
+    "finance": ["calculate_capex_details", "calculate_financial_batch", "calculate_financial_model",
+                "scenario_key", "scenario_keys", "build_ops_table"],
+    "montecarlo": ["StreamingHistogram", "run_monte_carlo"],
+    "sensitivity": ["sensitivity_keys", "evaluate_overrides", "run_tornado", "run_sweep", "sweep_cache_stats"],
+    "portfolio": ["evaluate_portfolio", "portfolio_template"],
+    "hourly": ["generate_profile", "normalize_profile", "load_profile", "tariff_vectors", "simulate_hourly", "exceedance_hours"],
+    "sessions": ["mean_session_kwh", "arrivals_from_kwh", "share_pile_power", "simulate_sessions"],
+    "sizing": ["served_kwh", "optimize_sizing"],
+    "ingest": ["SessionLog", "read_session_log", "fit_ramp", "calibrate_ops_table", "log_profile"],
+    "store": ["ScenarioStore"],
+    "cache": ["ResultCache", "cached_capex_details", "cached_financial_model", "result_cache_stats"],
+    "tracing": ["RerunTracer"],
+    "jobs": ["Job", "JobCancelled", "JobManager"],
+    "solver": ["npv", "irr", "batch_root", "solve_break_even_price", "solve_required_kwh_scale", "solve_max_pile_price"],
+}
+_LOOKUP = {name: module for module, names in _EXPORTS.items() for name in names}
+
+__all__ = sorted(_LOOKUP)
+
+
+def __getattr__(name):
+    if name in _LOOKUP:
+        value = getattr(importlib.import_module(f".{_LOOKUP[name]}", __name__), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return __all__
@@ -0,0 +1,81 @@
+"""进程级结果缓存：不同会话的相同分析 (按规范化参数指纹) 只计算一次，按估算字节数 LRU 淘汰
+
+Streamlit 的各会话运行在同一进程的不同线程中；同一键并发请求时只有一个线程计算，其余等待其结果。
+对外返回缓存对象的副本，调用方可自由修改。
+"""
+import sys
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from .constants import CAPEX_INPUT_KEYS, RESULT_CACHE_MAX_BYTES
+from .finance import _inputs_digest, calculate_capex_details, calculate_financial_model, scenario_key
+
+
+def _nbytes(value):
+    """缓存对象的内存估算：DataFrame / ndarray 取实际数据大小，容器递归求和"""
+    if hasattr(value, "memory_usage"): return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, np.ndarray): return value.nbytes
+    if isinstance(value, dict): return sys.getsizeof(value) + sum(_nbytes(v) for v in value.values())
+    if isinstance(value, (list, tuple)): return sys.getsizeof(value) + sum(_nbytes(v) for v in value)
+    return sys.getsizeof(value)
+
+class ResultCache:
+    """线程安全、按字节上限淘汰的 LRU 缓存"""
+
+    def __init__(self, max_bytes=RESULT_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = self.misses = self.evictions = 0
+        self._entries = OrderedDict()
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, key, compute):
+        while True:
+            with self._lock:
+                if key in self._entries:
+                    self._entries.move_to_end(key); self.hits += 1
+                    return self._entries[key][0]
+                pending = self._pending.get(key)
+                if pending is None:
+                    self._pending[key] = pending = threading.Event(); self.misses += 1
+                    break
+            pending.wait()   # 其他线程正在计算同一键：等待后重新查表 (计算失败时由本线程重试)
+        try:
+            value = compute()
+            nbytes = _nbytes(value)
+            with self._lock:
+                if nbytes <= self.max_bytes:
+                    self._entries[key] = (value, nbytes); self.size += nbytes
+                    while self.size > self.max_bytes:
+                        _, (_, evicted) = self._entries.popitem(last=False); self.size -= evicted; self.evictions += 1
+            return value
+        finally:
+            with self._lock: self._pending.pop(key).set()
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions, "entries": len(self._entries),
+                    "bytes": self.size, "max_bytes": self.max_bytes}
+
+    def clear(self):
+        with self._lock: self._entries.clear(); self.size = 0
+
+RESULT_CACHE = ResultCache()
+
+
+def cached_capex_details(inputs):
+    """calculate_capex_details 的共享缓存版本：只以 CAPEX 相关参数为键，运营参数变化不影响命中"""
+    key = ("capex", _inputs_digest({k: inputs[k] for k in CAPEX_INPUT_KEYS}).hexdigest())
+    return dict(RESULT_CACHE.get_or_compute(key, lambda: calculate_capex_details(inputs)))
+
+def cached_financial_model(edited_df, capex_data, inputs):
+    """calculate_financial_model 的共享缓存版本 (capex_data 须由同一 inputs 计算得到，键为 scenario_key)"""
+    df_res, payback = RESULT_CACHE.get_or_compute(("model", scenario_key(edited_df, inputs)),
+                                                  lambda: calculate_financial_model(edited_df, capex_data, inputs))
+    return df_res.copy(), payback
+
+def result_cache_stats():
+    return RESULT_CACHE.stats()
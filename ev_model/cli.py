@@ -0,0 +1,105 @@
+"""批量命令行运行器：读取一个目录下的年度运营配置 CSV，按同一组基准参数一次性批量测算
+
+用法：python -m ev_model CONFIG_DIR [--params params.json] [--out results] [--details] [--store DIR [--site 站点] [--tag 标签 ...]]
+"""
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from .constants import DEFAULT_INPUTS, OPS_COLUMNS, RESULT_COLUMNS
+from .finance import build_ops_table, calculate_capex_details, calculate_financial_batch, scenario_keys
+from .solver import irr, npv
+from .store import ScenarioStore
+
+
+def load_params(path=None):
+    """基准参数 = DEFAULT_INPUTS，由 JSON 参数文件 (键与界面 inputs 一致，百分比以小数表示) 覆盖"""
+    params = dict(DEFAULT_INPUTS)
+    if path is None: return params
+    with open(path, encoding='utf-8') as f: overrides = json.load(f)
+    unknown = sorted(set(overrides) - set(DEFAULT_INPUTS))
+    if unknown: raise ValueError(f"参数文件包含未知参数：{', '.join(unknown)}")
+    params.update(overrides)
+    return params
+
+def load_configs(config_dir, years_duration):
+    """读取目录下全部配置 CSV (格式同界面“导入历史配置”)，缺列的文件跳过并提示"""
+    names, tables = [], []
+    for path in sorted(Path(config_dir).glob("*.csv")):
+        try: df = pd.read_csv(path)
+        except Exception as e: print(f"跳过 {path.name}：读取失败 {e}", file=sys.stderr); continue
+        if not all(col in df.columns for col in OPS_COLUMNS) or df.empty:
+            print(f"跳过 {path.name}：CSV格式错误，缺少必要列。", file=sys.stderr); continue
+        names.append(path.stem); tables.append(build_ops_table(years_duration, df))
+    return names, tables
+
+def run_batch(names, tables, params, discount_rate=0.0, store=None, site="", tags=()):
+    """所有配置堆叠为 (S, Y) 数组后一次调用批量引擎；返回汇总表与完整批量结果
+
+    指定情景库时，已入库的相同情景直接读取结果文件，其余计算后批量入库。
+    """
+    ops = np.stack([t[OPS_COLUMNS].to_numpy(dtype=float) for t in tables])
+    keys = scenario_keys(ops, params) if store is not None else []
+    stored = store.existing(keys) if store is not None else set()
+    cached = np.array([key in stored for key in keys], dtype=bool) if keys else np.zeros(len(tables), dtype=bool)
+    todo = np.flatnonzero(~cached)
+    res = {k: np.empty((len(tables), ops.shape[1] + 1)) for k in RESULT_COLUMNS}
+    res["payback"] = np.full(len(tables), np.nan)
+    res["cached"] = cached
+    if len(todo):
+        part = calculate_financial_batch(ops[todo, :, 0], ops[todo, :, 1], ops[todo, :, 2], calculate_capex_details(params), params)
+        for k in list(RESULT_COLUMNS) + ["payback"]: res[k][todo] = part[k]
+        if store is not None: store.put_many(ops[todo], params, part, [names[i] for i in todo], site, tags, [keys[i] for i in todo])
+    for i in np.flatnonzero(cached):
+        arrays = store.load_arrays(keys[i])
+        for k in list(RESULT_COLUMNS) + ["payback"]: res[k][i] = arrays[k]
+    summary = pd.DataFrame({
+        "情景": names,
+        "初始投资": -res["fcf"][:, 0],
+        "运营期总净利": res["net_profit"].sum(axis=1),
+        "运营期自由现金流": res["net_profit"].sum(axis=1) + res["depreciation"].sum(axis=1),
+        "回本期": res["payback"],
+        "期末累计现金流": res["cumulative_cash"][:, -1],
+        "NPV": npv(res["fcf"], discount_rate),
+        "IRR": irr(res["fcf"]),
+    })
+    return summary, res
+
+def write_details(out_dir, names, res):
+    for i, name in enumerate(names):
+        df_res = pd.DataFrame({"年份": [f"Y{y}" for y in range(res["fcf"].shape[1])]})
+        for key, col in RESULT_COLUMNS.items(): df_res[col] = res[key][i]
+        df_res.to_csv(out_dir / f"{name}_report.csv", index=False, encoding='utf-8-sig')
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m ev_model", description="迪拜超充站投资模型 · 批量测算")
+    parser.add_argument("config_dir", help="年度运营配置 CSV 所在目录")
+    parser.add_argument("--params", help="基准参数 JSON 文件 (缺省使用默认参数)")
+    parser.add_argument("--out", default="results", help="输出目录 (默认 results)")
+    parser.add_argument("--discount-rate", type=float, default=0.08, help="NPV 折现率 (小数，默认 0.08)")
+    parser.add_argument("--details", action="store_true", help="同时为每个配置输出逐年财务报告")
+    parser.add_argument("--store", help="情景库目录：已入库的相同情景跳过计算，新情景测算后入库")
+    parser.add_argument("--site", default="", help="入库时记录的站点名")
+    parser.add_argument("--tag", action="append", default=[], help="入库时附加的标签 (可重复)")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    params = load_params(args.params)
+    names, tables = load_configs(args.config_dir, int(params['years_duration']))
+    if not names: parser.error(f"{args.config_dir} 中没有可用的配置 CSV")
+    loaded = time.perf_counter()
+    store = ScenarioStore(args.store) if args.store else None
+    summary, res = run_batch(names, tables, params, args.discount_rate, store, args.site, args.tag)
+    computed = time.perf_counter()
+
+    out_dir = Path(args.out); out_dir.mkdir(parents=True, exist_ok=True)
+    summary.to_csv(out_dir / "summary.csv", index=False, encoding='utf-8-sig')
+    if args.details: write_details(out_dir, names, res)
+    cached = f" | 情景库命中 {int(res['cached'].sum())}" if store is not None else ""
+    print(f"{len(names)} 个配置 | 读取 {loaded - started:.2f}s | 测算 {computed - loaded:.3f}s{cached} | 结果已写入 {out_dir}")
+    return 0
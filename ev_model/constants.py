@@ -0,0 +1,130 @@
+"""模型常量：默认参数、报表列名及各批量子系统的调优参数 (无界面依赖)"""
+
+# 默认基准参数 (与界面控件默认值一致，供无界面批量运行使用)
+DEFAULT_INPUTS = {
+    "pile_power_kw": 480, "guns_per_pile": 6, "price_pile_unit": 200000, "trans_val": 1000, "price_trans_unit": 200000,
+    "cost_dewa_conn": 200000, "cost_civil_work": 150000, "cost_weak_current_total": 120000,
+    "cost_hv_cable": 20000, "cost_lv_cable": 80000, "cost_canopy": 80000, "cost_design": 40000, "other_cost_1": 0, "other_cost_2": 0,
+    "base_rent": 96000, "base_it_saas": 130000, "base_marketing": 0, "base_maintenance": 0,
+    "power_efficiency": 0.95, "inflation_rate": 0.03, "price_sale_growth": 0.0, "price_cost_growth": 0.0,
+    "tax_rate": 0.09, "tax_threshold": 375000,
+    "enable_dep_charger": True, "dep_years_charger": 5, "enable_dep_trans": True, "dep_years_trans": 15,
+    "enable_dep_cable": True, "dep_years_cable": 20, "enable_dep_civil": True, "dep_years_civil": 20,
+    "qty_piles": 2, "qty_trans": 1, "interest_rate": 0.05, "price_sale": 1.20, "price_cost": 0.44, "years_duration": 10,
+}
+
+# 默认年度推演参数
+DEFAULT_PARAMS = {
+    "daily_kwh": [50, 100, 150, 200, 250, 300, 350, 400, 450, 500],
+    "staff": [2] * 10,
+    "salary": [75000] * 10
+}
+
+# 批量引擎输出键 -> 报表列名
+RESULT_COLUMNS = {
+    "revenue": "营收",
+    "opex": "成本(OPEX)",
+    "depreciation": "折旧(抵税)",
+    "ebit": "息税前利(EBIT)",
+    "tax": "税金",
+    "net_profit": "净利润",
+    "fcf": "自由现金流(FCF)",
+    "cumulative_cash": "累计现金流",
+}
+OPS_COLUMNS = ["单枪日均充电量 (kWh)", "运营人数 (人)", "人均年薪 (AED)"]
+
+# 蒙特卡洛风险模式：输出分位数
+MC_PERCENTILES = (5, 10, 25, 50, 75, 90, 95)
+
+# 敏感性分析
+SENSITIVITY_EXCLUDE = {"years_duration", "pile_power_kw", "trans_val"}
+INTEGER_KEYS = {"qty_piles", "qty_trans", "guns_per_pile", "dep_years_charger", "dep_years_trans", "dep_years_cable", "dep_years_civil"}
+KWH_SCALE_KEY = "daily_kwh_scale"
+SENSITIVITY_LABELS = {
+    "price_sale": "销售电价", "price_cost": "进货电价", "price_sale_growth": "销售涨幅", "price_cost_growth": "成本涨幅",
+    "inflation_rate": "通胀率", "power_efficiency": "电能效率", "interest_rate": "资金成本费率",
+    "tax_rate": "税率", "tax_threshold": "免税额度", "qty_piles": "超充主机数", "qty_trans": "变压器数",
+    "guns_per_pile": "单机枪数", "price_pile_unit": "主机单价", "price_trans_unit": "变电站单价",
+    "cost_dewa_conn": "DEWA接入费", "cost_civil_work": "土建施工费", "cost_weak_current_total": "弱电/杂项/开办费",
+    "cost_hv_cable": "高压线缆", "cost_lv_cable": "低压线缆", "cost_canopy": "雨棚", "cost_design": "设计费",
+    "other_cost_1": "其他费用1", "other_cost_2": "其他费用2", "base_rent": "车位租金", "base_it_saas": "IT/SaaS/营销/维保",
+    "base_marketing": "营销费", "base_maintenance": "维保费", "dep_years_charger": "充电设备折旧年限",
+    "dep_years_trans": "变压器折旧年限", "dep_years_cable": "线缆折旧年限", "dep_years_civil": "土建折旧年限",
+    KWH_SCALE_KEY: "日均充电量倍数",
+}
+SWEEP_CACHE_MAX_STRIPS = 4000
+
+# 多站点组合：站点表中可覆盖的常用参数列 (任一 inputs 键均可作为列名)，Y1..Yn 为逐年单枪日均充电量
+PORTFOLIO_TEMPLATE_KEYS = ["qty_piles", "qty_trans", "guns_per_pile", "price_sale", "price_cost", "price_pile_unit",
+                           "price_trans_unit", "cost_dewa_conn", "cost_civil_work", "base_rent"]
+PORTFOLIO_CHUNK_SIZE = 20000
+PORTFOLIO_PARALLEL_MIN_SITES = 100000
+
+# 目标求解：批量求根的相对精度与最大迭代次数
+SOLVER_XTOL = 1e-9
+SOLVER_MAX_ITER = 100
+
+# 小时级仿真：日内负荷形状 (0–23 时相对权重) 与分时电价示例 (Y1 基准，AED/kWh；请按实际 DEWA 合同调整)
+HOURS_PER_YEAR = 8760
+DEFAULT_DAILY_SHAPE = [0.25, 0.15, 0.1, 0.08, 0.08, 0.12, 0.3, 0.55, 0.75, 0.8, 0.85, 0.9,
+                       0.95, 0.9, 0.85, 0.9, 1.0, 1.1, 1.25, 1.3, 1.2, 1.0, 0.7, 0.45]
+DEFAULT_TOU_TARIFF = {
+    "peak_hours": [12, 13, 14, 15, 16, 17],
+    "peak_months": [6, 7, 8, 9],
+    "sale_peak": 1.40, "sale_offpeak": 1.20,
+    "cost_peak": 0.52, "cost_offpeak": 0.44,
+    "demand_charge": 0.0,
+    "power_factor": 0.95,
+}
+HOURLY_CHUNK_SIZE = 16
+
+# 充电会话仿真：到站车辆画像与充电曲线 (SOC 断点 → 可接受功率占车辆峰值功率的比例)
+DEFAULT_FLEET = {
+    "battery_kwh": (50.0, 100.0),
+    "vehicle_kw": (60.0, 120.0, 250.0), "vehicle_kw_share": (0.3, 0.5, 0.2),
+    "soc_arrival": (0.10, 0.45), "soc_target": 0.80,
+    "curve_soc": (0.0, 0.5, 0.8, 1.0), "curve_frac": (1.0, 1.0, 0.55, 0.15),
+    "max_wait_min": 20.0,
+}
+SESSION_STEP_MIN = 1.0
+SESSION_TAIL_HOURS = 4
+
+# 情景库：指标 NPV 的折现率 (与命令行默认一致)、列表默认返回行数
+# 财务模型版本：计入情景指纹，修改测算口径 (finance.calculate_financial_batch 等) 后递增，库中旧版本结果即不再命中
+MODEL_VERSION = 1
+STORE_DISCOUNT_RATE = 0.08
+STORE_QUERY_LIMIT = 200
+
+# 进程级结果缓存：CAPEX 明细所依赖的参数与缓存内存上限
+CAPEX_INPUT_KEYS = ("price_pile_unit", "qty_piles", "price_trans_unit", "qty_trans", "cost_dewa_conn", "cost_hv_cable", "cost_lv_cable",
+                    "cost_civil_work", "cost_canopy", "cost_design", "cost_weak_current_total", "other_cost_1", "other_cost_2")
+RESULT_CACHE_MAX_BYTES = 128 * 2 ** 20
+
+# 最优配置搜索：变压器规格 → 默认单价、默认搜索范围与批量求值块大小
+SIZING_TRANS_PRICES = {1000: 200000, 1500: 250000}
+SIZING_PILE_RANGE = (1, 20)
+SIZING_TRANS_RANGE = (1, 4)
+SIZING_GUN_OPTIONS = (1, 2, 4, 6)
+SIZING_SHORTLIST = 10
+SIZING_CHUNK_SIZE = 1024
+
+# 实测充电记录导入：分块行数、站点时区 (带时区的时间戳换算为当地时间)、单次会话最长计入时长与爬坡拟合的时间常数范围 (天)
+SESSION_LOG_CHUNK_ROWS = 200000
+SESSION_LOG_TZ = "Asia/Dubai"
+SESSION_LOG_MAX_HOURS = 24
+RAMP_TAU_RANGE = (15, 3650)
+SESSION_LOG_COLUMNS = {
+    "start": ("start_time", "start", "starttime", "start_date", "session_start", "开始时间", "充电开始时间"),
+    "stop": ("stop_time", "end_time", "stop", "end", "stoptime", "endtime", "session_end", "结束时间", "充电结束时间"),
+    "kwh": ("kwh", "energy_kwh", "energy", "meter_kwh", "total_kwh", "电量", "充电量", "充电电量", "充电量(kwh)", "充电电量(kwh)"),
+    "charger": ("charger_id", "charge_point_id", "chargepoint_id", "chargebox_id", "station_id", "桩号", "充电桩编号"),
+    "connector": ("connector", "connector_id", "gun", "gun_id", "evse_id", "枪号", "充电枪", "充电枪编号"),
+}
+
+# 后台任务：全局工作线程数、单个会话同时运行的任务数上限、已结束任务的保留时长 (秒) 与条数，
+# 以及关联会话未续期多久 (秒) 后视为已离开 (须明显长于界面轮询间隔，后台标签页的定时器会被浏览器降频)
+JOB_MAX_WORKERS = 4
+JOB_MAX_PER_OWNER = 1
+JOB_RETENTION_S = 3600
+JOB_MAX_RETAINED = 200
+JOB_WATCH_TTL_S = 120
@@ -0,0 +1,159 @@
+"""财务核心：CAPEX 分组、批量现金流引擎与单情景报表
+
+本模块只依赖 NumPy；pandas 仅在需要构造/读取 DataFrame 的函数内按需导入，以缩短无界面场景的冷启动时间。
+"""
+import hashlib
+import json
+
+import numpy as np
+
+from .constants import DEFAULT_PARAMS, MODEL_VERSION, OPS_COLUMNS, RESULT_COLUMNS
+
+
+def calculate_capex_details(inputs):
+    """将 CAPEX 按照折旧类别进行分组计算"""
+    # 1. 充电设备类
+    capex_charger = (inputs['price_pile_unit'] * inputs['qty_piles'])
+    # 2. 变压器及接入类
+    capex_trans_group = (inputs['price_trans_unit'] * inputs['qty_trans']) + inputs['cost_dewa_conn']
+    # 3. 线缆类
+    capex_cable_group = inputs['cost_hv_cable'] + inputs['cost_lv_cable']
+    # 4. 土建及其他类
+    capex_civil_other = inputs['cost_civil_work'] + inputs['cost_canopy'] + inputs['cost_design'] + \
+                        inputs['cost_weak_current_total'] + inputs['other_cost_1'] + inputs['other_cost_2']
+    
+    total_capex = capex_charger + capex_trans_group + capex_cable_group + capex_civil_other
+    
+    return {
+        "total_capex": total_capex,
+        "capex_charger": capex_charger,
+        "capex_trans_group": capex_trans_group,
+        "capex_cable_group": capex_cable_group,
+        "capex_civil_other": capex_civil_other
+    }
+
+def _as_column(value):
+    """标量保持不变；(S,) 数组转为 (S, 1) 以便沿年份维度广播"""
+    arr = np.asarray(value, dtype=float)
+    return arr if arr.ndim == 0 else arr.reshape(-1, 1)
+
+def _annual_depreciation(capex_group, enabled, dep_years, year_num):
+    """分类折旧：仅在启用且处于折旧期内的年份计提，返回 (S, Y) 或 (1, Y)"""
+    capex_group, dep_years = _as_column(capex_group), _as_column(dep_years)
+    enabled = np.asarray(enabled, dtype=bool)
+    if enabled.ndim: enabled = enabled.reshape(-1, 1)
+    annual = np.where(enabled & (dep_years > 0), capex_group / np.where(dep_years > 0, dep_years, 1), 0.0)
+    return np.where(enabled & (year_num <= dep_years), annual, 0.0)
+
+def _payback_from_cumulative(cumulative_cash, fcf):
+    """动态回本期：首个累计现金流转正的年份内做线性插值，未回本为 NaN"""
+    crossed = cumulative_cash[:, 1:] >= 0
+    first = crossed.argmax(axis=1)
+    rows = np.arange(len(cumulative_cash))
+    prev_cash = cumulative_cash[rows, first]
+    fcf_at = fcf[rows, first + 1]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        payback = np.where(fcf_at > 0, first + np.abs(prev_cash) / fcf_at, first + 1.0)
+    return np.where(crossed.any(axis=1), payback, np.nan)
+
+def calculate_financial_batch(daily_kwh, staff, salary, capex_data, inputs):
+    """批量财务引擎：一次性计算 S 个情景 × Y 年的全部现金流
+
+    daily_kwh / staff / salary 为 (S, Y) 数组；capex_data 与 inputs 中的值可为标量或 (S,) 数组。
+    返回的各项结果为 (S, Y+1) 数组 (第 0 列为 Y0)，payback 为 (S,) 数组，未回本为 NaN。
+    """
+    daily_kwh = np.atleast_2d(np.asarray(daily_kwh, dtype=float))
+    staff = np.atleast_2d(np.asarray(staff, dtype=float))
+    salary = np.atleast_2d(np.asarray(salary, dtype=float))
+    n_years = daily_kwh.shape[1]
+    year_idx = np.arange(n_years, dtype=float); year_num = year_idx + 1
+    p = {k: _as_column(v) for k, v in inputs.items() if not k.startswith('enable_')}
+    total_capex = _as_column(capex_data["total_capex"])
+    total_guns = p['qty_piles'] * p['guns_per_pile']
+
+    current_price_sale = p['price_sale'] * ((1 + p['price_sale_growth']) ** year_idx)
+    current_price_cost = p['price_cost'] * ((1 + p['price_cost_growth']) ** year_idx)
+    annual_sales_kwh = daily_kwh * total_guns * 365
+    revenue = annual_sales_kwh * current_price_sale
+
+    annual_buy_kwh = annual_sales_kwh / p['power_efficiency']
+    cost_power = annual_buy_kwh * current_price_cost
+    inflation_factor = (1 + p['inflation_rate']) ** year_idx
+    current_labor = (staff * salary) * inflation_factor
+    fixed_opex_base = p['base_rent'] + p['base_it_saas'] + p['base_marketing'] + p['base_maintenance']
+    current_fixed = fixed_opex_base * inflation_factor
+    total_opex = cost_power + current_labor + current_fixed
+    ebitda = revenue - total_opex
+
+    depreciation = _annual_depreciation(capex_data["capex_charger"], inputs.get('enable_dep_charger', True), p['dep_years_charger'], year_num) + \
+                   _annual_depreciation(capex_data["capex_trans_group"], inputs.get('enable_dep_trans', True), p['dep_years_trans'], year_num) + \
+                   _annual_depreciation(capex_data["capex_cable_group"], inputs.get('enable_dep_cable', True), p['dep_years_cable'], year_num) + \
+                   _annual_depreciation(capex_data["capex_civil_other"], inputs.get('enable_dep_civil', True), p['dep_years_civil'], year_num)
+
+    ebit = ebitda - depreciation
+    cost_finance = total_capex * p['interest_rate']
+    ebt = ebit - cost_finance
+    tax = np.where(ebt > p['tax_threshold'], (ebt - p['tax_threshold']) * p['tax_rate'], 0.0)
+    net_profit = ebt - tax
+    fcf = net_profit + depreciation
+
+    # 统一广播为 (S, Y) 后在首列补上 Y0
+    shape = fcf.shape; n_scen = shape[0]
+    y0 = np.zeros((n_scen, 1))
+    out = {}
+    for key, values in (("revenue", revenue), ("opex", total_opex), ("depreciation", depreciation), ("ebit", ebit), ("tax", tax), ("net_profit", net_profit)):
+        out[key] = np.concatenate([y0, np.broadcast_to(values, shape)], axis=1)
+    capex_col = np.broadcast_to(total_capex, (n_scen, 1))
+    out["fcf"] = np.concatenate([-capex_col, np.broadcast_to(fcf, shape)], axis=1)
+    out["cumulative_cash"] = np.cumsum(out["fcf"], axis=1)
+
+    out["payback"] = _payback_from_cumulative(out["cumulative_cash"], out["fcf"])
+    return out
+
+def calculate_financial_model(edited_df, capex_data, inputs):
+    import pandas as pd
+    batch = calculate_financial_batch(
+        edited_df["单枪日均充电量 (kWh)"].to_numpy(dtype=float)[None, :],
+        edited_df["运营人数 (人)"].to_numpy(dtype=float)[None, :],
+        edited_df["人均年薪 (AED)"].to_numpy(dtype=float)[None, :],
+        capex_data, inputs)
+    df_res = pd.DataFrame({"年份": [f"Y{i}" for i in range(len(edited_df) + 1)], **{col: batch[key][0] for key, col in RESULT_COLUMNS.items()}})
+    payback_year = batch["payback"][0]
+    return df_res, (None if np.isnan(payback_year) else float(payback_year))
+
+def _inputs_digest(inputs):
+    """参数字典的规范化哈希：数值统一按浮点序列化，界面 (int/float 混用) 与 JSON 参数文件得到相同指纹"""
+    canonical = sorted((k, float(v) if isinstance(v, (int, float, np.number)) and not isinstance(v, bool) else v) for k, v in inputs.items())
+    return hashlib.sha1(json.dumps(canonical, default=float).encode())
+
+def scenario_keys(ops, inputs):
+    """批量情景指纹：ops 为 (S, Y, 3) 年度表数组 (列序同 OPS_COLUMNS)，同一组参数；含 MODEL_VERSION，模型口径变更后旧键不再命中"""
+    base = _inputs_digest(inputs)
+    base.update(f"model-v{MODEL_VERSION}".encode())
+    keys = []
+    for table in np.asarray(ops, dtype=np.float64):
+        h = base.copy(); h.update(np.ascontiguousarray(table).tobytes())
+        keys.append(h.hexdigest())
+    return keys
+
+def scenario_key(edited_df, inputs):
+    """按内容计算情景指纹 (年度表 + 参数字典)"""
+    return scenario_keys(edited_df[OPS_COLUMNS].to_numpy(dtype=np.float64)[None], inputs)[0]
+
+def build_ops_table(years_duration, df_config=None):
+    """年度运营表：以导入配置 (不足年限时沿用最后一行) 或默认推演参数补齐到指定年限"""
+    import pandas as pd
+    if df_config is not None:
+        if len(df_config) < years_duration:
+            last_row = df_config.iloc[-1]
+            df_extra = pd.DataFrame([last_row] * (years_duration - len(df_config)))
+            df_input = pd.concat([df_config, df_extra], ignore_index=True)
+        else: df_input = df_config.head(years_duration).copy()
+    else:
+        long_daily_kwh = DEFAULT_PARAMS['daily_kwh'] + [DEFAULT_PARAMS['daily_kwh'][-1]] * years_duration
+        long_staff = DEFAULT_PARAMS['staff'] + [DEFAULT_PARAMS['staff'][-1]] * years_duration
+        long_salary = DEFAULT_PARAMS['salary'] + [DEFAULT_PARAMS['salary'][-1]] * years_duration
+        df_input = pd.DataFrame({"单枪日均充电量 (kWh)": long_daily_kwh[:years_duration],"运营人数 (人)": long_staff[:years_duration],"人均年薪 (AED)": long_salary[:years_duration]})
+
+    df_input["年份"] = [f"Y{i+1}" for i in range(years_duration)]
+    return df_input[["年份"] + OPS_COLUMNS]
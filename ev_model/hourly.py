@@ -0,0 +1,118 @@
+"""8760 小时级负荷仿真：分时电价 (TOU) 营收/电费、需量电费与变压器容量校核
+
+负荷曲线以“每年 8760 小时、逐年归一化 (和为 1)”的 float32 形状表示，年度电量乘以形状即为逐时负荷 (kW)。
+全部情景共用一条曲线时，所有结果都是年度电量的线性/分段函数，只需对曲线逐年预处理一次；
+每个情景各有曲线 (S, Y, 8760) 时按情景分块计算，曲线可为 np.load(mmap_mode='r') 打开的内存映射文件。
+"""
+import numpy as np
+
+from .constants import DEFAULT_DAILY_SHAPE, DEFAULT_TOU_TARIFF, HOURLY_CHUNK_SIZE, HOURS_PER_YEAR
+
+_DAYS_PER_MONTH = np.array([31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31])
+MONTH_START_HOURS = np.concatenate([[0], np.cumsum(_DAYS_PER_MONTH)[:-1]]) * 24
+HOUR_OF_DAY = np.tile(np.arange(24), 365)
+MONTH_OF_HOUR = np.repeat(np.arange(1, 13), _DAYS_PER_MONTH * 24)
+
+
+def generate_profile(daily_shape=DEFAULT_DAILY_SHAPE, monthly_factors=None, weekend_factor=1.0, first_weekday=0):
+    """由日内形状 × 月度系数 × 周末系数生成一年的归一化 8760 曲线 (float32)"""
+    hourly = np.asarray(daily_shape, dtype=np.float64)[HOUR_OF_DAY]
+    if monthly_factors is not None: hourly = hourly * np.asarray(monthly_factors, dtype=np.float64)[MONTH_OF_HOUR - 1]
+    if weekend_factor != 1.0:
+        weekday = (np.arange(HOURS_PER_YEAR) // 24 + first_weekday) % 7
+        hourly = np.where(weekday >= 5, hourly * weekend_factor, hourly)
+    return (hourly / hourly.sum()).astype(np.float32)
+
+def normalize_profile(profile):
+    """任意非负逐时数据 (8760,) / (Y, 8760) / (S, Y, 8760) 按年归一化为 float32"""
+    profile = np.asarray(profile, dtype=np.float32)
+    if profile.shape[-1] != HOURS_PER_YEAR: raise ValueError(f"负荷曲线须为每年 {HOURS_PER_YEAR} 小时，实际为 {profile.shape[-1]}")
+    total = profile.sum(axis=-1, keepdims=True, dtype=np.float64)
+    return (profile / np.where(total > 0, total, 1)).astype(np.float32)
+
+def load_profile(source, mmap=False):
+    """读取上传/存档的逐时曲线并按年归一化：.npy 为 (8760,) / (Y, 8760) / (S, Y, 8760) 数组，CSV 每列为一年
+
+    mmap=True 且 source 为 .npy 路径时原样以内存映射方式打开、不做归一化 (供大批量分块读取，文件须已归一化)。
+    """
+    name = getattr(source, "name", str(source))
+    if name.endswith(".npy"):
+        if mmap and isinstance(source, str): return np.load(source, mmap_mode="r")
+        return normalize_profile(np.load(source))
+    import pandas as pd
+    data = pd.read_csv(source).select_dtypes("number").to_numpy(dtype=np.float32)
+    return normalize_profile(data.T if data.shape[0] == HOURS_PER_YEAR else data)
+
+def tariff_vectors(tariff=DEFAULT_TOU_TARIFF):
+    """将分时电价展开为逐时售电价、购电价 (Y1 基准) 与峰时掩码"""
+    peak = np.isin(HOUR_OF_DAY, tariff["peak_hours"]) & np.isin(MONTH_OF_HOUR, tariff["peak_months"])
+    sale = np.where(peak, tariff["sale_peak"], tariff["sale_offpeak"])
+    cost = np.where(peak, tariff["cost_peak"], tariff["cost_offpeak"])
+    return sale, cost, peak
+
+def _shared_profile_terms(shape, capacity, annual_kwh):
+    """共用曲线：超容小时与超容电量可由逐年降序排列的曲线 + 阈值二分查找得到"""
+    desc = -np.sort(-shape, axis=1)
+    cum = np.cumsum(desc, axis=1, dtype=np.float64)
+    with np.errstate(divide='ignore'):
+        threshold = np.where(annual_kwh > 0, capacity / annual_kwh, np.inf)
+    exceed = np.empty(annual_kwh.shape, dtype=np.int64)
+    for y in range(shape.shape[0]):
+        exceed[:, y] = HOURS_PER_YEAR - np.searchsorted(desc[y, ::-1], threshold[:, y], side='right')
+    idx = np.clip(exceed - 1, 0, None)
+    above = np.where(exceed > 0, np.take_along_axis(np.broadcast_to(cum, (len(annual_kwh),) + cum.shape), idx[..., None], axis=2)[..., 0], 0.0)
+    unserved = np.maximum(annual_kwh * above - capacity * exceed, 0.0)
+    return exceed, unserved
+
+def simulate_hourly(profile, annual_kwh, capacity_kva, tariff=DEFAULT_TOU_TARIFF, power_efficiency=0.95,
+                    sale_growth=0.0, cost_growth=0.0, chunk_size=HOURLY_CHUNK_SIZE):
+    """批量小时级仿真
+
+    profile: 归一化曲线 (8760,) / (Y', 8760) 共用 (Y' < Y 时沿用最后一年)，或 (S, Y, 8760) 逐情景；annual_kwh: (S, Y) 年售电量；
+    capacity_kva: 标量或 (S,) 变压器总容量 (qty_trans × trans_val)，按 tariff["power_factor"] 折算 kW。
+    返回 (S, Y) 数组：TOU 营收、峰时营收、购电电费、需量电费、电费合计、峰值负荷、超容小时数与超容电量。
+    """
+    annual_kwh = np.atleast_2d(np.asarray(annual_kwh, dtype=np.float64))
+    n_scen, n_years = annual_kwh.shape
+    profile = np.asarray(profile) if not isinstance(profile, np.memmap) else profile
+    if profile.ndim == 1: profile = np.broadcast_to(profile, (n_years, HOURS_PER_YEAR))
+    # 曲线年数不足时沿用最后一年
+    if profile.ndim == 2 and len(profile) < n_years: profile = np.concatenate([profile, np.repeat(profile[-1:], n_years - len(profile), axis=0)])
+    sale, cost, peak = tariff_vectors(tariff)
+    sale_factor = (1 + sale_growth) ** np.arange(n_years); cost_factor = (1 + cost_growth) ** np.arange(n_years)
+    capacity = np.broadcast_to(np.asarray(capacity_kva, dtype=np.float64) * tariff["power_factor"], (n_scen,))[:, None]
+    # 电网侧负荷 = 售电负荷 / 电能效率
+    grid_kwh = annual_kwh / power_efficiency
+
+    if profile.ndim == 2:
+        shape = np.asarray(profile[:n_years], dtype=np.float64)
+        w_sale = shape @ sale; w_cost = shape @ cost; w_peak = shape @ np.where(peak, sale, 0)
+        month_max = np.maximum.reduceat(shape, MONTH_START_HOURS, axis=1)
+        revenue = annual_kwh * w_sale; peak_revenue = annual_kwh * w_peak
+        energy_cost = grid_kwh * w_cost
+        monthly_peak_kw = grid_kwh[:, :, None] * month_max
+        exceed, unserved = _shared_profile_terms(shape, capacity, grid_kwh)
+    else:
+        revenue, peak_revenue, energy_cost = (np.empty((n_scen, n_years)) for _ in range(3))
+        monthly_peak_kw = np.empty((n_scen, n_years, 12)); exceed = np.empty((n_scen, n_years), dtype=np.int64); unserved = np.empty((n_scen, n_years))
+        peak_sale = np.where(peak, sale, 0)
+        for start in range(0, n_scen, chunk_size):
+            sl = slice(start, min(start + chunk_size, n_scen))
+            shape = np.asarray(profile[sl, :n_years], dtype=np.float32)
+            revenue[sl] = annual_kwh[sl] * np.einsum('syh,h->sy', shape, sale)
+            peak_revenue[sl] = annual_kwh[sl] * np.einsum('syh,h->sy', shape, peak_sale)
+            energy_cost[sl] = grid_kwh[sl] * np.einsum('syh,h->sy', shape, cost)
+            monthly_peak_kw[sl] = grid_kwh[sl, :, None] * np.maximum.reduceat(shape, MONTH_START_HOURS, axis=2)
+            over = shape * grid_kwh[sl, :, None].astype(np.float32) - capacity[sl, :, None].astype(np.float32)
+            exceed[sl] = (over > 0).sum(axis=2); unserved[sl] = np.maximum(over, 0).sum(axis=2, dtype=np.float64)
+
+    demand_charge = monthly_peak_kw.sum(axis=2) * tariff["demand_charge"] * cost_factor
+    revenue = revenue * sale_factor; peak_revenue = peak_revenue * sale_factor; energy_cost = energy_cost * cost_factor
+    return {"revenue": revenue, "peak_revenue": peak_revenue, "energy_cost": energy_cost, "demand_charge": demand_charge,
+            "energy_bill": energy_cost + demand_charge, "peak_kw": monthly_peak_kw.max(axis=2),
+            "exceed_hours": exceed, "unserved_kwh": unserved}
+
+def exceedance_hours(profile_year, annual_kwh, capacity_kva, tariff=DEFAULT_TOU_TARIFF, power_efficiency=0.95):
+    """单个年份的超容小时索引 (0–8759)，用于在界面上标注具体时段"""
+    load = np.asarray(profile_year, dtype=np.float64) * annual_kwh / power_efficiency
+    return np.flatnonzero(load > capacity_kva * tariff["power_factor"])
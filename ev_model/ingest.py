@@ -0,0 +1,232 @@
+"""实测充电记录导入：分块流式读取会话日志，单遍聚合为逐时电量，再校准年度运营表与 8760 负荷曲线
+
+日志每行一次会话 (开始/结束时间、桩/枪号、kWh)，按 pd.read_csv(chunksize=...) 分块读取；
+会话电量按开始→结束时间均匀分摊到所跨小时，累加到以首日零点为起点的逐时数组中 (十年约 9 万个浮点数)，
+内存只与日志覆盖的时长有关，与行数无关。年 / 月 / 时段汇总、运营年实测值与负荷曲线都由该数组导出。
+运营年以首个会话所在日起算；完整运营年直接采用实测单枪日均充电量，其余年份按饱和指数爬坡曲线外推。
+"""
+import argparse
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from .constants import (HOURS_PER_YEAR, OPS_COLUMNS, RAMP_TAU_RANGE, SESSION_LOG_CHUNK_ROWS, SESSION_LOG_COLUMNS, SESSION_LOG_MAX_HOURS,
+                        SESSION_LOG_TZ)
+from .finance import build_ops_table
+from .hourly import normalize_profile
+
+_HOUR = 3600
+_DAY = 24 * _HOUR
+
+
+class SessionLog:
+    """会话日志的流式累加器：逐时电量 (按日对齐、按需向两端扩展)、逐日会话数与枪号集合"""
+    def __init__(self, max_session_hours=SESSION_LOG_MAX_HOURS):
+        self.max_session_s = max_session_hours * _HOUR
+        self.base_day = None
+        self.energy = np.zeros(0)
+        self.sessions = np.zeros(0, dtype=np.int64)
+        self.connectors = set()
+        self.first = self.last = None
+        self.rows = self.skipped = 0
+
+    def _extend(self, lo_day, hi_day):
+        """保证 [lo_day, hi_day] (自 1970 年起的天数) 落在数组范围内"""
+        if self.base_day is None: self.base_day = lo_day
+        n_days = len(self.sessions)
+        front = max(0, self.base_day - lo_day); back = max(0, hi_day - (self.base_day + n_days - 1))
+        if front or back:
+            self.energy = np.pad(self.energy, (front * 24, back * 24)); self.sessions = np.pad(self.sessions, (front, back))
+            self.base_day -= front
+
+    def update(self, start, stop, kwh, connector=None):
+        """累加一个数据块：start / stop 为当地时间 (datetime64)，stop 可为 NaT (电量全部计入开始小时)"""
+        start = pd.DatetimeIndex(start).as_unit('s').asi8; kwh = np.asarray(kwh, dtype=float)
+        stop = pd.DatetimeIndex(stop).as_unit('s').asi8 if stop is not None else np.full(len(start), pd.NaT.value)
+        self.rows += len(start)
+        ok = (start != pd.NaT.value) & np.isfinite(kwh) & (kwh > 0)
+        self.skipped += int((~ok).sum())
+        if connector is not None: self.connectors.update(pd.unique(np.asarray(connector)[ok]).tolist())
+        start, stop, kwh = start[ok], stop[ok], kwh[ok]
+        if not len(start): return
+        duration = np.where(stop != pd.NaT.value, np.clip(stop - start, 0, self.max_session_s), 0)
+        end = start + duration
+        self.first = int(start.min()) if self.first is None else min(self.first, int(start.min()))
+        self.last = int(start.max()) if self.last is None else max(self.last, int(start.max()))
+        self._extend(int(start.min() // _DAY), int(end.max() // _DAY))
+
+        # 按所跨小时展开，电量按与各小时的重叠时长分摊
+        first_h = start // _HOUR; n_hours = np.where(duration > 0, (end - 1) // _HOUR - first_h + 1, 1)
+        owner = np.repeat(np.arange(len(start)), n_hours)
+        hour = first_h[owner] + np.arange(len(owner)) - np.repeat(np.cumsum(n_hours) - n_hours, n_hours)
+        overlap = np.minimum(end[owner], (hour + 1) * _HOUR) - np.maximum(start[owner], hour * _HOUR)
+        share = np.where(duration[owner] > 0, overlap / np.maximum(duration[owner], 1), 1.0)
+        offset = self.base_day * 24
+        self.energy += np.bincount(hour - offset, kwh[owner] * share, minlength=len(self.energy))
+        self.sessions += np.bincount(start // _DAY - self.base_day, minlength=len(self.sessions))
+
+    @property
+    def n_days(self):
+        """覆盖天数：首个会话所在日至最后一个会话所在日 (含)"""
+        return 0 if self.first is None else int(self.last // _DAY - self.first // _DAY) + 1
+
+    def _covered(self):
+        """覆盖期内的逐日日期、逐时电量 (days, 24) 与逐日会话数"""
+        lo = int(self.first // _DAY) - self.base_day
+        dates = pd.to_datetime((self.base_day + lo + np.arange(self.n_days)) * _DAY, unit='s')
+        return dates, self.energy.reshape(-1, 24)[lo:lo + self.n_days], self.sessions[lo:lo + self.n_days]
+
+    def default_guns(self):
+        return max(len(self.connectors), 1)
+
+    def monthly(self, n_guns=None):
+        """自然年 × 月汇总：覆盖天数、电量、会话数与单枪日均充电量"""
+        dates, energy, sessions = self._covered(); n_guns = n_guns or self.default_guns()
+        df = pd.DataFrame({"年": dates.year, "月": dates.month, "电量": energy.sum(axis=1), "会话数": sessions})
+        out = df.groupby(["年", "月"]).agg(覆盖天数=("电量", "size"), 充电量=("电量", "sum"), 会话数=("会话数", "sum")).reset_index()
+        out["单枪日均 (kWh)"] = out["充电量"] / out["覆盖天数"] / n_guns
+        return out.rename(columns={"充电量": "充电量 (kWh)"})
+
+    def hour_of_day(self, n_guns=None):
+        """24 个时段的单枪平均功率 (kW) 与电量占比"""
+        _, energy, _ = self._covered(); n_guns = n_guns or self.default_guns()
+        total = energy.sum(axis=0)
+        return pd.DataFrame({"时段": np.arange(24), "单枪平均功率 (kW)": total / len(energy) / n_guns, "电量占比": total / max(total.sum(), 1e-12)})
+
+    def operating_years(self, n_guns=None):
+        """以首个会话所在日起算的运营年：覆盖天数、电量、单枪日均充电量及是否完整"""
+        _, energy, _ = self._covered(); n_guns = n_guns or self.default_guns()
+        daily = energy.sum(axis=1); year = np.arange(len(daily)) // 365
+        days = np.bincount(year); total = np.bincount(year, daily)
+        return pd.DataFrame({"运营年": [f"Y{i + 1}" for i in range(len(days))], "覆盖天数": days, "充电量 (kWh)": total,
+                             "单枪日均 (kWh)": total / days / n_guns, "完整": days == 365})
+
+
+def _match_column(columns, role, explicit=None):
+    if explicit: return explicit
+    normalized = {str(c).strip().lower().replace(" ", "_"): c for c in columns}
+    return next((normalized[name] for name in SESSION_LOG_COLUMNS[role] if name in normalized), None)
+
+def _local_time(values, date_format, tz):
+    """解析时间戳；带时区 (含混合时区偏移) 的统一换算为站点当地时间后去掉时区"""
+    try: ts = pd.to_datetime(values, format=date_format, errors='coerce')
+    except (ValueError, TypeError): ts = pd.to_datetime(values, format=date_format, errors='coerce', utc=True)
+    if getattr(ts.dt, "tz", None) is not None: ts = ts.dt.tz_convert(tz).dt.tz_localize(None)
+    return ts
+
+def read_session_log(source, columns=None, chunk_size=SESSION_LOG_CHUNK_ROWS, date_format=None, tz=SESSION_LOG_TZ,
+                     max_session_hours=SESSION_LOG_MAX_HOURS, on_chunk=None):
+    """分块读取会话日志 CSV (路径或文件对象，支持 .gz 等压缩)，单遍聚合为 SessionLog
+
+    columns 可指定 {"start", "stop", "kwh", "charger", "connector"} 对应的列名，缺省按 SESSION_LOG_COLUMNS 自动识别；
+    start 与 kwh 为必需列。桩号与枪号同时存在时以二者组合区分枪。on_chunk(已读行数) 在每块处理后回调。
+    """
+    columns = dict(columns or {})
+    # 上传的文件对象不会被 pandas 按扩展名推断压缩格式，需按其 name 显式指定
+    compression = "gzip" if str(getattr(source, "name", source)).lower().endswith(".gz") else "infer"
+    header = pd.read_csv(source, nrows=0, compression=compression).columns
+    if hasattr(source, "seek"): source.seek(0)
+    cols = {role: _match_column(header, role, columns.get(role)) for role in SESSION_LOG_COLUMNS}
+    missing = [role for role in ("start", "kwh") if cols[role] is None]
+    if missing: raise ValueError(f"无法识别会话日志的必要列：{', '.join(missing)} (现有列：{', '.join(map(str, header))})")
+    usecols = [c for c in cols.values() if c is not None]
+
+    log = SessionLog(max_session_hours)
+    for chunk in pd.read_csv(source, usecols=usecols, chunksize=chunk_size, compression=compression, dtype={c: str for c in usecols if c not in (cols["kwh"],)}):
+        connector = None
+        if cols["connector"] is not None or cols["charger"] is not None:
+            parts = [chunk[cols[r]].fillna("") for r in ("charger", "connector") if cols[r] is not None]
+            connector = parts[0] if len(parts) == 1 else parts[0] + "/" + parts[1]
+        log.update(_local_time(chunk[cols["start"]], date_format, tz),
+                   _local_time(chunk[cols["stop"]], date_format, tz) if cols["stop"] is not None else None,
+                   pd.to_numeric(chunk[cols["kwh"]], errors='coerce'), connector)
+        if on_chunk is not None: on_chunk(log.rows)
+    if log.first is None: raise ValueError("会话日志中没有有效记录 (开始时间可解析且电量为正)")
+    return log
+
+def fit_ramp(t_days, values, weights=None, tau_range=RAMP_TAU_RANGE):
+    """拟合饱和指数爬坡 y(t) = K × (1 − exp(−t / τ))：τ 在对数网格上搜索，K 取加权最小二乘闭式解"""
+    t = np.asarray(t_days, dtype=float); y = np.asarray(values, dtype=float)
+    w = np.ones_like(y) if weights is None else np.asarray(weights, dtype=float)
+    tau = np.geomspace(*tau_range, 200)[:, None]
+    basis = 1 - np.exp(-t / tau)
+    k = (basis * w * y).sum(axis=1) / np.maximum((basis ** 2 * w).sum(axis=1), 1e-12)
+    sse = (w * (y - k[:, None] * basis) ** 2).sum(axis=1)
+    best = int(np.argmin(sse))
+    return float(k[best]), float(tau[best, 0])
+
+def calibrate_ops_table(log, edited_df, n_guns=None, ceiling=None):
+    """由实测记录校准年度运营表：完整运营年采用实测单枪日均充电量，其余年份取爬坡曲线在该年内的平均值
+
+    爬坡曲线按自然月 (以覆盖天数加权) 的单枪日均拟合，ceiling 为单枪日均上限 (如 主机功率 / 单机枪数 × 24)。
+    人员与薪资沿用 edited_df。返回 (年度表, 说明字典：actual_years、K、tau)。
+    """
+    n_guns = n_guns or log.default_guns()
+    monthly = log.monthly(n_guns)
+    open_day = pd.Timestamp(log.first // _DAY * _DAY, unit='s')
+    month_start = pd.to_datetime(dict(year=monthly["年"], month=monthly["月"], day=1))
+    # 月中点距开业日的天数 (首月 / 末月只计覆盖部分)
+    t_mid = np.maximum((month_start - open_day).dt.days.to_numpy(), 0) + monthly["覆盖天数"].to_numpy() / 2
+    k, tau = fit_ramp(t_mid, monthly["单枪日均 (kWh)"], monthly["覆盖天数"])
+
+    years = log.operating_years(n_guns)
+    n_years = len(edited_df)
+    day = np.arange(n_years * 365, dtype=float) + 0.5
+    fitted = (k * (1 - np.exp(-day / tau))).reshape(n_years, 365).mean(axis=1)
+    actual = years["单枪日均 (kWh)"].to_numpy()[years["完整"].to_numpy()][:n_years]
+    kwh = np.concatenate([actual, fitted[len(actual):]])
+    if ceiling is not None: kwh = np.minimum(kwh, ceiling)
+    df_new = edited_df[OPS_COLUMNS].copy().reset_index(drop=True)
+    df_new["单枪日均充电量 (kWh)"] = np.round(kwh).astype(int)
+    return df_new, {"actual_years": len(actual), "K": k, "tau": tau, "fitted": fitted}
+
+def log_profile(log):
+    """各运营年的 8760 实测负荷曲线 (Y, 8760)：按自然日序对齐 (2 月 29 日并入 2 月 28 日)，
+    覆盖期外的小时以全期同月同时段的平均电量按该年电量水平缩放补齐"""
+    dates, energy, _ = log._covered()
+    doy = dates.dayofyear.to_numpy() - 1
+    doy = np.where(dates.is_leap_year & (doy >= 59), doy - 1, doy)
+    month = dates.month.to_numpy() - 1
+    typical = np.zeros((12, 24)); counts = np.bincount(month, minlength=12)
+    np.add.at(typical, month, energy)
+    typical /= np.maximum(counts, 1)[:, None]
+    overall = energy.sum(axis=1).mean()
+    slot_month = pd.to_datetime(np.arange(365) * _DAY, unit='s').month.to_numpy() - 1
+
+    year = np.arange(len(energy)) // 365
+    profile = np.zeros((year[-1] + 1, HOURS_PER_YEAR))
+    for y in range(year[-1] + 1):
+        sel = year == y
+        slots = np.zeros((365, 24)); hits = np.bincount(doy[sel], minlength=365)
+        np.add.at(slots, doy[sel], energy[sel])
+        slots /= np.maximum(hits, 1)[:, None]
+        level = energy[sel].sum(axis=1).mean() / max(overall, 1e-12)
+        slots[hits == 0] = typical[slot_month[hits == 0]] * level
+        profile[y] = slots.ravel()
+    return normalize_profile(profile)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m ev_model.ingest", description="实测充电记录 → 年度运营配置 CSV / 8760 负荷曲线")
+    parser.add_argument("log", help="会话日志 CSV (可为 .gz 等压缩文件)")
+    parser.add_argument("--years", type=int, default=10, help="年度表年限 (默认 10)")
+    parser.add_argument("--guns", type=int, help="枪数 (缺省按日志中的桩号/枪号计数)")
+    parser.add_argument("--ceiling", type=float, help="单枪日均充电量上限 (kWh)")
+    parser.add_argument("--out", default="ops_from_log.csv", help="输出年度运营配置 CSV (可在界面“导入历史配置”或批量命令行中使用)")
+    parser.add_argument("--profile", help="同时输出 8760 负荷曲线 .npy (可在小时级仿真中上传)")
+    parser.add_argument("--chunk-size", type=int, default=SESSION_LOG_CHUNK_ROWS, help="每块读取行数")
+    args = parser.parse_args(argv)
+
+    log = read_session_log(args.log, chunk_size=args.chunk_size, on_chunk=lambda rows: print(f"\r已读取 {rows:,} 行", end="", file=sys.stderr))
+    print(file=sys.stderr)
+    df_ops, info = calibrate_ops_table(log, build_ops_table(args.years), args.guns, args.ceiling)
+    df_ops.to_csv(Path(args.out), index=False, encoding='utf-8-sig')
+    if args.profile: np.save(args.profile, log_profile(log))
+    print(f"{log.rows:,} 行 (跳过 {log.skipped:,}) | {args.guns or log.default_guns()} 枪 | 覆盖 {log.n_days} 天 | "
+          f"实测 {info['actual_years']} 个完整运营年 | 爬坡 K={info['K']:.0f} kWh, τ={info['tau']:.0f} 天 | 结果已写入 {args.out}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,168 @@
+"""后台任务：有界线程池执行耗时分析，上报进度与中间结果，支持取消并可按任务 ID 重新关联
+
+任务函数以关键字参数 progress 接收 Job.report(进度, 说明, 中间结果)；report 同时是取消检查点，
+取消请求后下一次调用抛出 JobCancelled。相同输入的任务可被多个会话关联 (attach)，会话放弃任务时调用 release，
+最后一个关联者放弃时才取消任务。关联记录按最近一次 attach 计时，超过 watch_ttl 未续期的会话 (已关闭的页面) 不再计入。调度按提交者 (会话) 轮转：全局最多 max_workers 个任务同时运行，
+每个提交者最多 max_per_owner 个，其余排队，单个用户的大批任务不会占满线程池。
+NumPy 批量计算大部分时间释放 GIL，线程池即可并行；需要多进程的分析 (如组合评估 workers > 1) 在任务内部自行开进程池。
+"""
+import threading
+import time
+import traceback
+import uuid
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+from .constants import JOB_MAX_PER_OWNER, JOB_MAX_RETAINED, JOB_MAX_WORKERS, JOB_RETENTION_S, JOB_WATCH_TTL_S
+
+FINISHED = ("done", "failed", "cancelled")
+
+
+class JobCancelled(Exception):
+    """任务在进度检查点被取消"""
+
+
+class Job:
+    """单个后台任务的状态：queued → running → done / failed / cancelled"""
+    def __init__(self, owner, name, key, func, args, kwargs):
+        self.id = uuid.uuid4().hex[:16]
+        self.owner, self.name, self.key = owner, name, key
+        self._call = (func, args, kwargs)
+        self.status = "queued"
+        self.progress, self.message, self.partial = 0.0, "", None
+        self.result = self.error = None
+        self.created = time.time(); self.started = self.finished = None
+        self.watchers = {owner: self.created}   # 关联会话 → 最近一次 attach 时刻
+        self._cancel = threading.Event()
+
+    def report(self, fraction, message=None, partial=None):
+        """上报进度 (0–1)、说明与中间结果；已请求取消时抛出 JobCancelled"""
+        if self._cancel.is_set(): raise JobCancelled()
+        self.progress = float(fraction)
+        if message is not None: self.message = message
+        if partial is not None: self.partial = partial
+
+    @property
+    def done(self):
+        return self.status in FINISHED
+
+    @property
+    def elapsed(self):
+        if self.started is None: return 0.0
+        return (self.finished or time.time()) - self.started
+
+
+class JobManager:
+    """进程级任务管理器：按 ID 查询 / 取消，按提交者轮转调度"""
+    def __init__(self, max_workers=JOB_MAX_WORKERS, max_per_owner=JOB_MAX_PER_OWNER, retention=JOB_RETENTION_S, max_retained=JOB_MAX_RETAINED,
+                 watch_ttl=JOB_WATCH_TTL_S):
+        self.max_workers, self.max_per_owner = max_workers, max_per_owner
+        self.retention, self.max_retained, self.watch_ttl = retention, max_retained, watch_ttl
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ev-job")
+        self._lock = threading.Lock()
+        self._jobs = OrderedDict()
+        self._queues = OrderedDict()
+        self._running = {}
+
+    def submit(self, owner, name, func, *args, key=None, **kwargs):
+        """提交任务，返回任务 ID；func(*args, progress=job.report, **kwargs) 的返回值即任务结果"""
+        job = Job(owner, name, key, func, args, kwargs)
+        with self._lock:
+            self._prune()
+            self._jobs[job.id] = job
+            self._queues.setdefault(owner, deque()).append(job)
+            self._dispatch()
+        return job.id
+
+    def get(self, job_id):
+        with self._lock: return self._jobs.get(job_id)
+
+    def jobs(self, owner=None):
+        with self._lock: return [j for j in self._jobs.values() if owner is None or j.owner == owner]
+
+    def attach(self, job_id, watcher):
+        """登记关注该任务的会话；重复调用即续期 (进度面板每次轮询时调用)"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None: job.watchers[watcher] = time.time()
+            return job
+
+    def release(self, job_id, watcher):
+        """会话放弃任务：没有其他关联会话且任务未结束时取消，返回是否取消"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None: return False
+            job.watchers.pop(watcher, None)
+            if self._live_watchers(job): return False
+        return self.cancel(job_id)
+
+    def watchers(self, job_id):
+        """仍在续期的关联会话"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return self._live_watchers(job) if job is not None else set()
+
+    def cancel(self, job_id):
+        """排队中的任务直接取消；运行中的任务在下一个进度检查点结束"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.done: return False
+            job._cancel.set()
+            if job.status == "queued":
+                self._queues[job.owner].remove(job)
+                job.status, job.finished = "cancelled", time.time()
+        return True
+
+    def stats(self):
+        with self._lock:
+            counts = {}
+            for job in self._jobs.values(): counts[job.status] = counts.get(job.status, 0) + 1
+            return {"workers": self.max_workers, "per_owner": self.max_per_owner, **counts}
+
+    def shutdown(self, wait=True):
+        for job in self.jobs(): self.cancel(job.id)
+        self._pool.shutdown(wait=wait)
+
+    def _live_watchers(self, job):
+        cutoff = time.time() - self.watch_ttl
+        return {w for w, seen in job.watchers.items() if seen >= cutoff}
+
+    def _dispatch(self):
+        """在锁内调用：按提交者轮转，把排队任务放入空闲线程"""
+        while sum(self._running.values()) < self.max_workers:
+            owner = next((o for o, q in self._queues.items() if q and self._running.get(o, 0) < self.max_per_owner), None)
+            if owner is None: return
+            job = self._queues[owner].popleft()
+            self._queues.move_to_end(owner)
+            self._running[owner] = self._running.get(owner, 0) + 1
+            job.status, job.started = "running", time.time()
+            self._pool.submit(self._run, job)
+
+    def _run(self, job):
+        func, args, kwargs = job._call
+        status = "failed"
+        try:
+            job.result = func(*args, progress=job.report, **kwargs)
+            status = "done"
+        except JobCancelled: status = "cancelled"
+        except Exception as e:
+            job.error, status = f"{e}\n{traceback.format_exc()}", "failed"
+        finally:
+            job._call = None
+            # 状态与结束时间在锁内一并写入，_prune 不会看到已结束但无结束时间的任务
+            with self._lock:
+                if status == "done": job.progress = 1.0
+                job.status, job.finished = status, time.time()
+                self._running[job.owner] -= 1
+                if not self._running[job.owner]: del self._running[job.owner]
+                self._dispatch()
+
+    def _prune(self):
+        """在锁内调用：删除超过保留时长的已结束任务，总数超限时从最早结束的删起"""
+        now = time.time()
+        finished = [j for j in self._jobs.values() if j.done]
+        expired = {j.id for j in finished if now - j.finished > self.retention}
+        excess = len(self._jobs) - len(expired) - self.max_retained
+        if excess > 0: expired |= {j.id for j in sorted(finished, key=lambda j: j.finished)[:excess]}
+        for job_id in expired: del self._jobs[job_id]
+        for owner in [o for o, q in self._queues.items() if not q]: del self._queues[owner]
@@ -0,0 +1,124 @@
+"""蒙特卡洛风险模拟：分块抽样 + 流式分位数聚合"""
+import numpy as np
+import pandas as pd
+
+from .constants import MC_PERCENTILES
+from .finance import calculate_capex_details, calculate_financial_batch
+
+
+class StreamingHistogram:
+    """多列固定分箱直方图：分块累加，内存只与 列数 × 分箱数 有关
+
+    分箱区间可由 lo / hi 预先给定 (如回本期取 0..运营年数)，否则由该列首个含有限值的数据块确定 (两侧各留 50% 余量)；
+    后续数据超出区间时按 2 的幂倍放宽区间，并把已有计数合并到新分箱中，不会截断到首/末分箱。
+    NaN 视为正无穷 (如“未回本”)，单独计数。分位数在分箱内线性插值，精度约为区间宽度 / bins。
+    """
+    def __init__(self, n_cols, bins=2000, lo=None, hi=None):
+        self.n_cols, self.bins = n_cols, bins
+        self.lo = np.full(n_cols, np.nan if lo is None else lo, dtype=float)
+        self.hi = np.full(n_cols, np.nan if hi is None else hi, dtype=float)
+        self.counts = np.zeros((n_cols, bins), dtype=np.int64)
+        self.nan_counts = np.zeros(n_cols, dtype=np.int64)
+        self.min = np.full(n_cols, np.inf); self.max = np.full(n_cols, -np.inf)
+        self.total = 0
+
+    def _widen(self, c, vmin, vmax):
+        """放宽第 c 列区间以覆盖 [vmin, vmax]：分箱宽度扩大 k = 2^m 倍，新旧边界对齐，旧分箱整体并入新分箱"""
+        width = (self.hi[c] - self.lo[c]) / self.bins
+        need_lo = max(0, int(np.ceil((self.lo[c] - vmin) / width))); need_hi = max(0, int(np.ceil((vmax - self.hi[c]) / width)))
+        k = 1 << int(np.ceil(np.log2((self.bins + need_lo + need_hi) / self.bins)))
+        extra = self.bins * k - self.bins - need_lo - need_hi
+        shift = 0 if not need_lo else need_lo + (extra if not need_hi else extra // 2)
+        self.counts[c] = np.bincount((np.arange(self.bins) + shift) // k, self.counts[c], minlength=self.bins).astype(np.int64)
+        self.lo[c] -= shift * width; self.hi[c] = self.lo[c] + self.bins * k * width
+
+    def update(self, values):
+        values = np.asarray(values, dtype=float).reshape(-1, self.n_cols)
+        finite = np.isfinite(values)
+        vmin = np.where(finite, values, np.inf).min(axis=0); vmax = np.where(finite, values, -np.inf).max(axis=0)
+        fresh = np.isnan(self.lo) & finite.any(axis=0)
+        if fresh.any():
+            pad = np.maximum((vmax - vmin) * 0.5, np.maximum(np.abs(vmin), 1.0) * 1e-6)
+            self.lo[fresh], self.hi[fresh] = (vmin - pad)[fresh], (vmax + pad)[fresh]
+        for c in np.flatnonzero((vmin < self.lo) | (vmax > self.hi)): self._widen(c, vmin[c], vmax[c])
+        self.total += len(values)
+        self.nan_counts += (~finite).sum(axis=0)
+        self.min = np.minimum(self.min, vmin); self.max = np.maximum(self.max, vmax)
+        with np.errstate(invalid='ignore'):
+            idx = np.floor((values - self.lo) / (self.hi - self.lo) * self.bins)
+        idx = np.clip(np.nan_to_num(idx, nan=0.0), 0, self.bins - 1).astype(np.int64) + np.arange(self.n_cols) * self.bins
+        self.counts += np.bincount(idx[finite], minlength=self.n_cols * self.bins).reshape(self.n_cols, self.bins)
+
+    @property
+    def edges(self):
+        return np.linspace(np.nan_to_num(self.lo, nan=0.0), np.nan_to_num(self.hi, nan=1.0), self.bins + 1, axis=1)
+
+    def quantiles(self, qs):
+        """返回 (len(qs), n_cols) 分位数矩阵；落入 NaN 区间的分位数为 inf"""
+        qs = np.asarray(qs, dtype=float)
+        out = np.full((len(qs), self.n_cols), np.inf)
+        cdf = np.cumsum(self.counts, axis=1); edges = self.edges
+        for c in range(self.n_cols):
+            targets = qs * self.total
+            ok = (targets <= cdf[c, -1]) & (cdf[c, -1] > 0)
+            k = np.searchsorted(cdf[c], targets[ok], side='left').clip(0, self.bins - 1)
+            below = np.where(k > 0, cdf[c, k - 1], 0)
+            frac = np.where(self.counts[c, k] > 0, (targets[ok] - below) / np.maximum(self.counts[c, k], 1), 0.0)
+            vals = edges[c, k] + frac * (edges[c, k + 1] - edges[c, k])
+            out[ok, c] = np.clip(vals, self.min[c], self.max[c])
+        return out
+
+def _sample_factor(rng, dist, spread, size):
+    """以基准值为 1 的相对扰动因子"""
+    if dist == "normal": return 1 + spread * rng.standard_normal(size)
+    if dist == "uniform": return rng.uniform(1 - spread, 1 + spread, size)
+    if dist == "triangular": return rng.triangular(1 - spread, 1, 1 + spread, size) if spread > 0 else np.ones(size)
+    return np.ones(size)
+
+def _summarize(cum_hist, payback_hist, n_draws, percentiles):
+    """由流式直方图汇总分位数结果 (最终结果与中间结果共用)"""
+    labels = [f"P{p}" for p in percentiles]
+    cum_q = cum_hist.quantiles(np.asarray(percentiles) / 100)
+    df_fan = pd.DataFrame(cum_q.T, columns=labels, index=pd.Index([f"Y{i}" for i in range(cum_hist.n_cols)], name="年份"))
+    payback_q = payback_hist.quantiles(np.asarray(percentiles) / 100)[:, 0]
+    return {
+        "n_draws": n_draws,
+        "cumulative_cash": df_fan,
+        "payback": dict(zip(labels, payback_q)),
+        "final_cash": dict(zip(labels, cum_q[:, -1])),
+        "prob_payback": 1 - payback_hist.nan_counts[0] / max(payback_hist.total, 1),
+        "payback_hist": (payback_hist.counts[0], payback_hist.edges[0]),
+        "final_cash_hist": (cum_hist.counts[-1], cum_hist.edges[-1]),
+    }
+
+def run_monte_carlo(edited_df, inputs, dist_spec, n_draws=200000, seed=42, chunk_size=20000, percentiles=MC_PERCENTILES, progress=None):
+    """蒙特卡洛风险模式：分块抽样 -> 批量财务引擎 -> 流式直方图，不保存任何单条路径
+
+    dist_spec: {参数: (分布, 相对幅度)}，参数取 price_sale / price_cost / inflation_rate / power_efficiency / daily_kwh；daily_kwh 为逐年独立抽样。
+    progress(进度, 说明, 中间结果) 在每块之后回调，中间结果为已完成抽样的汇总 (结构同返回值)。
+    """
+    rng = np.random.default_rng(seed)
+    capex_data = calculate_capex_details(inputs)
+    base_kwh = edited_df["单枪日均充电量 (kWh)"].to_numpy(dtype=float)
+    staff = edited_df["运营人数 (人)"].to_numpy(dtype=float)[None, :]
+    salary = edited_df["人均年薪 (AED)"].to_numpy(dtype=float)[None, :]
+    n_years = len(base_kwh)
+    cum_hist = StreamingHistogram(n_years + 1); payback_hist = StreamingHistogram(1, lo=0.0, hi=float(n_years))
+
+    for start in range(0, n_draws, chunk_size):
+        n = min(chunk_size, n_draws - start)
+        draw = dict(inputs)
+        for key in ("price_sale", "price_cost", "inflation_rate", "power_efficiency"):
+            dist, spread = dist_spec.get(key, (None, 0.0))
+            if dist: draw[key] = inputs[key] * _sample_factor(rng, dist, spread, n)
+        draw['price_sale'] = np.maximum(draw['price_sale'], 0); draw['price_cost'] = np.maximum(draw['price_cost'], 0)
+        draw['power_efficiency'] = np.clip(draw['power_efficiency'], 0.01, 1.0)
+        dist, spread = dist_spec.get("daily_kwh", (None, 0.0))
+        daily_kwh = base_kwh * _sample_factor(rng, dist, spread, (n, n_years)) if dist else np.broadcast_to(base_kwh, (n, n_years))
+        res = calculate_financial_batch(np.clip(daily_kwh, 0, None), staff, salary, capex_data, draw)
+        cum_hist.update(res["cumulative_cash"]); payback_hist.update(res["payback"])
+        if progress is not None:
+            done = start + n
+            progress(done / n_draws, f"已完成 {done:,} / {n_draws:,} 次抽样", _summarize(cum_hist, payback_hist, done, percentiles))
+
+    return _summarize(cum_hist, payback_hist, n_draws, percentiles)
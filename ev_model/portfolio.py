@@ -0,0 +1,94 @@
+"""多站点组合评估：站点表批量计算 + 按开业年份错位汇总"""
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from .constants import PORTFOLIO_CHUNK_SIZE, PORTFOLIO_TEMPLATE_KEYS
+from .finance import calculate_capex_details, calculate_financial_batch
+
+
+def _site_params(sites_df, inputs):
+    """站点表中与 inputs 同名的列覆盖基准参数 (空值沿用基准)"""
+    params = dict(inputs)
+    for key, value in inputs.items():
+        if key in sites_df.columns and not key.startswith('enable_'):
+            params[key] = pd.to_numeric(sites_df[key], errors='coerce').fillna(value).to_numpy(dtype=float)
+    return params
+
+def _site_kwh(sites_df, n_years, default_kwh):
+    """读取 Y1..Yn 列的单枪日均充电量爬坡，缺失年份沿用上一年，超出部分截断"""
+    cols = sorted((c for c in sites_df.columns if re.fullmatch(r"Y\d+", str(c))), key=lambda c: int(c[1:]))
+    if not cols: return np.broadcast_to(default_kwh, (len(sites_df), n_years))
+    kwh = sites_df[cols].apply(pd.to_numeric, errors='coerce').ffill(axis=1).fillna(0).to_numpy(dtype=float)
+    if kwh.shape[1] < n_years: kwh = np.concatenate([kwh, np.repeat(kwh[:, -1:], n_years - kwh.shape[1], axis=1)], axis=1)
+    return kwh[:, :n_years]
+
+def _sustained_payback(cumulative, fcf):
+    """组合回本期：最后一次累计现金流为负的期间之后转正 (期内线性插值)；后开业站点的投资会使累计现金流再次转负，
+    故不取首次转正的时点。期末仍为负时为 NaN"""
+    negative = np.flatnonzero(cumulative < 0)
+    if not len(negative): return 0.0
+    last = negative[-1]
+    if last == len(cumulative) - 1: return np.nan
+    return last + abs(cumulative[last]) / fcf[last + 1]
+
+def _evaluate_site_chunk(sites_df, inputs, ops_df):
+    staff = ops_df["运营人数 (人)"].to_numpy(dtype=float)[None, :]
+    salary = ops_df["人均年薪 (AED)"].to_numpy(dtype=float)[None, :]
+    kwh = _site_kwh(sites_df, len(ops_df), ops_df["单枪日均充电量 (kWh)"].to_numpy(dtype=float))
+    params = _site_params(sites_df, inputs)
+    res = calculate_financial_batch(kwh, staff, salary, calculate_capex_details(params), params)
+    return res["fcf"], res["payback"]
+
+def evaluate_portfolio(sites_df, inputs, ops_df, chunk_size=PORTFOLIO_CHUNK_SIZE, workers=1, progress=None):
+    """多站点组合评估：站点按块向量化计算 (workers > 1 时分发到进程池)，再按开业年份错位汇总
+
+    ops_df 为年度运营表，提供人员/薪资及未指定爬坡站点的默认充电量；返回站点明细、组合年度现金流、
+    资金峰值需求与组合回本期 (以首个站点开业为 T0，取累计现金流最后一次转正的时点，未回本为 NaN)。progress(进度, 说明) 在每块完成后回调。
+    """
+    sites_df = sites_df.reset_index(drop=True)
+    chunks = [sites_df.iloc[i:i + chunk_size] for i in range(0, len(sites_df), chunk_size)]
+    parallel = workers > 1 and len(chunks) > 1
+    pool = ProcessPoolExecutor(max_workers=workers) if parallel else None
+    try:
+        if parallel:
+            futures = [pool.submit(_evaluate_site_chunk, chunk, inputs, ops_df) for chunk in chunks]
+            results = (f.result() for f in futures)
+        else: results = (_evaluate_site_chunk(chunk, inputs, ops_df) for chunk in chunks)
+        parts = []
+        for part in results:
+            parts.append(part)
+            if progress is not None: progress(len(parts) / len(chunks), f"已评估 {min(len(parts) * chunk_size, len(sites_df)):,} / {len(sites_df):,} 个站点")
+    except BaseException:
+        # 取消 (progress 抛出 JobCancelled) 或失败：撤销尚未开始的块，不等待进程池排空
+        if pool is not None: pool.shutdown(wait=False, cancel_futures=True)
+        raise
+    if pool is not None: pool.shutdown()
+    fcf = np.concatenate([p[0] for p in parts]); payback = np.concatenate([p[1] for p in parts])
+    cumulative = np.cumsum(fcf, axis=1)
+    total_capex = -fcf[:, 0]
+
+    start = pd.to_numeric(sites_df.get("开业年份", pd.Series(0, index=sites_df.index)), errors='coerce').fillna(0).clip(lower=0).astype(int).to_numpy()
+    n_periods = int(start.max(initial=0)) + fcf.shape[1]
+    periods = start[:, None] + np.arange(fcf.shape[1])
+    portfolio_fcf = np.bincount(periods.ravel(), weights=fcf.ravel(), minlength=n_periods)
+    capex_by_period = np.bincount(start, weights=total_capex, minlength=n_periods)
+    portfolio_cum = np.cumsum(portfolio_fcf)
+    portfolio_payback = _sustained_payback(portfolio_cum, portfolio_fcf)
+
+    names = sites_df["站点"].astype(str) if "站点" in sites_df.columns else pd.Series([f"Site-{i + 1}" for i in range(len(sites_df))])
+    df_sites = pd.DataFrame({"站点": names, "开业年份": start, "初始投资": total_capex, "回本期": payback,
+                             "回本时点": start + payback, "期末累计现金流": cumulative[:, -1]})
+    df_annual = pd.DataFrame({"期间": [f"T{t}" for t in range(n_periods)], "新增投资": capex_by_period,
+                              "组合FCF": portfolio_fcf, "组合累计现金流": portfolio_cum})
+    return {"sites": df_sites, "annual": df_annual, "total_capex": total_capex.sum(),
+            "peak_funding": max(0.0, -portfolio_cum.min()), "payback": portfolio_payback}
+
+def portfolio_template(inputs, edited_df, n_sites=3):
+    row = {"站点": "", "开业年份": 0, **{k: inputs[k] for k in PORTFOLIO_TEMPLATE_KEYS}}
+    row.update({f"Y{i + 1}": v for i, v in enumerate(edited_df["单枪日均充电量 (kWh)"])})
+    df = pd.DataFrame([row] * n_sites)
+    df["站点"] = [f"Site-{i + 1}" for i in range(n_sites)]; df["开业年份"] = list(range(n_sites))
+    return df
@@ -0,0 +1,110 @@
+"""敏感性分析：单因素龙卷风图与二维参数网格扫描"""
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from .constants import INTEGER_KEYS, KWH_SCALE_KEY, SENSITIVITY_EXCLUDE, SENSITIVITY_LABELS, SWEEP_CACHE_MAX_STRIPS
+from .finance import calculate_capex_details, calculate_financial_batch, scenario_key
+
+
+def sensitivity_keys(inputs):
+    keys = [k for k, v in inputs.items() if isinstance(v, (int, float)) and not isinstance(v, bool)
+            and not k.startswith('enable_') and k not in SENSITIVITY_EXCLUDE]
+    return keys + [KWH_SCALE_KEY]
+
+def evaluate_overrides(edited_df, inputs, overrides):
+    """以 (S,) 数组覆盖部分参数 (含日均充电量倍数) 后一次性批量求值"""
+    n = len(next(iter(overrides.values())))
+    params = dict(inputs)
+    params.update({k: np.asarray(v, dtype=float) for k, v in overrides.items() if k != KWH_SCALE_KEY})
+    params['power_efficiency'] = np.clip(params['power_efficiency'], 0.01, 1.0)
+    kwh = edited_df["单枪日均充电量 (kWh)"].to_numpy(dtype=float)[None, :]
+    kwh = kwh * np.asarray(overrides.get(KWH_SCALE_KEY, np.ones(n)), dtype=float)[:, None]
+    staff = edited_df["运营人数 (人)"].to_numpy(dtype=float)[None, :]
+    salary = edited_df["人均年薪 (AED)"].to_numpy(dtype=float)[None, :]
+    return calculate_financial_batch(kwh, staff, salary, calculate_capex_details(params), params)
+
+def _perturb(key, base, delta):
+    if key == KWH_SCALE_KEY: base = 1.0
+    if key in INTEGER_KEYS:
+        step = max(1, round(abs(base) * delta))
+        return max(1, base - step), base + step
+    if key == 'power_efficiency': return base * (1 - delta), min(base * (1 + delta), 1.0)
+    return base * (1 - delta), base * (1 + delta)
+
+def run_tornado(edited_df, inputs, delta=0.1, keys=None):
+    """单因素 ±Δ 敏感性：所有参数的高/低情景合并为一个批次计算，按期末累计现金流波动排序"""
+    keys = keys or sensitivity_keys(inputs)
+    n = 2 * len(keys)
+    overrides = {k: np.full(n, 1.0 if k == KWH_SCALE_KEY else float(inputs[k])) for k in keys}
+    lows, highs = [], []
+    for i, key in enumerate(keys):
+        low, high = _perturb(key, overrides[key][0], delta)
+        overrides[key][2 * i], overrides[key][2 * i + 1] = low, high
+        lows.append(low); highs.append(high)
+    res = evaluate_overrides(edited_df, inputs, overrides)
+    final = res["cumulative_cash"][:, -1]; payback = res["payback"]
+    df = pd.DataFrame({
+        "参数": [SENSITIVITY_LABELS.get(k, k) for k in keys], "key": keys, "低值": lows, "高值": highs,
+        "期末累计(低)": final[0::2], "期末累计(高)": final[1::2],
+        "回本期(低)": payback[0::2], "回本期(高)": payback[1::2],
+    })
+    df["波动"] = (df["期末累计(高)"] - df["期末累计(低)"]).abs()
+    return df.sort_values("波动", ascending=False, ignore_index=True)
+
+_SWEEP_CACHE = OrderedDict()
+_SWEEP_CACHE_LOCK = threading.Lock()
+_SWEEP_STATS = {"hits": 0, "misses": 0}
+
+def _sweep_cache_get(key):
+    with _SWEEP_CACHE_LOCK:
+        if key in _SWEEP_CACHE:
+            _SWEEP_CACHE.move_to_end(key); _SWEEP_STATS["hits"] += 1
+            return _SWEEP_CACHE[key]
+        _SWEEP_STATS["misses"] += 1
+    return None
+
+def sweep_cache_stats():
+    """扫描条带缓存的命中/未命中次数与当前条带数"""
+    with _SWEEP_CACHE_LOCK: return {**_SWEEP_STATS, "entries": len(_SWEEP_CACHE)}
+
+def _sweep_cache_put(key, value):
+    with _SWEEP_CACHE_LOCK:
+        _SWEEP_CACHE[key] = value; _SWEEP_CACHE.move_to_end(key)
+        while len(_SWEEP_CACHE) > SWEEP_CACHE_MAX_STRIPS: _SWEEP_CACHE.popitem(last=False)
+
+def run_sweep(edited_df, inputs, x_key, x_values, y_key, y_values):
+    """二维参数网格扫描，返回 (ny, nx) 的回本期与期末累计现金流矩阵
+
+    结果按行/列条带缓存：仅修改其中一个坐标轴时，另一轴上已算过的条带直接复用，只计算缺失部分。
+    """
+    xs = np.asarray(x_values, dtype=float); ys = np.asarray(y_values, dtype=float)
+    base = (scenario_key(edited_df, inputs), x_key, y_key)
+    xs_t, ys_t = tuple(xs.tolist()), tuple(ys.tolist())
+    rows = [_sweep_cache_get(base + ("row", xs_t, y)) for y in ys_t]
+    cols = [_sweep_cache_get(base + ("col", ys_t, x)) for x in xs_t]
+    missing_rows = [i for i, r in enumerate(rows) if r is None]
+    missing_cols = [j for j, c in enumerate(cols) if c is None]
+    payback = np.empty((len(ys), len(xs))); final = np.empty((len(ys), len(xs)))
+
+    if len(missing_rows) * len(xs) <= len(missing_cols) * len(ys):
+        for i, r in enumerate(rows):
+            if r is not None: payback[i], final[i] = r
+        gx, gy = np.meshgrid(xs, ys[missing_rows])
+        computed = gx.size
+        if computed:
+            res = evaluate_overrides(edited_df, inputs, {x_key: gx.ravel(), y_key: gy.ravel()} if x_key != y_key else {x_key: gx.ravel()})
+            payback[missing_rows] = res["payback"].reshape(gx.shape); final[missing_rows] = res["cumulative_cash"][:, -1].reshape(gx.shape)
+    else:
+        for j, c in enumerate(cols):
+            if c is not None: payback[:, j], final[:, j] = c
+        gy, gx = np.meshgrid(ys, xs[missing_cols])
+        computed = gx.size
+        res = evaluate_overrides(edited_df, inputs, {x_key: gx.ravel(), y_key: gy.ravel()} if x_key != y_key else {x_key: gx.ravel()})
+        payback[:, missing_cols] = res["payback"].reshape(gx.shape).T; final[:, missing_cols] = res["cumulative_cash"][:, -1].reshape(gx.shape).T
+
+    for i, y in enumerate(ys_t): _sweep_cache_put(base + ("row", xs_t, y), (payback[i].copy(), final[i].copy()))
+    for j, x in enumerate(xs_t): _sweep_cache_put(base + ("col", ys_t, x), (payback[:, j].copy(), final[:, j].copy()))
+    return {"x": xs, "y": ys, "payback": payback, "final_cash": final, "computed": computed}
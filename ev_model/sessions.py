@@ -0,0 +1,165 @@
+"""充电会话离散事件仿真：随机到站 → 先到先服务排队 (超时离开) → 桩内功率分配 → 按充电曲线充至目标 SOC
+
+以“天”为独立样本 (夜间车流稀少，忽略跨日排队)，全年 365 天 × 多个年份拼成一个批次，按固定时间步长同步推进，
+枪状态按 (天 × 枪) 展平存放；年份可分组分发到进程池，随机数按年份派生，结果与分组方式无关。
+"""
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .constants import DEFAULT_DAILY_SHAPE, DEFAULT_FLEET, DEFAULT_TOU_TARIFF, SESSION_STEP_MIN, SESSION_TAIL_HOURS
+
+
+def mean_session_kwh(fleet=DEFAULT_FLEET):
+    """单次会话的期望充电量 (kWh)：到站 SOC 均匀分布，已达目标 SOC 的车辆充电量为 0"""
+    lo, hi = fleet["soc_arrival"]; target = fleet["soc_target"]
+    if target <= lo: gap = 0.0
+    elif target >= hi: gap = target - (lo + hi) / 2
+    else: gap = (target - lo) ** 2 / (2 * (hi - lo))
+    return float(np.mean(fleet["battery_kwh"]) * gap)
+
+def arrivals_from_kwh(daily_kwh_per_gun, n_guns, fleet=DEFAULT_FLEET):
+    """由单枪日均充电量 (需求口径) 反推全站日均到站车辆数；没有车辆需要充电时为 0"""
+    daily_kwh = np.asarray(daily_kwh_per_gun, dtype=float) * n_guns
+    session_kwh = mean_session_kwh(fleet)
+    return daily_kwh / session_kwh if session_kwh > 0 else np.zeros_like(daily_kwh)
+
+def _sample_arrivals(rng, daily_arrivals, days, arrival_shape, fleet):
+    """按日内形状抽样一年的到站时刻 (分钟，逐日升序，空位为 inf) 及车辆电池、峰值功率与到站 SOC"""
+    counts = rng.poisson(daily_arrivals, days)
+    width = max(int(counts.max(initial=0)), 1)
+    weights = np.asarray(arrival_shape, dtype=float)
+    hour = rng.choice(24, size=(days, width), p=weights / weights.sum())
+    minute = np.where(np.arange(width) < counts[:, None], (hour + rng.random((days, width))) * 60, np.inf)
+    minute.sort(axis=1)
+    share = np.asarray(fleet["vehicle_kw_share"], dtype=float)
+    return {
+        "arrival": minute, "count": counts,
+        "battery": rng.uniform(*fleet["battery_kwh"], (days, width)),
+        "vehicle_kw": rng.choice(np.asarray(fleet["vehicle_kw"], dtype=float), size=(days, width), p=share / share.sum()),
+        "soc": rng.uniform(*fleet["soc_arrival"], (days, width)),
+    }
+
+def _stack_years(samples):
+    """不同年份的到站矩阵宽度不同，以 inf / 0 补齐后按天拼接"""
+    width = max(s["arrival"].shape[1] for s in samples)
+    def pad(a, fill): return np.pad(a, ((0, 0), (0, width - a.shape[1])), constant_values=fill)
+    stacked = {k: np.concatenate([pad(s[k], np.inf if k == "arrival" else 0.0) for s in samples]) for k in ("arrival", "battery", "vehicle_kw", "soc")}
+    stacked["count"] = np.concatenate([s["count"] for s in samples])
+    return stacked
+
+def share_pile_power(demand, pile_kw):
+    """桩内多枪按最大最小公平 (注水法) 分配桩功率：demand 为 (..., 枪数/桩) 的各枪需求功率"""
+    if demand.shape[-1] == 1: return np.minimum(demand, pile_kw)
+    d = np.sort(demand, axis=-1)
+    level = (pile_kw - (np.cumsum(d, axis=-1) - d)) / np.arange(d.shape[-1], 0, -1)
+    over = d > level
+    water = np.take_along_axis(level, np.argmax(over, axis=-1)[..., None], axis=-1)
+    return np.minimum(demand, np.where(over.any(axis=-1, keepdims=True), water, np.inf))
+
+def _simulate_days(arrivals, n_piles, guns_per_pile, pile_kw, site_kw, fleet, step_min, tail_hours):
+    """同步推进所有天的排队与充电，返回逐日充电量、服务/离开车次、枪忙碌分钟及每辆车的等待时间
+
+    枪状态按 (天 × 枪) 展平存放，每步只对在充的枪计算功率；仅桩内需求超过桩功率时才做注水分配。
+    """
+    # 到站 SOC 已达目标的车辆无需充电：计为已服务 (等待 0)，不排队也不占枪
+    skip = np.isfinite(arrivals["arrival"]) & (arrivals["soc"] >= fleet["soc_target"])
+    n_skip = skip.sum(axis=1)
+    if n_skip.any():
+        order = np.argsort(np.where(skip, np.inf, arrivals["arrival"]), axis=1, kind='stable')
+        arrivals = {k: np.take_along_axis(np.where(skip, np.inf, v) if k == "arrival" else v, order, axis=1)
+                    for k, v in arrivals.items() if k != "count"} | {"count": arrivals["count"] - n_skip}
+    arrival, count = arrivals["arrival"], arrivals["count"]
+    n_days, width = arrival.shape
+    n_guns = n_piles * guns_per_pile
+    padded = np.concatenate([arrival, np.full((n_days, 1), np.inf)], axis=1)
+    curve_soc, curve_frac = np.asarray(fleet["curve_soc"], dtype=float), np.asarray(fleet["curve_frac"], dtype=float)
+    target, patience, dt_h = fleet["soc_target"], fleet["max_wait_min"], step_min / 60
+
+    active = np.zeros(n_days * n_guns, dtype=bool)
+    soc = np.zeros(n_days * n_guns); battery = np.ones(n_days * n_guns); vehicle_kw = np.zeros(n_days * n_guns)
+    head = np.zeros(n_days, dtype=np.int64); next_arrival = padded[:, 0].copy(); n_active = np.zeros(n_days, dtype=np.int64)
+    energy = np.zeros(n_days); busy = np.zeros(n_days)
+    served = n_skip.astype(np.int64); turned = np.zeros(n_days, dtype=np.int64)
+    position = np.arange(width)
+    wait = np.where((position >= count[:, None]) & (position < (count + n_skip)[:, None]), 0.0, np.nan)
+
+    for t in np.arange(0.0, (24 + tail_hours) * 60, step_min):
+        # 队首等待最久：超过耐心时长则离开，直到队首仍可等待
+        while (idx := np.flatnonzero(next_arrival + patience < t)).size:
+            head[idx] += 1; turned[idx] += 1; next_arrival[idx] = padded[idx, head[idx]]
+        # 先到先服务接车 (每轮每天最多接一辆)，优先选在充枪数最少的桩
+        while (idx := np.flatnonzero((next_arrival <= t) & (n_active < n_guns))).size:
+            busy_guns = active.reshape(n_days, n_piles, guns_per_pile)[idx]
+            load = busy_guns.sum(axis=2)
+            pile = np.argmin(np.where(load < guns_per_pile, load, guns_per_pile + 1), axis=1)
+            slot = idx * n_guns + pile * guns_per_pile + np.argmin(busy_guns[np.arange(len(idx)), pile], axis=1)
+            car = head[idx]
+            active[slot] = True; n_active[idx] += 1
+            soc[slot] = arrivals["soc"][idx, car]; battery[slot] = arrivals["battery"][idx, car]
+            vehicle_kw[slot] = arrivals["vehicle_kw"][idx, car]
+            wait[idx, car] = t - arrival[idx, car]
+            head[idx] += 1; served[idx] += 1; next_arrival[idx] = padded[idx, head[idx]]
+
+        slot = np.flatnonzero(active)
+        if not slot.size:
+            if t >= 24 * 60 and (head >= count).all(): break
+            continue
+        day = slot // n_guns
+        power = vehicle_kw[slot] * np.interp(soc[slot], curve_soc, curve_frac)
+        pile_demand = np.bincount(slot // guns_per_pile, power, minlength=n_days * n_piles)
+        if (crowded := np.flatnonzero(pile_demand > pile_kw)).size:
+            demand = np.zeros(n_days * n_guns); demand[slot] = power
+            blocks = demand.reshape(-1, guns_per_pile)
+            blocks[crowded] = share_pile_power(blocks[crowded], pile_kw)
+            power = demand[slot]
+        site_demand = np.bincount(day, power, minlength=n_days)
+        if (site_demand > site_kw).any(): power *= np.minimum(1.0, site_kw / np.maximum(site_demand, 1e-12))[day]
+        need = np.maximum(target - soc[slot], 0.0) * battery[slot]
+        delivered = np.minimum(power * dt_h, need)
+        soc[slot] += delivered / battery[slot]
+        energy += np.bincount(day, delivered, minlength=n_days); busy += np.bincount(day, minlength=n_days) * step_min
+        done = slot[need - delivered <= 1e-9]
+        active[done] = False; np.subtract.at(n_active, done // n_guns, 1)
+
+    turned += count - head
+    return energy, served, turned, busy, wait
+
+def _simulate_year_group(seeds, daily_arrivals, days, topology, fleet, arrival_shape, step_min, tail_hours):
+    samples = [_sample_arrivals(np.random.default_rng(s), lam, days, arrival_shape, fleet) for s, lam in zip(seeds, daily_arrivals)]
+    return _simulate_days(_stack_years(samples), *topology, fleet, step_min, tail_hours)
+
+def simulate_sessions(inputs, daily_arrivals, fleet=DEFAULT_FLEET, arrival_shape=DEFAULT_DAILY_SHAPE, days=365, seed=0,
+                      step_min=SESSION_STEP_MIN, tail_hours=SESSION_TAIL_HOURS, power_factor=DEFAULT_TOU_TARIFF["power_factor"], workers=1):
+    """按桩/枪拓扑仿真逐年充电会话，返回 (Y,) 数组字典
+
+    daily_arrivals 为各年全站日均到站车辆数 (泊松均值)；站点总功率受变压器容量 × 功率因数 × 电能效率限制。
+    返回 daily_kwh_per_gun (实现的单枪日均充电量，可直接写入年度运营表)、daily_kwh、arrivals、sessions、
+    turned_away、turn_away_rate、mean_wait_min、p95_wait_min 与 utilization (枪时间利用率)。
+    """
+    daily_arrivals = np.atleast_1d(np.asarray(daily_arrivals, dtype=float))
+    n_years = len(daily_arrivals)
+    n_piles, guns_per_pile = int(inputs['qty_piles']), int(inputs['guns_per_pile'])
+    site_kw = inputs['qty_trans'] * inputs['trans_val'] * power_factor * inputs['power_efficiency']
+    topology = (n_piles, guns_per_pile, float(inputs['pile_power_kw']), site_kw)
+    seeds = np.random.SeedSequence(seed).spawn(n_years)
+    groups = [g for g in np.array_split(np.arange(n_years), max(1, min(workers, n_years))) if len(g)]
+    args = [([seeds[i] for i in g], daily_arrivals[g], days, topology, fleet, arrival_shape, step_min, tail_hours) for g in groups]
+    if len(groups) > 1:
+        with ProcessPoolExecutor(max_workers=len(groups)) as pool: parts = list(pool.map(_simulate_year_group, *zip(*args)))
+    else: parts = [_simulate_year_group(*a) for a in args]
+
+    energy, served, turned, busy = (np.concatenate([p[k] for p in parts]).reshape(n_years, days) for k in range(4))
+    wait = [p[4][i * days:(i + 1) * days] for p in parts for i in range(len(p[0]) // days)]
+    n_guns = n_piles * guns_per_pile
+    arrivals = served.sum(axis=1) + turned.sum(axis=1)
+    with np.errstate(invalid='ignore'):
+        mean_wait = np.array([np.nanmean(w) if np.isfinite(w).any() else np.nan for w in wait])
+        p95_wait = np.array([np.nanpercentile(w, 95) if np.isfinite(w).any() else np.nan for w in wait])
+    return {
+        "daily_kwh_per_gun": energy.mean(axis=1) / max(n_guns, 1), "daily_kwh": energy.mean(axis=1),
+        "arrivals": arrivals, "sessions": served.sum(axis=1), "turned_away": turned.sum(axis=1),
+        "turn_away_rate": turned.sum(axis=1) / np.maximum(arrivals, 1),
+        "mean_wait_min": mean_wait, "p95_wait_min": p95_wait,
+        "utilization": busy.sum(axis=1) / (days * 24 * 60 * max(n_guns, 1)),
+    }
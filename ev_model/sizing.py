@@ -0,0 +1,129 @@
+"""最优配置搜索：在主机数 / 变压器数与规格 / 单机枪数 / 主机功率的离散空间内寻找 NPV 最大或回本期最短的方案
+
+站点需求取当前配置下年度运营表的单枪日均充电量 × 当前总枪数；各方案按日内负荷形状削峰，
+可服务的峰值功率取 主机总功率、枪数 × 车辆平均峰值功率、变压器容量 × 功率因数 × 电能效率 三者最小值。
+先以 CAPEX 闭式解剔除超容量 / 超预算方案，再按税前现金流 (不低于税后) 得到的乐观上界由高到低分块精确求值，
+当已求得的第 K 名优于剩余方案的上界时停止 (分支定界)。
+"""
+import numpy as np
+import pandas as pd
+
+from .constants import (DEFAULT_DAILY_SHAPE, DEFAULT_FLEET, DEFAULT_TOU_TARIFF, SIZING_CHUNK_SIZE, SIZING_GUN_OPTIONS,
+                        SIZING_PILE_RANGE, SIZING_SHORTLIST, SIZING_TRANS_PRICES, SIZING_TRANS_RANGE, STORE_DISCOUNT_RATE)
+from .finance import _payback_from_cumulative, calculate_capex_details, calculate_financial_batch
+from .solver import irr, npv
+
+OBJECTIVES = ("npv", "payback")
+
+
+def _design_grid(inputs, pile_range, trans_range, trans_prices, guns_options, pile_options):
+    """全部候选方案的 (N,) 参数数组；pile_options 为 {主机功率 kW: 单价}，trans_prices 为 {kVA: 单价}"""
+    piles = np.arange(pile_range[0], pile_range[1] + 1)
+    trans = np.arange(trans_range[0], trans_range[1] + 1)
+    kva, kva_price = np.array(list(trans_prices), dtype=float), np.array(list(trans_prices.values()), dtype=float)
+    pile_kw, pile_price = np.array(list(pile_options), dtype=float), np.array(list(pile_options.values()), dtype=float)
+    guns = np.asarray(guns_options)
+    grid = [g.ravel() for g in np.meshgrid(np.arange(len(pile_kw)), guns, piles, np.arange(len(kva)), trans, indexing='ij')]
+    return {"pile_power_kw": pile_kw[grid[0]], "price_pile_unit": pile_price[grid[0]], "guns_per_pile": grid[1].astype(float),
+            "qty_piles": grid[2].astype(float), "trans_val": kva[grid[3]], "price_trans_unit": kva_price[grid[3]], "qty_trans": grid[4].astype(float)}
+
+def served_kwh(demand, cap_kw, daily_shape=DEFAULT_DAILY_SHAPE):
+    """按日内负荷形状削峰后的可服务日电量：Σ_h min(需求 × w_h, 峰值功率)，demand 为 (Y,)，cap_kw 为 (N,)，返回 (N, Y)"""
+    w = np.sort(np.asarray(daily_shape, dtype=float) / np.sum(daily_shape))
+    cum_w = np.concatenate([[0.0], np.cumsum(w)])
+    d = np.asarray(demand, dtype=float)[None, :]; c = np.asarray(cap_kw, dtype=float)[:, None]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratio = np.where(d > 0, c / d, np.inf)
+    below = np.searchsorted(w, ratio, side='right')
+    return c * (len(w) - below) + d * cum_w[below]
+
+def _pretax_cash(served, staff, salary, capex, params, n_years):
+    """乐观上界现金流：税前 (EBITDA − 资金成本)，逐年不低于实际税后 FCF，返回 (N, Y+1)"""
+    year_idx = np.arange(n_years, dtype=float)
+    price_sale = params['price_sale'] * (1 + params['price_sale_growth']) ** year_idx
+    price_cost = params['price_cost'] * (1 + params['price_cost_growth']) ** year_idx
+    inflation = (1 + params['inflation_rate']) ** year_idx
+    fixed = (params['base_rent'] + params['base_it_saas'] + params['base_marketing'] + params['base_maintenance']) * inflation
+    margin = (price_sale - price_cost / params['power_efficiency']) * 365
+    ebitda = served * margin - staff * salary * inflation - fixed
+    total = capex["total_capex"][:, None]
+    return np.concatenate([-total, ebitda - total * params['interest_rate']], axis=1)
+
+def _score(fcf, objective, discount_rate):
+    """统一为越大越好的得分：NPV，或回本期取负 (未回本为 -inf)"""
+    if objective == "npv": return npv(fcf, discount_rate)
+    payback = _payback_from_cumulative(np.cumsum(fcf, axis=1), fcf)
+    return np.where(np.isnan(payback), -np.inf, -payback)
+
+def optimize_sizing(edited_df, inputs, objective="npv", budget=None, pile_range=SIZING_PILE_RANGE, trans_range=SIZING_TRANS_RANGE,
+                    trans_prices=None, guns_options=SIZING_GUN_OPTIONS, pile_options=None, discount_rate=STORE_DISCOUNT_RATE,
+                    oversubscription=1.0, top_k=SIZING_SHORTLIST, daily_shape=DEFAULT_DAILY_SHAPE, fleet=DEFAULT_FLEET,
+                    power_factor=DEFAULT_TOU_TARIFF["power_factor"], chunk_size=SIZING_CHUNK_SIZE):
+    """搜索最优站点配置，返回排名前 top_k 的候选方案
+
+    约束：主机总功率 ≤ 变压器总容量 × oversubscription，初始投资 ≤ budget (None 为不限)。
+    trans_prices 默认取 SIZING_TRANS_PRICES 并以当前规格的单价覆盖；pile_options 默认仅当前主机功率与单价。
+    结果相同的方案只保留设备最少的一组。返回 shortlist (DataFrame)、designs (各方案的参数覆盖字典)、
+    daily_kwh_per_gun ((K, Y) 各方案写入年度表的单枪日均充电量) 与 stats (候选 / 可行 / 精确求值数量)。
+    """
+    if objective not in OBJECTIVES: raise ValueError(f"未知优化目标：{objective}")
+    trans_prices = dict(trans_prices or {**SIZING_TRANS_PRICES, inputs['trans_val']: inputs['price_trans_unit']})
+    pile_options = dict(pile_options or {inputs['pile_power_kw']: inputs['price_pile_unit']})
+    design = _design_grid(inputs, pile_range, trans_range, trans_prices, guns_options, pile_options)
+    n_candidates = len(design["qty_piles"])
+
+    # 1. 可行性剪枝：容量约束与 CAPEX 预算均为闭式计算
+    capex = calculate_capex_details({**inputs, **design})
+    feasible = design["qty_piles"] * design["pile_power_kw"] <= design["qty_trans"] * design["trans_val"] * oversubscription
+    if budget is not None: feasible &= capex["total_capex"] <= budget
+    idx = np.flatnonzero(feasible)
+    design = {k: v[idx] for k, v in design.items()}; capex = {k: np.broadcast_to(np.asarray(v, dtype=float), n_candidates)[idx] for k, v in capex.items()}
+
+    # 2. 可服务电量与乐观上界
+    kwh = edited_df["单枪日均充电量 (kWh)"].to_numpy(dtype=float)
+    staff = edited_df["运营人数 (人)"].to_numpy(dtype=float)[None, :]
+    salary = edited_df["人均年薪 (AED)"].to_numpy(dtype=float)[None, :]
+    demand = kwh * inputs['qty_piles'] * inputs['guns_per_pile']
+    share = np.asarray(fleet["vehicle_kw_share"], dtype=float)
+    vehicle_kw = float(np.dot(fleet["vehicle_kw"], share / share.sum()))
+    guns = design["qty_piles"] * design["guns_per_pile"]
+    cap_kw = np.minimum.reduce([design["qty_piles"] * design["pile_power_kw"], guns * vehicle_kw,
+                                design["qty_trans"] * design["trans_val"] * power_factor * inputs['power_efficiency']])
+    served = served_kwh(demand, cap_kw, daily_shape)
+    params = {k: v for k, v in inputs.items() if not k.startswith('enable_')}
+    bound = _score(_pretax_cash(served, staff, salary, capex, params, len(kwh)), objective, discount_rate)
+
+    # 3. 分支定界：按上界降序分块精确求值，第 K 名 (去重后) 不低于剩余上界即停止
+    order = np.lexsort((guns, capex["total_capex"], -bound))
+    score = np.full(len(idx), np.nan); evaluated = 0
+    for start in range(0, len(order), chunk_size):
+        if evaluated >= top_k:
+            done = order[:evaluated]
+            kth = np.unique(np.round(score[done], 6))[::-1][:top_k]
+            if len(kth) >= top_k and kth[-1] >= bound[order[start]]: break
+        chunk = order[start:start + chunk_size]
+        p = {**inputs, **{k: v[chunk] for k, v in design.items()}}
+        res = calculate_financial_batch(served[chunk] / guns[chunk, None], staff, salary, {k: v[chunk] for k, v in capex.items()}, p)
+        score[chunk] = _score(res["fcf"], objective, discount_rate)
+        evaluated += len(chunk)
+
+    # 4. 排名：得分降序，同分按投资、枪数升序；结果相同 (得分与投资一致) 的方案只保留第一组
+    done = np.flatnonzero(~np.isnan(score))
+    ranked = done[np.lexsort((guns[done], capex["total_capex"][done], -score[done]))]
+    _, first = np.unique(np.stack([np.round(score[ranked], 6), capex["total_capex"][ranked]]), axis=1, return_index=True)
+    top = ranked[np.sort(first)][:top_k]
+    top = top[np.isfinite(score[top])]
+
+    p = {**inputs, **{k: v[top] for k, v in design.items()}}
+    per_gun = served[top] / guns[top, None]
+    res = calculate_financial_batch(per_gun, staff, salary, {k: v[top] for k, v in capex.items()}, p)
+    shortlist = pd.DataFrame({
+        "排名": np.arange(1, len(top) + 1), "主机数": design["qty_piles"][top].astype(int), "主机功率 (kW)": design["pile_power_kw"][top],
+        "单机枪数": design["guns_per_pile"][top].astype(int), "总枪数": guns[top].astype(int),
+        "变压器数": design["qty_trans"][top].astype(int), "变压器规格 (kVA)": design["trans_val"][top].astype(int),
+        "初始投资": capex["total_capex"][top], "NPV": npv(res["fcf"], discount_rate), "IRR": irr(res["fcf"]), "回本期": res["payback"],
+        "期末累计现金流": res["cumulative_cash"][:, -1], "需求满足率": served[top].sum(axis=1) / max(demand.sum(), 1e-12),
+    })
+    designs = [{k: (int(v[i]) if k in ("qty_piles", "qty_trans", "guns_per_pile", "trans_val") else float(v[i])) for k, v in design.items()} for i in top]
+    return {"shortlist": shortlist, "designs": designs, "daily_kwh_per_gun": per_gun,
+            "stats": {"candidates": n_candidates, "feasible": len(idx), "evaluated": evaluated}}
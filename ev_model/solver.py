@@ -0,0 +1,81 @@
+"""目标求解：NPV / IRR 与批量反求盈亏平衡参数"""
+import numpy as np
+
+from .constants import KWH_SCALE_KEY, SOLVER_MAX_ITER, SOLVER_XTOL
+from .finance import _as_column
+from .sensitivity import evaluate_overrides
+
+
+def npv(fcf, rate):
+    """按年末折现的净现值，fcf 为 (S, Y+1)，rate 为标量或 (S,)"""
+    fcf = np.atleast_2d(fcf); rate = _as_column(rate)
+    return (fcf / (1 + rate) ** np.arange(fcf.shape[1])).sum(axis=1)
+
+def batch_root(func, lo, hi, xtol=SOLVER_XTOL, max_iter=SOLVER_MAX_ITER):
+    """批量求根 (Illinois 改进试位法，区间收缩不足一半时改用二分)
+
+    func(x, idx) 对 idx 所指情景的自变量 x 批量求值；每轮只重新计算尚未收敛的情景。
+    区间两端同号的情景返回 NaN。
+    """
+    a = np.array(lo, dtype=float); b = np.array(hi, dtype=float)
+    everyone = np.arange(len(a))
+    fa = func(a, everyone); fb = func(b, everyone)
+    valid = np.sign(fa) != np.sign(fb)
+    x = np.where(fa == 0, a, b); side = np.zeros(len(a), dtype=int); bisect = np.zeros(len(a), dtype=bool)
+    active = everyone[valid & (fa != 0) & (fb != 0)]
+    for _ in range(max_iter):
+        if not len(active): break
+        a_, b_, fa_, fb_ = a[active], b[active], fa[active], fb[active]
+        width = np.abs(b_ - a_)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            x_ = np.where(fb_ != fa_, (a_ * fb_ - b_ * fa_) / (fb_ - fa_), (a_ + b_) / 2)
+        inside = np.isfinite(x_) & (x_ > np.minimum(a_, b_)) & (x_ < np.maximum(a_, b_))
+        x_ = np.where(inside & ~bisect[active], x_, (a_ + b_) / 2)
+        fx = func(x_, active)
+        move_a = np.sign(fx) == np.sign(fa_)
+        # Illinois：同一端点连续两次被保留时，将其函数值减半以避免试位法的单侧收敛
+        fb_ = np.where(move_a & (side[active] == -1), fb_ / 2, fb_); fa_ = np.where(~move_a & (side[active] == 1), fa_ / 2, fa_)
+        a[active] = np.where(move_a, x_, a_); fa[active] = np.where(move_a, fx, fa_)
+        b[active] = np.where(move_a, b_, x_); fb[active] = np.where(move_a, fb_, fx)
+        side[active] = np.where(move_a, -1, 1); x[active] = x_
+        new_width = np.abs(b[active] - a[active])
+        bisect[active] = new_width > width / 2
+        done = (fx == 0) | (new_width <= xtol * np.maximum(1.0, np.abs(x_)))
+        active = active[~done]
+    return np.where(valid, x, np.nan)
+
+def irr(fcf, lo=-0.99, hi=10.0):
+    """批量内部收益率：以 batch_root (Illinois 试位法) 在 [lo, hi] 内求 NPV(r) = 0，区间两端 NPV 同号的现金流返回 NaN"""
+    fcf = np.atleast_2d(fcf); n = len(fcf)
+    return batch_root(lambda r, idx: npv(fcf[idx], r), np.full(n, lo), np.full(n, hi))
+
+def _solve_input(edited_df, inputs, key, objective, lo, hi, overrides=None):
+    """对某一参数批量求根；overrides 为其他参数的 (S,) 情景数组 (可为空，即单情景)"""
+    overrides = {k: np.asarray(v, dtype=float) for k, v in (overrides or {}).items()}
+    n = len(next(iter(overrides.values()))) if overrides else 1
+    evaluate = lambda x, idx: objective(evaluate_overrides(edited_df, inputs, {**{k: v[idx] for k, v in overrides.items()}, key: x}))
+    return batch_root(evaluate, np.full(n, lo, dtype=float), np.full(n, hi, dtype=float))
+
+def solve_break_even_price(edited_df, inputs, discount_rate=0.0, overrides=None):
+    """盈亏平衡销售电价：运营期末 NPV (discount_rate=0 时即累计现金流) 恰为 0"""
+    hi = max(20.0, inputs['price_sale'] * 10)
+    return _solve_input(edited_df, inputs, 'price_sale', lambda res: npv(res["fcf"], discount_rate), 0.0, hi, overrides)
+
+def solve_required_kwh_scale(edited_df, inputs, target_payback, overrides=None):
+    """达到目标回本期所需的最低日均充电量倍数 (相对年度运营表的整体缩放)
+
+    回本期 ≤ T 等价于 T 之前 (含年内线性插值) 累计现金流的最大值 ≥ 0，以此作为连续的求根目标。
+    """
+    def objective(res):
+        cum, fcf = res["cumulative_cash"], res["fcf"]
+        whole = min(int(np.floor(target_payback)), cum.shape[1] - 1)
+        frac = target_payback - whole if whole < cum.shape[1] - 1 else 0.0
+        reached = cum[:, 1:whole + 1].max(axis=1, initial=-np.inf)
+        interp = cum[:, whole] + frac * (fcf[:, whole + 1] if frac else 0.0)
+        return np.maximum(reached, interp)
+    return _solve_input(edited_df, inputs, KWH_SCALE_KEY, objective, 0.0, 50.0, overrides)
+
+def solve_max_pile_price(edited_df, inputs, hurdle_irr, overrides=None):
+    """仍满足门槛 IRR 的最高主机单价：等价于以门槛收益率折现的 NPV 恰为 0"""
+    hi = max(1e7, inputs['price_pile_unit'] * 100)
+    return _solve_input(edited_df, inputs, 'price_pile_unit', lambda res: npv(res["fcf"], hurdle_irr), 0.0, hi, overrides)
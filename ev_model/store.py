@@ -0,0 +1,227 @@
+"""本地情景库：SQLite 索引 (参数、站点、标签、关键指标) + 按批写入的列式结果文件 (.npy)
+
+情景以 scenario_key (年度表 + 参数字典 + 模型版本 MODEL_VERSION 的内容指纹) 为主键，相同情景只计算、存储一次；
+模型口径变更 (MODEL_VERSION 递增) 后旧结果的键不再命中，会重新计算并另存，旧记录仍可在列表中查看；
+每次保存 (单个或一批情景) 写一个 (S, 行, Y+1) 结果文件，索引记录所在文件与行号，读取时按行内存映射；
+同一组参数只存一份 JSON；
+列表与筛选只读 SQLite 中带索引的指标列，不触碰结果文件，数万条情景时查询仍在百毫秒以内。
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+
+import numpy as np
+
+from .constants import OPS_COLUMNS, RESULT_COLUMNS, STORE_DISCOUNT_RATE, STORE_QUERY_LIMIT
+from .finance import scenario_key, scenario_keys
+from .solver import irr, npv
+
+METRIC_COLUMNS = ("capex", "payback", "final_cash", "npv", "irr", "years")
+# 结果文件为 (行, Y+1) 矩阵：逐年结果各一行，年度表三列对齐到 Y1..Yn (T0 为 NaN)，末行 T0 位置存回本期
+_FILE_ROWS = list(RESULT_COLUMNS) + ["ops"] * len(OPS_COLUMNS) + ["payback"]
+_LIST_COLUMNS = ("key", "name", "site", "created") + METRIC_COLUMNS
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS scenarios (
+    key TEXT PRIMARY KEY, name TEXT NOT NULL DEFAULT '', site TEXT NOT NULL DEFAULT '', created REAL NOT NULL,
+    years INTEGER, capex REAL, payback REAL, final_cash REAL, npv REAL, irr REAL,
+    params TEXT NOT NULL REFERENCES params(digest), shard TEXT NOT NULL, row INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS params (digest TEXT PRIMARY KEY, inputs TEXT NOT NULL) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS tags (
+    tag TEXT NOT NULL, key TEXT NOT NULL REFERENCES scenarios(key) ON DELETE CASCADE, PRIMARY KEY (tag, key)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_tags_key ON tags(key);
+CREATE INDEX IF NOT EXISTS idx_scenarios_site ON scenarios(site);
+CREATE INDEX IF NOT EXISTS idx_scenarios_created ON scenarios(created);
+CREATE INDEX IF NOT EXISTS idx_scenarios_payback ON scenarios(payback);
+CREATE INDEX IF NOT EXISTS idx_scenarios_npv ON scenarios(npv);
+CREATE INDEX IF NOT EXISTS idx_scenarios_irr ON scenarios(irr);
+CREATE INDEX IF NOT EXISTS idx_scenarios_final_cash ON scenarios(final_cash);
+CREATE INDEX IF NOT EXISTS idx_scenarios_capex ON scenarios(capex);
+CREATE INDEX IF NOT EXISTS idx_scenarios_shard ON scenarios(shard);
+"""
+
+
+def _finite_or_none(value):
+    value = float(value)
+    return value if np.isfinite(value) else None
+
+class ScenarioStore:
+    """情景库：root 下的 scenarios.sqlite 存索引与参数，results/<批次>.npy 存年度表与逐年结果"""
+
+    def __init__(self, root):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.db_path = self.root / "scenarios.sqlite"
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        """每次操作独立连接 (可跨线程/进程并发使用)，正常退出时提交"""
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.execute("PRAGMA foreign_keys=ON")
+        try:
+            yield conn
+            conn.commit()
+        finally: conn.close()
+
+    def _shard_path(self, shard):
+        return self.root / "results" / f"{shard}.npy"
+
+    @staticmethod
+    def key(edited_df, inputs):
+        return scenario_key(edited_df, inputs)
+
+    def __contains__(self, key):
+        with self._connect() as conn:
+            return conn.execute("SELECT 1 FROM scenarios WHERE key = ?", (key,)).fetchone() is not None
+
+    def __len__(self):
+        with self._connect() as conn: return conn.execute("SELECT COUNT(*) FROM scenarios").fetchone()[0]
+
+    def _put_batch(self, keys, ops, inputs, results, payback, names, site, tags):
+        """写入一批情景：已入库的键只补充名称/站点/标签，仅为新键写结果文件 (全部已存在时不写文件)
+
+        查询已有键、写文件与插入索引在同一个写事务 (BEGIN IMMEDIATE) 内完成，并发保存同一情景也不会留下无索引的结果文件。
+        """
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            existing = set()
+            for i in range(0, len(keys), 500):
+                batch = list(keys[i:i + 500])
+                existing.update(k for (k,) in conn.execute(f"SELECT key FROM scenarios WHERE key IN ({', '.join('?' * len(batch))})", batch))
+            seen, fresh = set(existing), []
+            for i, k in enumerate(keys):
+                if k not in seen: seen.add(k); fresh.append(i)
+            if fresh: self._write_new(conn, fresh, keys, ops, inputs, results, payback, names, site)
+            conn.executemany("""UPDATE scenarios SET name = CASE WHEN ? != '' THEN ? ELSE name END,
+                                                     site = CASE WHEN ? != '' THEN ? ELSE site END WHERE key = ?""",
+                             [(names[i], names[i], site, site, k) for i, k in enumerate(keys) if k in existing])
+            conn.executemany("INSERT OR IGNORE INTO tags (tag, key) VALUES (?, ?)", [(t, k) for k in dict.fromkeys(keys) for t in dict.fromkeys(tags) if t])
+
+    def _write_new(self, conn, fresh, keys, ops, inputs, results, payback, names, site):
+        """为新键写一个结果文件并插入索引行 (在调用方的事务内)"""
+        ops, payback = ops[fresh], np.asarray(payback, dtype=float)[fresh]
+        results = {k: np.asarray(results[k], dtype=float)[fresh] for k in RESULT_COLUMNS}
+        n_scenarios, n_years = ops.shape[:2]
+        matrix = np.full((n_scenarios, len(_FILE_ROWS), n_years + 1), np.nan)
+        for i, k in enumerate(RESULT_COLUMNS): matrix[:, i] = results[k]
+        matrix[:, len(RESULT_COLUMNS):-1, 1:] = ops.transpose(0, 2, 1)
+        matrix[:, -1, 0] = payback
+        shard = f"{time.time_ns():x}-{uuid.uuid4().hex[:8]}"
+        path = self._shard_path(shard)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".tmp.npy")
+        np.save(tmp, matrix)
+        os.replace(tmp, path)
+
+        fcf = results["fcf"]
+        metrics = zip(-fcf[:, 0], payback, results["cumulative_cash"][:, -1], npv(fcf, STORE_DISCOUNT_RATE), irr(fcf))
+        inputs_json = json.dumps(inputs, default=float, ensure_ascii=False)
+        digest = hashlib.sha1(inputs_json.encode()).hexdigest()
+        now = time.time()
+        rows = [(keys[i], names[i], site, now, n_years, *map(_finite_or_none, m), digest, shard, row)
+                for row, (i, m) in enumerate(zip(fresh, metrics))]
+        conn.execute("INSERT OR IGNORE INTO params (digest, inputs) VALUES (?, ?)", (digest, inputs_json))
+        conn.executemany("""INSERT INTO scenarios (key, name, site, created, years, capex, payback, final_cash, npv, irr, params, shard, row)
+                            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""", rows)
+
+    def put(self, edited_df, inputs, df_res, payback, name="", site="", tags=()):
+        """保存单个情景 (df_res 为 calculate_financial_model 的逐年结果表)；已存在时只补充名称/站点/标签，返回情景键"""
+        ops = edited_df[OPS_COLUMNS].to_numpy(dtype=float)[None]
+        results = {k: df_res[col].to_numpy(dtype=float)[None] for k, col in RESULT_COLUMNS.items()}
+        key = scenario_keys(ops, inputs)[0]
+        self._put_batch([key], ops, inputs, results, np.array([np.nan if payback is None else payback]), [name], site, tags)
+        return key
+
+    def put_many(self, ops, inputs, results, names=None, site="", tags=(), keys=None):
+        """批量保存同一组参数下的多个情景 (单个事务)：ops 为 (S, Y, 3)，results 为 calculate_financial_batch 的输出"""
+        ops = np.asarray(ops, dtype=float)
+        keys = keys if keys is not None else scenario_keys(ops, inputs)
+        self._put_batch(keys, ops, inputs, results, np.asarray(results["payback"], dtype=float), names or [""] * len(keys), site, tags)
+        return keys
+
+    def existing(self, keys):
+        """批量判断哪些键已入库 (分批 IN 查询)"""
+        keys, found = list(keys), set()
+        with self._connect() as conn:
+            for i in range(0, len(keys), 500):
+                batch = keys[i:i + 500]
+                found.update(k for (k,) in conn.execute(f"SELECT key FROM scenarios WHERE key IN ({', '.join('?' * len(batch))})", batch))
+        return found
+
+    def load_arrays(self, key):
+        """只读结果文件：返回 RESULT_COLUMNS 各列 (Y+1,)、ops (Y, 3) 与 payback (无回本为 NaN)；不存在返回 None"""
+        with self._connect() as conn: loc = conn.execute("SELECT shard, row FROM scenarios WHERE key = ?", (key,)).fetchone()
+        if loc is None: return None
+        try: data = np.array(np.load(self._shard_path(loc[0]), mmap_mode="r")[loc[1]])
+        except FileNotFoundError: return None
+        arrays = {k: data[i] for i, k in enumerate(RESULT_COLUMNS)}
+        arrays["ops"] = data[len(RESULT_COLUMNS):-1, 1:].T
+        arrays["payback"] = data[-1, 0]
+        return arrays
+
+    def load(self, key):
+        """读取完整情景：参数、年度表、逐年结果表 (与 calculate_financial_model 输出同列) 与回本期；不存在返回 None"""
+        import pandas as pd
+        with self._connect() as conn:
+            row = conn.execute("SELECT name, site, inputs FROM scenarios JOIN params ON params = digest WHERE key = ?", (key,)).fetchone()
+            if row is None: return None
+            tags = [t for (t,) in conn.execute("SELECT tag FROM tags WHERE key = ? ORDER BY tag", (key,))]
+        arrays = self.load_arrays(key)
+        if arrays is None: return None
+        n_years = len(arrays["ops"])
+        ops = pd.DataFrame(arrays["ops"], columns=OPS_COLUMNS)
+        ops.insert(0, "年份", [f"Y{i+1}" for i in range(n_years)])
+        df_res = pd.DataFrame({"年份": [f"Y{i}" for i in range(n_years + 1)], **{col: arrays[k] for k, col in RESULT_COLUMNS.items()}})
+        payback = float(arrays["payback"])
+        return {"key": key, "name": row[0], "site": row[1], "tags": tags, "inputs": json.loads(row[2]),
+                "ops": ops, "results": df_res, "payback": payback if np.isfinite(payback) else None}
+
+    def _where(self, tags=(), site=None, search=None, ranges=None):
+        clauses, params = [], []
+        for tag in tags:
+            clauses.append("key IN (SELECT key FROM tags WHERE tag = ?)"); params.append(tag)
+        if site: clauses.append("site = ?"); params.append(site)
+        if search: clauses.append("(name LIKE ? OR key LIKE ?)"); params += [f"%{search}%", f"{search}%"]
+        for column, (low, high) in (ranges or {}).items():
+            if column not in METRIC_COLUMNS: raise ValueError(f"未知指标：{column}")
+            if low is not None: clauses.append(f"{column} >= ?"); params.append(low)
+            if high is not None: clauses.append(f"{column} <= ?"); params.append(high)
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def query(self, tags=(), site=None, search=None, ranges=None, order_by="created", descending=True, limit=STORE_QUERY_LIMIT, offset=0):
+        """按标签 (全部命中)、站点、名称/键前缀与指标区间 {列: (下限, 上限)} 筛选，返回不含参数的索引行"""
+        import pandas as pd
+        if order_by not in _LIST_COLUMNS: raise ValueError(f"未知排序列：{order_by}")
+        where, params = self._where(tags, site, search, ranges)
+        sql = (f"SELECT {', '.join(_LIST_COLUMNS)} FROM scenarios{where} "
+               f"ORDER BY {order_by} IS NULL, {order_by} {'DESC' if descending else 'ASC'} LIMIT ? OFFSET ?")
+        with self._connect() as conn: rows = conn.execute(sql, params + [int(limit), int(offset)]).fetchall()
+        return pd.DataFrame(rows, columns=list(_LIST_COLUMNS))
+
+    def count(self, tags=(), site=None, search=None, ranges=None):
+        where, params = self._where(tags, site, search, ranges)
+        with self._connect() as conn: return conn.execute(f"SELECT COUNT(*) FROM scenarios{where}", params).fetchone()[0]
+
+    def tag_names(self):
+        with self._connect() as conn: return [t for (t,) in conn.execute("SELECT DISTINCT tag FROM tags ORDER BY tag")]
+
+    def site_names(self):
+        with self._connect() as conn: return [s for (s,) in conn.execute("SELECT DISTINCT site FROM scenarios WHERE site != '' ORDER BY site")]
+
+    def delete(self, keys):
+        """删除索引记录；结果文件整批写入，批内所有情景都删除后才移除该文件"""
+        keys = list(keys)
+        with self._connect() as conn:
+            shards = {sh for (sh,) in conn.execute(f"SELECT DISTINCT shard FROM scenarios WHERE key IN ({', '.join('?' * len(keys))})", keys)} if keys else set()
+            conn.executemany("DELETE FROM scenarios WHERE key = ?", [(k,) for k in keys])
+            orphaned = [sh for sh in shards if conn.execute("SELECT 1 FROM scenarios WHERE shard = ? LIMIT 1", (sh,)).fetchone() is None]
+        for shard in orphaned: self._shard_path(shard).unlink(missing_ok=True)
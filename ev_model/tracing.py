@@ -0,0 +1,115 @@
+"""重跑性能追踪：按阶段记录耗时与内存变化，写入滚动 JSONL 日志并保留最近若干次重跑用于统计
+
+未启用时 stage() 直接返回共享的空上下文，开销仅为一次属性判断。
+片段 (st.fragment) 单独重跑时不经过整页入口，由 scope() 自成一条记录并标注片段名。
+"""
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager, nullcontext
+from logging.handlers import RotatingFileHandler
+from pathlib import Path
+
+import numpy as np
+
+_NULL_STAGE = nullcontext()
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def _rss_bytes():
+    """当前进程常驻内存 (Linux 读 /proc，其他平台退回峰值 RSS)"""
+    try:
+        with open("/proc/self/statm") as f: return int(f.read().split()[1]) * _PAGE_SIZE
+    except OSError:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class _StageTimer:
+    __slots__ = ("trace", "name", "t0", "rss0")
+
+    def __init__(self, trace, name):
+        self.trace, self.name = trace, name
+
+    def __enter__(self):
+        self.rss0 = _rss_bytes(); self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.t0
+        stage = self.trace["stages"].setdefault(self.name, {"ms": 0.0, "rss_delta_mb": 0.0})
+        stage["ms"] += elapsed * 1e3; stage["rss_delta_mb"] += (_rss_bytes() - self.rss0) / 2 ** 20
+        return False
+
+
+class RerunTracer:
+    """跨会话共享的追踪器；每个会话的脚本在独立线程中运行，当前追踪按线程隔离"""
+    def __init__(self, log_path=None, max_bytes=5 * 2 ** 20, backup_count=3, history=2000, enabled=False):
+        self.enabled = enabled
+        self.log_path = Path(log_path) if log_path else None
+        self.history = deque(maxlen=history)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._logger = None
+        self._max_bytes, self._backup_count = max_bytes, backup_count
+
+    def _get_logger(self):
+        if self._logger is None and self.log_path is not None:
+            self.log_path.parent.mkdir(parents=True, exist_ok=True)
+            logger = logging.getLogger(f"ev_model.rerun_trace.{id(self)}")
+            logger.propagate = False; logger.setLevel(logging.INFO)
+            handler = RotatingFileHandler(self.log_path, maxBytes=self._max_bytes, backupCount=self._backup_count, encoding="utf-8")
+            handler.setFormatter(logging.Formatter("%(message)s")); logger.addHandler(handler)
+            self._logger = logger
+        return self._logger
+
+    def begin(self, session_id):
+        if not self.enabled: self._local.trace = None; return
+        self._local.trace = {"session": session_id, "ts": time.time(), "stages": {}, "rss_start_mb": _rss_bytes() / 2 ** 20,
+                             "_t0": time.perf_counter()}
+
+    def stage(self, name):
+        trace = getattr(self._local, "trace", None)
+        return _NULL_STAGE if trace is None else _StageTimer(trace, name)
+
+    @contextmanager
+    def scope(self, session_id, name):
+        """整页重跑中等同于 stage(name)；片段单独重跑 (当前线程无进行中的记录) 时开启并结束一条 scope=name 的记录"""
+        if getattr(self._local, "trace", None) is not None:
+            with self.stage(name): yield
+            return
+        self.begin(session_id)
+        try:
+            with self.stage(name): yield
+        finally: self.end(scope=name)
+
+    def end(self, **extra):
+        trace = getattr(self._local, "trace", None)
+        if trace is None: return None
+        self._local.trace = None
+        trace["total_ms"] = (time.perf_counter() - trace.pop("_t0")) * 1e3
+        trace["rss_end_mb"] = _rss_bytes() / 2 ** 20
+        trace.update(extra)
+        with self._lock:
+            self.history.append(trace)
+            logger = self._get_logger()
+        if logger is not None: logger.info(json.dumps(trace, ensure_ascii=False))
+        return trace
+
+    def stage_stats(self):
+        """最近重跑中各阶段的调用次数、p50/p95 耗时与平均内存变化 (整页与各片段单独重跑的总耗时分列)"""
+        with self._lock: traces = list(self.history)
+        samples = {}
+        for trace in traces:
+            total = f"(total · {trace['scope']})" if "scope" in trace else "(total)"
+            samples.setdefault(total, []).append((trace["total_ms"], trace["rss_end_mb"] - trace["rss_start_mb"]))
+            for name, stage in trace["stages"].items(): samples.setdefault(name, []).append((stage["ms"], stage["rss_delta_mb"]))
+        rows = []
+        for name, values in samples.items():
+            ms = np.array([v[0] for v in values]); rss = np.array([v[1] for v in values])
+            rows.append({"阶段": name, "次数": len(values), "p50 (ms)": float(np.percentile(ms, 50)),
+                         "p95 (ms)": float(np.percentile(ms, 95)), "平均内存变化 (MB)": float(rss.mean())})
+        return sorted(rows, key=lambda r: -r["p95 (ms)"])
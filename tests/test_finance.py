@@ -0,0 +1,78 @@
+"""批量财务引擎与逐年循环版模型 (V10.7 原实现) 的结果一致性"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from ev_model import (DEFAULT_INPUTS, RESULT_COLUMNS, build_ops_table, calculate_capex_details,
+                      calculate_financial_batch, calculate_financial_model)
+
+
+def _reference_model(edited_df, capex_data, inputs):
+    """V10.7 逐年循环实现 (保留作对照)：返回 {结果键: (Y+1,)} 与回本期"""
+    total_capex = capex_data["total_capex"]
+    total_guns = inputs['qty_piles'] * inputs['guns_per_pile']
+    groups = (("charger", "capex_charger"), ("trans", "capex_trans_group"), ("cable", "capex_cable_group"), ("civil", "capex_civil_other"))
+    annual_dep = {g: capex_data[c] / inputs[f'dep_years_{g}'] if inputs[f'enable_dep_{g}'] and inputs[f'dep_years_{g}'] > 0 else 0 for g, c in groups}
+    rows = [dict(revenue=0, opex=0, depreciation=0, ebit=0, tax=0, net_profit=0, fcf=-total_capex, cumulative_cash=-total_capex)]
+    cumulative, payback = -total_capex, None
+    for year_idx, row in edited_df.reset_index(drop=True).iterrows():
+        year_num = year_idx + 1
+        price_sale = inputs['price_sale'] * (1 + inputs['price_sale_growth']) ** year_idx
+        price_cost = inputs['price_cost'] * (1 + inputs['price_cost_growth']) ** year_idx
+        sales_kwh = row["单枪日均充电量 (kWh)"] * total_guns * 365
+        inflation = (1 + inputs['inflation_rate']) ** year_idx
+        fixed = inputs['base_rent'] + inputs['base_it_saas'] + inputs['base_marketing'] + inputs['base_maintenance']
+        opex = sales_kwh / inputs['power_efficiency'] * price_cost + row["运营人数 (人)"] * row["人均年薪 (AED)"] * inflation + fixed * inflation
+        revenue = sales_kwh * price_sale
+        dep = sum(annual_dep[g] for g, _ in groups if inputs[f'enable_dep_{g}'] and year_num <= inputs[f'dep_years_{g}'])
+        ebit = revenue - opex - dep
+        ebt = ebit - total_capex * inputs['interest_rate']
+        tax = (ebt - inputs['tax_threshold']) * inputs['tax_rate'] if ebt > inputs['tax_threshold'] else 0
+        fcf = ebt - tax + dep
+        cumulative += fcf
+        if payback is None and cumulative >= 0:
+            prev = rows[-1]["cumulative_cash"]
+            payback = year_idx + abs(prev) / fcf if fcf > 0 else year_idx + 1
+        rows.append(dict(revenue=revenue, opex=opex, depreciation=dep, ebit=ebit, tax=tax, net_profit=ebt - tax, fcf=fcf, cumulative_cash=cumulative))
+    return {k: np.array([r[k] for r in rows], dtype=float) for k in RESULT_COLUMNS}, payback
+
+
+CASES = {
+    "default": {},
+    "no_charger_dep": {"enable_dep_charger": False},
+    "growth": {"price_sale_growth": 0.02, "price_cost_growth": 0.04, "inflation_rate": 0.05},
+    "high_tax": {"tax_threshold": 0, "tax_rate": 0.2, "qty_piles": 5},
+    "never_pays_back": {"price_sale": 0.45},
+}
+
+
+@pytest.mark.parametrize("overrides", CASES.values(), ids=CASES.keys())
+@pytest.mark.parametrize("years", [3, 10, 20])
+def test_model_matches_loop_reference(overrides, years):
+    inputs = dict(DEFAULT_INPUTS, **overrides, years_duration=years)
+    ops = build_ops_table(years); capex = calculate_capex_details(inputs)
+    expected, expected_payback = _reference_model(ops, capex, inputs)
+    df_res, payback = calculate_financial_model(ops, capex, inputs)
+    for key, col in RESULT_COLUMNS.items():
+        np.testing.assert_allclose(df_res[col].to_numpy(dtype=float), expected[key], rtol=1e-9, atol=1e-6, err_msg=col)
+    assert (payback is None) == (expected_payback is None)
+    if payback is not None: assert payback == pytest.approx(expected_payback, rel=1e-9)
+
+
+def test_batch_rows_match_single_scenarios():
+    """(S,) 参数数组与逐情景年度表：批量结果的每一行等于该情景单独计算的结果"""
+    rng = np.random.default_rng(7)
+    n, years = 6, 8
+    params = {"price_sale": rng.uniform(0.6, 1.6, n), "qty_piles": rng.integers(1, 6, n).astype(float),
+              "dep_years_charger": rng.integers(1, 10, n).astype(float), "interest_rate": rng.uniform(0, 0.1, n)}
+    inputs = dict(DEFAULT_INPUTS, **params, years_duration=years)
+    kwh = rng.uniform(20, 600, (n, years)); staff = rng.integers(1, 5, (n, years)).astype(float)
+    salary = rng.uniform(40000, 120000, (n, years))
+    batch = calculate_financial_batch(kwh, staff, salary, calculate_capex_details(inputs), inputs)
+    for i in range(n):
+        single = dict(inputs, **{k: float(v[i]) for k, v in params.items()})
+        ops = pd.DataFrame({"单枪日均充电量 (kWh)": kwh[i], "运营人数 (人)": staff[i], "人均年薪 (AED)": salary[i]})
+        expected, expected_payback = _reference_model(ops, calculate_capex_details(single), single)
+        for key in RESULT_COLUMNS: np.testing.assert_allclose(batch[key][i], expected[key], rtol=1e-9, atol=1e-6, err_msg=key)
+        if expected_payback is None: assert np.isnan(batch["payback"][i])
+        else: assert batch["payback"][i] == pytest.approx(expected_payback, rel=1e-9)
@@ -0,0 +1,41 @@
+"""会话日志读取：上传的 .gz 文件对象须按文件名解压，与明文 CSV 聚合结果一致"""
+import gzip
+import io
+
+import numpy as np
+import pytest
+
+from ev_model import read_session_log
+
+CSV = (
+    "start_time,stop_time,kwh,charger_id,connector\n"
+    "2024-01-01 08:00,2024-01-01 08:40,35.5,CP1,1\n"
+    "2024-01-01 09:15,2024-01-01 10:00,42.0,CP1,2\n"
+    "2024-01-02 18:30,2024-01-02 19:05,28.25,CP2,1\n"
+    "2024-01-03 23:50,2024-01-04 00:30,50.0,CP2,2\n"
+)
+
+
+def _upload(data, name):
+    """模拟 Streamlit 的 UploadedFile：带 name 属性的内存文件对象"""
+    buf = io.BytesIO(data); buf.name = name
+    return buf
+
+
+def _summary(log):
+    return log.rows, log.first, log.last, sorted(log.connectors), log.energy.sum(), log.sessions.sum()
+
+
+@pytest.mark.parametrize("chunk_size", [1, 1000])
+def test_gzip_upload_matches_plain_csv(chunk_size):
+    plain = read_session_log(_upload(CSV.encode(), "sessions.csv"), chunk_size=chunk_size)
+    packed = read_session_log(_upload(gzip.compress(CSV.encode()), "sessions.csv.GZ"), chunk_size=chunk_size)
+    assert plain.rows == 4 and len(plain.connectors) == 4
+    assert _summary(packed)[:4] == _summary(plain)[:4]
+    np.testing.assert_allclose(_summary(packed)[4:], _summary(plain)[4:])
+
+
+def test_gzip_path(tmp_path):
+    path = tmp_path / "sessions.csv.gz"
+    path.write_bytes(gzip.compress(CSV.encode()))
+    assert read_session_log(str(path)).rows == 4
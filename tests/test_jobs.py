@@ -0,0 +1,47 @@
+"""后台任务：关联会话需定期续期，过期的关联者 (已关闭的页面) 不阻止取消、也不保留任务"""
+import threading
+import time
+
+from ev_model import JobManager
+
+
+def _blocking_job(gate):
+    def run(progress):
+        while not gate.wait(0.01): progress(0.5)
+        return "ok"
+    return run
+
+
+def _wait_status(manager, job_id, status, timeout=5.0):
+    deadline = time.time() + timeout
+    while manager.get(job_id).status != status and time.time() < deadline: time.sleep(0.01)
+    return manager.get(job_id).status
+
+
+def test_stale_watcher_expires():
+    manager, gate = JobManager(max_workers=1, watch_ttl=0.2), threading.Event()
+    try:
+        job_id = manager.submit("a", "job", _blocking_job(gate))
+        manager.attach(job_id, "b")
+        assert manager.watchers(job_id) == {"a", "b"}
+        time.sleep(0.3)
+        manager.attach(job_id, "b")   # 仅 b 续期
+        assert manager.watchers(job_id) == {"b"}
+    finally:
+        gate.set(); manager.shutdown()
+
+
+def test_release_keeps_job_for_live_watcher_only():
+    manager, gate = JobManager(max_workers=1, watch_ttl=0.2), threading.Event()
+    try:
+        job_id = manager.submit("a", "job", _blocking_job(gate))
+        manager.attach(job_id, "b")
+        assert not manager.release(job_id, "a")
+        assert _wait_status(manager, job_id, "running") == "running"
+        time.sleep(0.3)   # b 未续期：视为已离开 (如刷新前的旧页面)
+        manager.attach(job_id, "c")
+        assert manager.watchers(job_id) == {"c"}
+        assert manager.release(job_id, "c")
+        assert _wait_status(manager, job_id, "cancelled") == "cancelled"
+    finally:
+        gate.set(); manager.shutdown()
@@ -0,0 +1,66 @@
+"""流式直方图分位数 (含区间放宽后的重新分箱) 与蒙特卡洛汇总"""
+import numpy as np
+import pytest
+
+from ev_model import DEFAULT_INPUTS, build_ops_table, run_monte_carlo
+from ev_model.montecarlo import StreamingHistogram
+
+QS = np.array([0.05, 0.1, 0.25, 0.5, 0.75, 0.9, 0.95])
+
+
+def _exact(values):
+    return np.quantile(np.where(np.isfinite(values), values, np.inf), QS, axis=0, method="inverted_cdf")
+
+def _tolerance(hist):
+    """分位数误差不超过一个分箱宽度"""
+    return (hist.hi - hist.lo) / hist.bins
+
+
+def test_quantiles_within_one_bin():
+    values = np.random.default_rng(0).normal(100, 20, (50000, 3))
+    hist = StreamingHistogram(3)
+    for chunk in np.array_split(values, 10): hist.update(chunk)
+    assert np.all(np.abs(hist.quantiles(QS) - _exact(values)) <= _tolerance(hist))
+
+
+@pytest.mark.parametrize("chunks", [
+    # 首块范围很窄，后续数据向两侧大幅溢出
+    [np.random.default_rng(1).normal(0, 1, 2000), np.random.default_rng(2).normal(50, 5, 20000), np.random.default_rng(3).normal(-100, 1, 2000)],
+    # 只向上溢出，需放宽多个 2 的幂倍
+    [np.random.default_rng(4).uniform(0, 1, 1000), np.random.default_rng(5).uniform(0, 5000, 10000)],
+], ids=["both_sides", "high_side"])
+def test_widening_keeps_quantiles_exact(chunks):
+    hist = StreamingHistogram(1)
+    first_width = None
+    for chunk in chunks:
+        hist.update(chunk)
+        first_width = first_width or (hist.hi - hist.lo)[0]
+    values = np.concatenate(chunks)[:, None]
+    assert hist.counts.sum() == len(values)
+    assert hist.lo[0] <= values.min() and hist.hi[0] >= values.max()
+    width = (hist.hi - hist.lo)[0]
+    assert np.log2(width / first_width) == pytest.approx(round(np.log2(width / first_width)))
+    assert np.all(np.abs(hist.quantiles(QS) - _exact(values)) <= _tolerance(hist))
+
+
+def test_leading_nan_chunk_does_not_pin_range():
+    """首块全为 NaN (如均未回本) 时不应以 [0, 1] 截断后续数据"""
+    later = np.random.default_rng(6).uniform(2, 9, 5000)
+    values = np.concatenate([np.full(1000, np.nan), later])
+    hist = StreamingHistogram(1, lo=0.0, hi=10.0)
+    hist.update(values[:1000]); hist.update(values[1000:])
+    q = hist.quantiles(QS)[:, 0]
+    expected = _exact(values[:, None])[:, 0]
+    assert np.isinf(q[0]) == np.isinf(expected[0])
+    finite = np.isfinite(expected)
+    assert np.all(np.abs(q[finite] - expected[finite]) <= _tolerance(hist)[0])
+    assert hist.nan_counts[0] == 1000
+
+
+def test_payback_percentiles_follow_draws():
+    inputs = dict(DEFAULT_INPUTS); ops = build_ops_table(10)
+    res = run_monte_carlo(ops, inputs, {"price_sale": ("uniform", 0.3)}, n_draws=20000, chunk_size=2000, seed=1)
+    p = res["payback"]
+    assert 0 <= p["P10"] <= p["P50"] <= 10
+    # 超过回本概率的分位数落在“未回本”区间
+    assert np.isinf(p["P90"]) == (res["prob_payback"] < 0.9)
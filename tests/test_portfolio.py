@@ -0,0 +1,61 @@
+"""组合评估：错位开业时的组合回本期、并行结果一致性与取消"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from ev_model import DEFAULT_INPUTS, build_ops_table
+from ev_model.jobs import JobCancelled
+from ev_model import portfolio
+from ev_model.portfolio import evaluate_portfolio, portfolio_template
+
+
+def test_payback_waits_for_later_capex():
+    """第一个站点回本后，第二个站点的投资使累计现金流再次为负：回本期取最后一次转正"""
+    ops = build_ops_table(10)
+    sites = portfolio_template(DEFAULT_INPUTS, ops, 2)
+    sites["开业年份"] = [0, 9]; sites["qty_piles"] = [2, 6]
+    res = evaluate_portfolio(sites, DEFAULT_INPUTS, ops)
+    cum = res["annual"]["组合累计现金流"].to_numpy(); fcf = res["annual"]["组合FCF"].to_numpy()
+    first_positive = np.argmax(cum >= 0)
+    last_negative = np.flatnonzero(cum < 0)[-1]
+    assert first_positive < last_negative, "用例需在首次回本后再次转负"
+    assert res["payback"] == pytest.approx(last_negative + abs(cum[last_negative]) / fcf[last_negative + 1])
+    assert np.all(cum[int(np.ceil(res["payback"])):] >= 0)
+
+
+def test_payback_nan_when_never_recovered():
+    ops = build_ops_table(10)
+    sites = portfolio_template(DEFAULT_INPUTS, ops, 2)
+    sites["price_sale"] = 0.45
+    assert np.isnan(evaluate_portfolio(sites, DEFAULT_INPUTS, ops)["payback"])
+
+
+def test_cancel_stops_queued_chunks(monkeypatch):
+    """progress 抛出 JobCancelled 时撤销进程池中尚未开始的块，不等待其完成，并向上抛出"""
+    shutdowns = []
+    class Pool(portfolio.ProcessPoolExecutor):
+        def shutdown(self, wait=True, *, cancel_futures=False):
+            shutdowns.append((wait, cancel_futures)); super().shutdown(wait, cancel_futures=cancel_futures)
+    monkeypatch.setattr(portfolio, "ProcessPoolExecutor", Pool)
+    ops = build_ops_table(10)
+    sites = portfolio_template(DEFAULT_INPUTS, ops, 40)
+    calls = []
+
+    def progress(frac, text):
+        calls.append(frac)
+        raise JobCancelled()
+
+    with pytest.raises(JobCancelled):
+        evaluate_portfolio(sites, DEFAULT_INPUTS, ops, chunk_size=1, workers=2, progress=progress)
+    assert calls == [1 / 40]
+    assert shutdowns[0] == (False, True)
+
+
+def test_parallel_matches_serial():
+    ops = build_ops_table(10)
+    sites = portfolio_template(DEFAULT_INPUTS, ops, 6)
+    sites["开业年份"] = [0, 1, 2, 0, 3, 1]
+    serial = evaluate_portfolio(sites, DEFAULT_INPUTS, ops, chunk_size=2)
+    parallel = evaluate_portfolio(sites, DEFAULT_INPUTS, ops, chunk_size=2, workers=2)
+    pd.testing.assert_frame_equal(serial["sites"], parallel["sites"])
+    pd.testing.assert_frame_equal(serial["annual"], parallel["annual"])
@@ -0,0 +1,42 @@
+"""充电会话仿真：到站 SOC 区间跨过目标 SOC 时的电量与到站量反推"""
+import numpy as np
+import pytest
+
+from ev_model import DEFAULT_FLEET, DEFAULT_INPUTS, arrivals_from_kwh, mean_session_kwh, simulate_sessions
+
+OVERLAPS = [(0.5, (0.5, 0.9)), (0.5, (0.3, 0.9)), (0.6, (0.0, 0.9)), (0.8, (0.1, 0.45))]
+
+
+@pytest.mark.parametrize("target, soc", OVERLAPS)
+def test_mean_session_kwh_matches_sampling(target, soc):
+    fleet = dict(DEFAULT_FLEET, soc_target=target, soc_arrival=soc)
+    rng = np.random.default_rng(0)
+    battery = rng.uniform(*fleet["battery_kwh"], 400000); arrival = rng.uniform(*soc, 400000)
+    sampled = np.mean(battery * np.maximum(target - arrival, 0))
+    assert mean_session_kwh(fleet) >= 0
+    assert mean_session_kwh(fleet) == pytest.approx(sampled, rel=0.01, abs=0.05)
+
+
+@pytest.mark.parametrize("target, soc", OVERLAPS)
+def test_daily_kwh_never_negative(target, soc):
+    fleet = dict(DEFAULT_FLEET, soc_target=target, soc_arrival=soc)
+    res = simulate_sessions(DEFAULT_INPUTS, [30.0, 90.0], fleet, days=30)
+    assert np.all(res["daily_kwh_per_gun"] >= 0)
+    # 已达目标的车辆计为已服务，不计入流失
+    assert np.all(res["sessions"] + res["turned_away"] == res["arrivals"])
+
+
+def test_all_arrivals_above_target():
+    fleet = dict(DEFAULT_FLEET, soc_target=0.5, soc_arrival=(0.5, 0.9))
+    assert mean_session_kwh(fleet) == 0
+    np.testing.assert_array_equal(arrivals_from_kwh([200.0, 400.0], 12, fleet), [0.0, 0.0])
+    res = simulate_sessions(DEFAULT_INPUTS, [40.0], fleet, days=20)
+    assert res["daily_kwh_per_gun"][0] == 0 and res["turned_away"][0] == 0 and res["mean_wait_min"][0] == 0
+
+
+def test_demand_round_trip_with_overlap():
+    """由年度表需求反推到站量后仿真，容量充足时实现电量回到需求附近"""
+    fleet = dict(DEFAULT_FLEET, soc_target=0.6, soc_arrival=(0.3, 0.9))
+    guns = DEFAULT_INPUTS['qty_piles'] * DEFAULT_INPUTS['guns_per_pile']
+    res = simulate_sessions(DEFAULT_INPUTS, arrivals_from_kwh([100.0], guns, fleet), fleet, days=60)
+    assert res["daily_kwh_per_gun"][0] == pytest.approx(100.0, rel=0.05)
@@ -0,0 +1,35 @@
+"""最优配置搜索：分支定界的候选清单须与穷举 (全部可行方案精确求值) 完全一致"""
+import pandas as pd
+import pytest
+
+from ev_model import DEFAULT_INPUTS, build_ops_table, optimize_sizing
+
+EXHAUSTIVE = 10 ** 9   # 分块大于可行方案数：首块即全部求值，不发生剪枝
+
+
+def _ops(demand_scale):
+    ops = build_ops_table(10)
+    ops["单枪日均充电量 (kWh)"] *= demand_scale
+    return ops
+
+
+@pytest.mark.parametrize("objective", ["npv", "payback"])
+@pytest.mark.parametrize("budget", [None, 3e6])
+@pytest.mark.parametrize("demand_scale", [1.0, 8.0])
+def test_branch_and_bound_matches_exhaustive(objective, budget, demand_scale):
+    ops = _ops(demand_scale)
+    pruned = optimize_sizing(ops, DEFAULT_INPUTS, objective, budget=budget, chunk_size=8)
+    full = optimize_sizing(ops, DEFAULT_INPUTS, objective, budget=budget, chunk_size=EXHAUSTIVE)
+    assert full["stats"]["evaluated"] == full["stats"]["feasible"]
+    assert pruned["stats"]["evaluated"] < pruned["stats"]["feasible"], "用例需实际触发剪枝"
+    pd.testing.assert_frame_equal(pruned["shortlist"], full["shortlist"])
+    assert pruned["designs"] == full["designs"]
+
+
+def test_shortlist_respects_constraints():
+    res = optimize_sizing(_ops(8.0), DEFAULT_INPUTS, budget=3e6, oversubscription=1.0)
+    shortlist, designs = res["shortlist"], res["designs"]
+    assert (shortlist["初始投资"] <= 3e6).all()
+    for d in designs:
+        assert d["qty_piles"] * d["pile_power_kw"] <= d["qty_trans"] * d["trans_val"]
+    assert shortlist["NPV"].is_monotonic_decreasing
@@ -0,0 +1,50 @@
+"""NPV / IRR 与批量求根 (Illinois 试位法) 的已知解校验"""
+import numpy as np
+import pytest
+
+from ev_model import DEFAULT_INPUTS, build_ops_table, calculate_capex_details, calculate_financial_model
+from ev_model.solver import batch_root, irr, npv, solve_break_even_price
+
+
+def test_npv_known_values():
+    assert npv(np.array([-100.0, 110.0]), 0.10)[0] == pytest.approx(0.0, abs=1e-9)
+    assert npv(np.array([-100.0, 0.0, 121.0]), 0.10)[0] == pytest.approx(0.0, abs=1e-9)
+    assert npv(np.array([-1000.0, 300.0, 400.0, 500.0]), 0.0)[0] == pytest.approx(200.0)
+    assert npv(np.array([0.0, 100.0, 100.0]), 0.05)[0] == pytest.approx(100 / 1.05 + 100 / 1.05 ** 2)
+    # 每行各自的折现率
+    rows = np.array([[-100.0, 110.0], [-100.0, 120.0]])
+    np.testing.assert_allclose(npv(rows, np.array([0.10, 0.20])), [0.0, 0.0], atol=1e-9)
+
+
+@pytest.mark.parametrize("fcf, expected", [
+    ([-100.0, 110.0], 0.10),
+    ([-100.0, 0.0, 121.0], 0.10),
+    ([-1000.0, 300.0, 400.0, 500.0], 0.0889633947),           # 教科书例题 (Excel IRR = 8.896%)
+    ([-100.0, 39.0, 59.0, 55.0, 20.0], 0.2809484211),         # numpy-financial 文档示例
+    ([-1000.0] + [100.0] * 10, 0.0),
+    ([-100.0, 50.0], -0.5),                                   # 负收益率
+])
+def test_irr_known_cash_flows(fcf, expected):
+    assert irr(np.array(fcf))[0] == pytest.approx(expected, abs=1e-6)
+
+
+def test_irr_batch_and_no_sign_change():
+    flows = np.array([[-100.0, 110.0, 0.0], [-100.0, 0.0, 121.0], [100.0, 10.0, 10.0], [-100.0, -10.0, -10.0]])
+    r = irr(flows)
+    np.testing.assert_allclose(r[:2], [0.10, 0.10], atol=1e-6)
+    assert np.isnan(r[2:]).all()
+    # 求得的收益率使 NPV 归零
+    np.testing.assert_allclose(npv(flows[:2], r[:2]), 0.0, atol=1e-6)
+
+
+def test_batch_root_polynomials():
+    roots = batch_root(lambda x, idx: x ** 3 - np.array([2.0, 27.0, 1000.0])[idx], np.zeros(3), np.full(3, 20.0))
+    np.testing.assert_allclose(roots, [2 ** (1 / 3), 3.0, 10.0], rtol=1e-8)
+    assert np.isnan(batch_root(lambda x, idx: x ** 2 + 1, np.array([-1.0]), np.array([1.0])))[0]
+
+
+def test_break_even_price_zeroes_final_cash():
+    inputs = dict(DEFAULT_INPUTS); ops = build_ops_table(10)
+    price = solve_break_even_price(ops, inputs)[0]
+    df_res, _ = calculate_financial_model(ops, calculate_capex_details(inputs), dict(inputs, price_sale=price))
+    assert df_res["累计现金流"].iloc[-1] == pytest.approx(0.0, abs=1.0)
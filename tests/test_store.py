@@ -0,0 +1,44 @@
+"""情景库：重复保存不产生孤立结果文件，名称/站点/标签按需补充"""
+import numpy as np
+
+from ev_model import DEFAULT_INPUTS, build_ops_table, calculate_capex_details, calculate_financial_batch, calculate_financial_model
+from ev_model.store import ScenarioStore
+
+
+def _shards(store):
+    return sorted(p.name for p in (store.root / "results").glob("*.npy"))
+
+
+def test_resave_writes_no_new_shard(tmp_path):
+    store = ScenarioStore(tmp_path)
+    inputs = dict(DEFAULT_INPUTS); ops = build_ops_table(10)
+    df_res, payback = calculate_financial_model(ops, calculate_capex_details(inputs), inputs)
+    key = store.put(ops, inputs, df_res, payback, name="A", site="S1", tags=["x"])
+    shards = _shards(store)
+    for _ in range(3): assert store.put(ops, inputs, df_res, payback, name="", site="S2", tags=["y"]) == key
+    assert _shards(store) == shards and len(store) == 1
+    row = store.load(key)
+    assert row["name"] == "A" and row["site"] == "S2" and row["tags"] == ["x", "y"]
+    np.testing.assert_allclose(row["results"]["累计现金流"], df_res["累计现金流"])
+    store.delete([key])
+    assert _shards(store) == [] and len(store) == 0
+
+
+def test_put_many_writes_only_new_keys(tmp_path):
+    store = ScenarioStore(tmp_path)
+    inputs = dict(DEFAULT_INPUTS)
+    base = build_ops_table(5)[["单枪日均充电量 (kWh)", "运营人数 (人)", "人均年薪 (AED)"]].to_numpy(dtype=float)
+    ops = np.stack([base * [s, 1, 1] for s in (1.0, 1.5, 2.0)])
+    res = calculate_financial_batch(ops[..., 0], ops[..., 1], ops[..., 2], calculate_capex_details(inputs), inputs)
+    first = {k: v[:2] for k, v in res.items()}
+    keys = store.put_many(ops[:2], inputs, first)
+    assert len(_shards(store)) == 1
+    # 一个新键、两个已有键 (其中一个在批内重复)：只为新键写一个文件
+    idx = [0, 2, 1, 0]
+    all_keys = store.put_many(ops[idx], inputs, {k: v[idx] for k, v in res.items()})
+    assert len(_shards(store)) == 2 and len(store) == 3
+    assert all_keys[0] == keys[0] and all_keys[2] == keys[1]
+    np.testing.assert_allclose(store.load_arrays(all_keys[1])["cumulative_cash"], res["cumulative_cash"][2])
+    # 全部已存在：不写文件
+    store.put_many(ops, inputs, res)
+    assert len(_shards(store)) == 2